@@ -0,0 +1,223 @@
+import asyncio
+import math
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import Future, InvalidStateError, TimeoutError as FutureTimeout
+from contextlib import contextmanager
+from metrics import REGISTRY
+
+QUEUE_DEPTH = REGISTRY.gauge('webanalyzer_admission_queue_depth', 'Analýzy čekající na přijetí', ['controller'])
+IN_FLIGHT = REGISTRY.gauge('webanalyzer_admission_in_flight', 'Právě běžící přijaté analýzy', ['controller'])
+WAIT_SECONDS = REGISTRY.histogram('webanalyzer_admission_wait_seconds', 'Doba čekání ve frontě přijetí',
+                                  ['controller'], buckets=(0.005, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30))
+REJECTED = REGISTRY.counter('webanalyzer_admission_rejected', 'Odmítnuté analýzy podle důvodu',
+                            ['controller', 'reason'])
+
+
+class Overloaded(Exception):
+    """Analýza nebyla přijata; retry_after je doporučená prodleva v sekundách pro hlavičku Retry-After"""
+
+    def __init__(self, message, reason, retry_after):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def client_key(remote_addr, forwarded_for=None):
+    """Identita klienta pro férové řazení; X-Forwarded-For jen za důvěryhodnou proxy"""
+    if forwarded_for:
+        return forwarded_for.split(',')[0].strip() or remote_addr or 'unknown'
+    return remote_addr or 'unknown'
+
+
+class _Ticket:
+    def __init__(self, client):
+        self.client = client
+        self.enqueued = time.monotonic()
+        self.granted = None
+        # Future s časem přidělení umožní čekat na místo z vlákna i z korutiny;
+        # čekající čte čas z výsledku, atribut granted je platný jen pod zámkem řadiče
+        self.future = Future()
+
+
+class AdmissionController:
+    """Omezení souběžných analýz s omezenou frontou, férovostí a odmítáním.
+
+    Nejvýš max_concurrent analýz běží současně, dalších nejvýš max_queue čeká
+    ve frontě. Uvolněné místo se předá přímo čekajícímu požadavku, klienti se
+    přitom střídají dokola, takže klient s mnoha požadavky nepředběhne
+    ostatní. Jeden klient smí mít ve frontě nejvýš max_per_client požadavků.
+    Kdo se nevejde do fronty nebo čeká déle než queue_timeout, dostane
+    Overloaded s odhadem, za jak dlouho se místo uvolní.
+    """
+
+    def __init__(self, max_concurrent=16, max_queue=64, queue_timeout=10, max_per_client=8, name='wsgi'):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_per_client = max_per_client
+        self.name = name
+        self.active = 0
+        self.queued = 0
+        self._queues = OrderedDict()
+        self._lock = threading.Lock()
+        # Klouzavý průměr doby běhu analýzy pro odhad Retry-After
+        self.average_hold = 1.0
+        self.counters = {'admitted': 0, 'queued': 0, 'rejected': Counter()}
+        self._publish()
+
+    def _publish(self):
+        QUEUE_DEPTH.set(self.queued, controller=self.name)
+        IN_FLIGHT.set(self.active, controller=self.name)
+
+    def retry_after(self):
+        """Odhad sekund, než se ve frontě uvolní místo"""
+        waves = (self.queued + 1) / max(self.max_concurrent, 1)
+        return max(1, math.ceil(self.average_hold * waves))
+
+    def _reject(self, reason, message):
+        self.counters['rejected'][reason] += 1
+        REJECTED.inc(controller=self.name, reason=reason)
+        return Overloaded(message, reason, self.retry_after())
+
+    def enter(self, client):
+        """Přijme požadavek nebo ho zařadí do fronty; při překročení limitů vyhodí Overloaded"""
+        ticket = _Ticket(client)
+        with self._lock:
+            if self.active < self.max_concurrent and not self.queued:
+                self.active += 1
+                self._grant(ticket)
+                return ticket
+            if self.queued >= self.max_queue:
+                raise self._reject('queue_full', "Server je přetížený, fronta analýz je plná")
+            queue = self._queues.get(client)
+            if queue is not None and len(queue) >= self.max_per_client:
+                raise self._reject('client_limit', "Příliš mnoho čekajících analýz od jednoho klienta")
+            if queue is None:
+                queue = self._queues[client] = deque()
+            queue.append(ticket)
+            self.queued += 1
+            self.counters['queued'] += 1
+            self._publish()
+        return ticket
+
+    def try_enter(self, client):
+        """Přijme požadavek jen při volném místě a prázdné frontě, jinak vrátí None (nečeká ani neodmítá)"""
+        with self._lock:
+            if self.active >= self.max_concurrent or self.queued:
+                return None
+            ticket = _Ticket(client)
+            self.active += 1
+            self._grant(ticket)
+            return ticket
+
+    def _grant(self, ticket):
+        granted = time.monotonic()
+        # U zrušeného požadavku vyhodí InvalidStateError dřív, než se označí jako přijatý
+        ticket.future.set_result(granted)
+        ticket.granted = granted
+        self.counters['admitted'] += 1
+        WAIT_SECONDS.observe(granted - ticket.enqueued, controller=self.name)
+        self._publish()
+
+    def _next_ticket(self):
+        """Vezme čekající požadavek dalšího klienta v pořadí (round-robin)"""
+        while self._queues:
+            client, queue = next(iter(self._queues.items()))
+            ticket = queue.popleft()
+            self.queued -= 1
+            if queue:
+                self._queues.move_to_end(client)
+            else:
+                del self._queues[client]
+            if not ticket.future.cancelled():
+                return ticket
+        return None
+
+    def leave(self, ticket):
+        """Uvolní místo přijatého požadavku a předá ho dalšímu čekajícímu"""
+        with self._lock:
+            hold = time.monotonic() - ticket.future.result()
+            self.average_hold += (hold - self.average_hold) * 0.2
+            while True:
+                waiting = self._next_ticket()
+                if waiting is None:
+                    self.active -= 1
+                    self._publish()
+                    return
+                try:
+                    self._grant(waiting)
+                    return
+                except InvalidStateError:
+                    # Čekající byl zrušen mezi kontrolou a přidělením
+                    continue
+
+    def _abandon(self, ticket):
+        """Vyřadí požadavek z fronty; vrátí True, pokud už mezitím místo dostal"""
+        with self._lock:
+            if ticket.granted is not None:
+                return True
+            ticket.future.cancel()
+            queue = self._queues.get(ticket.client)
+            if queue is not None and ticket in queue:
+                queue.remove(ticket)
+                self.queued -= 1
+                if not queue:
+                    del self._queues[ticket.client]
+            self._publish()
+            return False
+
+    def _timed_out(self, ticket):
+        if not self._abandon(ticket):
+            with self._lock:
+                raise self._reject('queue_timeout', "Server je přetížený, analýza nezačala včas")
+
+    def wait(self, ticket):
+        """Počká (ve vlákně) na přidělení místa nejvýš queue_timeout sekund"""
+        if not ticket.future.done():
+            try:
+                ticket.future.result(self.queue_timeout)
+            except FutureTimeout:
+                self._timed_out(ticket)
+        return ticket
+
+    async def wait_async(self, ticket):
+        """Počká (v korutině) na přidělení místa nejvýš queue_timeout sekund"""
+        if not ticket.future.done():
+            try:
+                await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(ticket.future)), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self._timed_out(ticket)
+            except asyncio.CancelledError:
+                # Zrušené čekání: místo, které mezitím přišlo, se hned předá dál
+                if self._abandon(ticket):
+                    self.leave(ticket)
+                raise
+        return ticket
+
+    @contextmanager
+    def slot(self, client):
+        """Blok kódu běžící s přiděleným místem; čekání ve frontě vrací jako wait_s"""
+        ticket = self.wait(self.enter(client))
+        try:
+            yield ticket.future.result() - ticket.enqueued
+        finally:
+            self.leave(ticket)
+
+    def stats(self):
+        """Vrátí počty běžících, čekajících, přijatých a odmítnutých analýz"""
+        with self._lock:
+            return {
+                'in_flight': self.active,
+                'queued': self.queued,
+                'clients_waiting': len(self._queues),
+                'max_concurrent': self.max_concurrent,
+                'max_queue': self.max_queue,
+                'queue_timeout': self.queue_timeout,
+                'admitted': self.counters['admitted'],
+                'queued_total': self.counters['queued'],
+                'rejected': dict(self.counters['rejected']),
+                'average_hold_s': round(self.average_hold, 3),
+                'retry_after_s': self.retry_after(),
+            }
@@ -1,8 +1,109 @@
-from flask import Flask, render_template, request, jsonify
-from scraper import WebAnalyzer
+from flask import Flask, Response, render_template, request, jsonify, stream_with_context
+from scraper import WebAnalyzer, FIELDS, parse_fields
+from batch import BatchRunner, read_urls
+from crawl import SiteCrawler
+from jobs import JobQueue, QueueFull, create_job_store
+from http_pool import ConnectionPool
+from http_cache import HttpCache
+from result_cache import ResultCache
+from metrics import REGISTRY
+from icons import image_cache
+from host_health import host_health
+from admission import AdmissionController, Overloaded, client_key
+from store import create_result_store, parse_time
+from compact import (AssetStore, LinkPages, SAFE_ASSET_TYPES, choose_encoding, compact_result, compact_section,
+                     compress, compressible)
 import traceback
+import json
+import os
 
 app = Flask(__name__)
+connection_pool = ConnectionPool()
+asset_cache = HttpCache(directory=os.environ.get('ASSET_CACHE_DIR'))
+result_cache = ResultCache(ttl=int(os.environ.get('RESULT_CACHE_TTL', 600)))
+# Přijímání analýz: souběžné analýzy, omezená fronta s termínem, férovost mezi klienty.
+# Sdílí ho jednotlivé analýzy, položky dávek a crawlů, úlohy na pozadí i režim ASGI
+admission = AdmissionController(
+    max_concurrent=int(os.environ.get('ADMISSION_MAX_CONCURRENT', 16)),
+    max_queue=int(os.environ.get('ADMISSION_MAX_QUEUE', 64)),
+    queue_timeout=float(os.environ.get('ADMISSION_QUEUE_TIMEOUT', 10)),
+    max_per_client=int(os.environ.get('ADMISSION_MAX_PER_CLIENT', 8)),
+    name='shared'
+)
+TRUST_FORWARDED = os.environ.get('ADMISSION_TRUST_FORWARDED') in ('1', 'true')
+# Kompaktní odpovědi: bloby (data: URI fontů) podle hashe a odkazy stránkované na serveru
+asset_store = AssetStore(max_bytes=int(os.environ.get('ASSET_STORE_MAX_BYTES', 64 * 1024 * 1024)))
+link_pages = LinkPages(max_sets=int(os.environ.get('LINK_PAGES_MAX_SETS', 256)))
+LINKS_PAGE_SIZE = int(os.environ.get('LINKS_PAGE_SIZE', 100))
+# Trvalé úložiště všech analýz pro dotazy napříč weby; zapíná se cestou k souboru v RESULT_STORE
+result_store = create_result_store(os.environ.get('RESULT_STORE'))
+
+
+def record_result(url, result):
+    if result_store is not None:
+        result_store.add(url, result)
+
+
+job_queue = JobQueue(
+    create_job_store(os.environ.get('JOB_STORE', 'memory')),
+    lambda url: WebAnalyzer(url, pool=connection_pool, cache=asset_cache),
+    workers=int(os.environ.get('JOB_WORKERS', 4)),
+    max_pending=int(os.environ.get('JOB_MAX_PENDING', 100)),
+    on_result=record_result,
+    admit=lambda client: admission.slot(client or 'jobs')
+)
+# Horní meze rozpočtu procházení webu, které může požadovat klient
+CRAWL_MAX_PAGES = int(os.environ.get('CRAWL_MAX_PAGES', 50))
+CRAWL_MAX_DEPTH = int(os.environ.get('CRAWL_MAX_DEPTH', 3))
+# Větší crawly (nebo s "async": true) běží ve frontě úloh; obojí má časový limit s částečnou zprávou
+CRAWL_SYNC_MAX_PAGES = int(os.environ.get('CRAWL_SYNC_MAX_PAGES', 20))
+CRAWL_TIMEOUT = float(os.environ.get('CRAWL_TIMEOUT', 30))
+CRAWL_JOB_TIMEOUT = float(os.environ.get('CRAWL_JOB_TIMEOUT', 300))
+batch_runner = BatchRunner(
+    workers=int(os.environ.get('BATCH_WORKERS', 0)) or None,
+    per_domain=int(os.environ.get('BATCH_PER_DOMAIN', 2)),
+    delay=float(os.environ.get('BATCH_DELAY', 0))
+)
+
+def request_client():
+    forwarded = request.headers.get('X-Forwarded-For') if TRUST_FORWARDED else None
+    return client_key(request.remote_addr, forwarded)
+
+
+def overloaded(error):
+    """Odpověď 429 s hlavičkou Retry-After pro odmítnutou analýzu"""
+    response = jsonify({'error': str(error), 'reason': error.reason, 'retry_after': error.retry_after})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
+
+def overloaded_stream(error):
+    """Odmítnutí pro EventSource: status 200 s událostí analysis-error (na 429 by prohlížeč hlásil jen chybu spojení)"""
+    data = {'error': str(error), 'reason': error.reason, 'retry_after': error.retry_after}
+    return Response(sse_event('analysis-error', data), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'Retry-After': str(error.retry_after)})
+
+
+def wants_compact(body=None):
+    value = (body or {}).get('compact', request.args.get('compact'))
+    return value in (True, 1, '1', 'true')
+
+
+@app.after_request
+def compress_response(response):
+    """Komprimuje větší textové odpovědi gzipem nebo brotli podle Accept-Encoding (proudy ne)"""
+    if response.direct_passthrough or response.is_streamed or 'Content-Encoding' in response.headers:
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+    if encoding is None or response.status_code < 200 or response.status_code in (204, 304):
+        return response
+    if not compressible(response.mimetype, response.content_length or 0):
+        return response
+    response.set_data(compress(response.get_data(), encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
 
 @app.route('/')
 def index():
@@ -18,13 +119,315 @@ def analyze():
         if not url.startswith(('http://', 'https://')):
             url = 'https://' + url
         
-        analyzer = WebAnalyzer(url)
-        result = analyzer.analyze()
+        # Měření má smysl jen u skutečně provedené analýzy, proto obchází cache
+        timings = bool(request.json.get('timings'))
+        client = request_client()
+        try:
+            fields = parse_fields(request.json.get('fields') or request.args.get('fields'))
+        except Exception as e:
+            return jsonify({'error': str(e)}), 400
+        result, cache_status = result_cache.get_or_analyze(
+            url,
+            lambda: WebAnalyzer(url, pool=connection_pool, cache=asset_cache, timings=timings, fields=fields),
+            refresh=bool(request.json.get('refresh')) or timings,
+            variant=','.join(fields) if fields != FIELDS else None,
+            admit=lambda: admission.slot(client)
+        )
         
-        return jsonify(result)
+        if cache_status == 'miss':
+            record_result(url, result)
+        result = dict(result, cache=cache_status)
+        if not timings:
+            result.pop('timings', None)
+        if wants_compact(request.json):
+            result = compact_result(result, asset_store, link_pages, LINKS_PAGE_SIZE)
+        response = jsonify(result)
+        response.headers['X-Cache'] = cache_status
+        return response
+    except Overloaded as e:
+        return overloaded(e)
+    except Exception as e:
+        return jsonify({'error': str(e), 'traceback': traceback.format_exc()}), 500
+
+def sse_event(event, data):
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
+@app.route('/analyze/stream')
+def analyze_stream():
+    """Analýza jako server-sent events: každé pole se pošle, jakmile je hotové"""
+    url = request.args.get('url')
+    if not url:
+        return jsonify({'error': 'URL není zadána'}), 400
+    
+    if not url.startswith(('http://', 'https://')):
+        url = 'https://' + url
+    
+    try:
+        fields = parse_fields(request.args.get('fields'))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+    variant = ','.join(fields) if fields != FIELDS else None
+    refresh = request.args.get('refresh') in ('1', 'true')
+    compact = wants_compact()
+    
+    def section(field, value):
+        if compact:
+            value = compact_section(field, value, asset_store, link_pages, LINKS_PAGE_SIZE)
+        return sse_event('section', {'field': field, 'value': value})
+    
+    cached = None if refresh else result_cache.peek(url, variant)
+    ticket = None
+    if cached is None:
+        # Místo se drží, dokud se proud neuzavře, i kdyby ho klient nečetl
+        try:
+            ticket = admission.wait(admission.enter(request_client()))
+        except Overloaded as e:
+            return overloaded_stream(e)
+    
+    def generate():
+        if cached is not None:
+            yield sse_event('page', {'url': cached.get('url', url)})
+            for field in fields:
+                if field in cached:
+                    yield section(field, cached[field])
+            yield sse_event('done', {'cache': 'hit', 'truncated': cached.get('truncated', [])})
+            return
+        analyzer = WebAnalyzer(url, pool=connection_pool, cache=asset_cache, fields=fields)
+        sections = {}
+        try:
+            for field, value in analyzer.stream():
+                if field == 'page':
+                    yield sse_event('page', {'url': value})
+                    continue
+                sections[field] = value
+                yield section(field, value)
+        except Exception as e:
+            yield sse_event('analysis-error', {'error': str(e)})
+            return
+        result = {'url': url}
+        result.update((field, sections[field]) for field in fields)
+        result['truncated'] = analyzer.budget.truncated
+        result['fetch'] = analyzer.guard.report()
+        result_cache.put(url, analyzer, result, variant)
+        record_result(url, result)
+        yield sse_event('done', {'cache': 'miss', 'truncated': result['truncated'], 'fetch': result['fetch']})
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    if ticket is not None:
+        response.call_on_close(lambda: admission.leave(ticket))
+    return response
+
+@app.route('/analyze/links/<links_id>')
+def analyze_links(links_id):
+    """Stránka odkazů z kompaktní odpovědi; kind=all|internal|external, q=hledaný text, cursor"""
+    links = link_pages.get(links_id)
+    if links is None:
+        return jsonify({'error': 'Seznam odkazů vypršel, spusťte analýzu znovu'}), 404
+    args = request.args
+    try:
+        limit = max(min(int(args.get('limit', LINKS_PAGE_SIZE)), 1000), 1)
+        page = link_pages.page(links, kind=args.get('kind', 'all'), query=args.get('q'),
+                               cursor=args.get('cursor'), limit=limit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(dict(page, id=links_id))
+
+@app.route('/assets/<digest>')
+def get_asset(digest):
+    """Blob z kompaktní odpovědi; obsah se pod hashem nemění, proto se smí cacheovat natrvalo"""
+    if request.if_none_match.contains_weak(digest):
+        return Response(status=304, headers={'ETag': f'"{digest}"'})
+    asset = asset_store.get(digest)
+    if asset is None:
+        return jsonify({'error': 'Soubor nenalezen'}), 404
+    data, mimetype = asset
+    response = Response(data, mimetype=mimetype if mimetype in SAFE_ASSET_TYPES else 'application/octet-stream')
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    response.headers['ETag'] = f'"{digest}"'
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    return response
+
+@app.route('/analyze/batch', methods=['POST'])
+def analyze_batch():
+    if request.is_json:
+        urls = request.json.get('urls') or []
+    else:
+        urls = list(read_urls(request.get_data(as_text=True).splitlines()))
+    if not urls:
+        return jsonify({'error': 'Nejsou zadány žádné URL'}), 400
+    client = request_client()
+    
+    def generate():
+        for record in batch_runner.run(urls, admission=admission, client=client):
+            if record['status'] == 'ok':
+                record_result(record['url'], record['result'])
+            yield json.dumps(record) + '\n'
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/crawl', methods=['POST'])
+def crawl_site():
+    body = request.json or {}
+    url = body.get('url')
+    if not url:
+        return jsonify({'error': 'URL není zadána'}), 400
+    
+    if not url.startswith(('http://', 'https://')):
+        url = 'https://' + url
+    
+    try:
+        max_pages = min(int(body.get('max_pages', 20)), CRAWL_MAX_PAGES)
+        max_depth = min(int(body.get('max_depth', 2)), CRAWL_MAX_DEPTH)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'max_pages a max_depth musí být čísla'}), 400
+    max_pages = max(max_pages, 1)
+    client = request_client()
+    queued = body.get('async') in (True, 1, '1', 'true') or max_pages > CRAWL_SYNC_MAX_PAGES
+    crawler = SiteCrawler(url, max_pages=max_pages, max_depth=max(max_depth, 0),
+                          workers=int(os.environ.get('CRAWL_WORKERS', 4)),
+                          delay=float(os.environ.get('CRAWL_DELAY', 0.5)),
+                          pool=connection_pool, cache=asset_cache,
+                          timeout=CRAWL_JOB_TIMEOUT if queued else CRAWL_TIMEOUT,
+                          admit=lambda: admission.slot(client))
+    if queued:
+        try:
+            job_id = job_queue.submit(url, crawler.run, kind='crawl', total=max_pages)
+        except QueueFull as e:
+            return jsonify({'error': str(e)}), 503
+        return jsonify({'id': job_id, 'status': 'queued', 'status_url': f'/jobs/{job_id}'}), 202
+    try:
+        return jsonify(crawler.run())
     except Exception as e:
         return jsonify({'error': str(e), 'traceback': traceback.format_exc()}), 500
 
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    url = (request.json or {}).get('url')
+    if not url:
+        return jsonify({'error': 'URL není zadána'}), 400
+    
+    if not url.startswith(('http://', 'https://')):
+        url = 'https://' + url
+    
+    try:
+        job_id = job_queue.submit(url, client=request_client())
+    except QueueFull as e:
+        return jsonify({'error': str(e)}), 503
+    return jsonify({'id': job_id, 'status': 'queued', 'status_url': f'/jobs/{job_id}'}), 202
+
+@app.route('/jobs/<job_id>')
+def get_job(job_id):
+    job = job_queue.get(job_id)
+    if not job:
+        return jsonify({'error': 'Úloha nenalezena'}), 404
+    return jsonify(job)
+
+@app.route('/jobs/<job_id>/result')
+def get_job_result(job_id):
+    job = job_queue.get(job_id)
+    if not job:
+        return jsonify({'error': 'Úloha nenalezena'}), 404
+    if job['status'] == 'error':
+        return jsonify({'error': job['error']}), 500
+    if job['status'] != 'done':
+        return jsonify({'status': job['status'], 'progress': job['progress']}), 202
+    return jsonify(job['result'])
+
+@app.route('/stats')
+def stats():
+    return jsonify({
+        'pool': connection_pool.stats(),
+        'cache': asset_cache.stats(),
+        'results': result_cache.stats(),
+        'images': image_cache.stats(),
+        'hosts': host_health.stats(),
+        'admission': admission.stats(),
+        'assets': asset_store.stats(),
+        'store': result_store.stats() if result_store is not None else None
+    })
+
+def _store_limit():
+    return max(min(int(request.args.get('limit', 100)), 1000), 1)
+
+@app.route('/store/search')
+def store_search():
+    if result_store is None:
+        return jsonify({'error': 'Úložiště výsledků není zapnuté'}), 404
+    args = request.args
+    latest = args.get('all') not in ('1', 'true')
+    try:
+        limit = _store_limit()
+        if args.get('font'):
+            matches = result_store.find_by_font(args['font'], latest=latest, limit=limit)
+        elif args.get('color'):
+            matches = result_store.find_by_color(args['color'], max_distance=float(args.get('distance', 0.05)),
+                                                 role=args.get('role'), latest=latest, limit=limit)
+        elif args.get('domain'):
+            matches = result_store.find_by_domain(args['domain'], latest=latest, limit=limit)
+        elif args.get('icon'):
+            matches = result_store.find_by_icon(args['icon'], latest=latest, limit=limit)
+        else:
+            return jsonify({'error': 'Zadejte font, color, domain nebo icon'}), 400
+    except ValueError:
+        return jsonify({'error': 'limit a distance musí být čísla'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'count': len(matches), 'results': matches})
+
+@app.route('/store/history')
+def store_history():
+    if result_store is None:
+        return jsonify({'error': 'Úložiště výsledků není zapnuté'}), 404
+    url = request.args.get('url')
+    if not url:
+        return jsonify({'error': 'URL není zadána'}), 400
+    return jsonify({'url': url, 'snapshots': result_store.history(url)})
+
+@app.route('/store/snapshots/<int:snapshot_id>')
+def store_snapshot(snapshot_id):
+    if result_store is None:
+        return jsonify({'error': 'Úložiště výsledků není zapnuté'}), 404
+    snapshot = result_store.get(snapshot_id)
+    if not snapshot:
+        return jsonify({'error': 'Snímek nenalezen'}), 404
+    return jsonify(snapshot)
+
+@app.route('/store/diff')
+def store_diff():
+    """Rozdíl dvou snímků (a, b) nebo změny URL od času since"""
+    if result_store is None:
+        return jsonify({'error': 'Úložiště výsledků není zapnuté'}), 404
+    args = request.args
+    try:
+        if args.get('a') and args.get('b'):
+            return jsonify(result_store.diff(int(args['a']), int(args['b'])))
+        since = parse_time(args.get('since', '7d'))
+        if args.get('url'):
+            diff = result_store.diff_since(args['url'], since)
+            if diff is None:
+                return jsonify({'error': 'Pro URL chybí snímek před zadaným časem'}), 404
+            return jsonify(diff)
+        changes = result_store.changes_since(since, limit=_store_limit())
+        return jsonify({'since': since, 'count': len(changes), 'changes': changes})
+    except ValueError:
+        return jsonify({'error': 'a, b a limit musí být čísla'}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/store/export')
+def store_export():
+    if result_store is None:
+        return jsonify({'error': 'Úložiště výsledků není zapnuté'}), 404
+    result_store.flush()
+    data = result_store.export_bytes(latest=request.args.get('all') not in ('1', 'true'))
+    return Response(data, mimetype='application/octet-stream',
+                    headers={'Content-Disposition': 'attachment; filename=analyses.npz'})
+
+@app.route('/metrics')
+def metrics():
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
 
@@ -0,0 +1,463 @@
+"""Asynchronní (ASGI) režim serveru.
+
+Spuštění:
+    uvicorn asgi:application --host 0.0.0.0 --port 8000
+
+POST /analyze stahuje stránku, stylesheety i obrázky neblokujícím klientem
+httpx, takže jeden proces udrží stovky rozběhnutých analýz čekajících na
+pomalé weby. Parsování a extrakce (CPU) běží v omezeném poolu vláken.
+Ostatní cesty obsluhuje beze změny aplikace Flask přes WSGI most.
+"""
+import asyncio
+import functools
+import io
+import json
+import os
+import sys
+import time
+import traceback
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+import httpx
+from requests import Response
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from admission import Overloaded, client_key
+from app import (app as wsgi_app, admission, asset_cache, asset_store, connection_pool, link_pages, record_result,
+                 result_cache, LINKS_PAGE_SIZE)
+from compact import choose_encoding, compact_result, compress, compressible
+from ingest import CHUNK_SIZE
+from result_cache import normalize_url
+from scraper import WebAnalyzer, FIELDS, USER_AGENT, parse_fields
+
+
+async def read_body_async(response, limit, budget=None):
+    """Asynchronní obdoba ingest.read_body; vrací (tělo, False nebo důvod useknutí)"""
+    chunks = []
+    size = 0
+    truncated = False
+    async for chunk in response.aiter_bytes(CHUNK_SIZE):
+        if size + len(chunk) > limit:
+            chunk = chunk[:limit - size]
+            truncated = 'asset_limit'
+        if budget is not None:
+            granted = budget.charge(len(chunk))
+            if granted < len(chunk):
+                chunk = chunk[:granted]
+                truncated = 'analysis_budget'
+        chunks.append(chunk)
+        size += len(chunk)
+        if truncated:
+            break
+    return b''.join(chunks), truncated
+
+
+def to_response(response, body, truncated):
+    """Převede odpověď httpx na requests.Response, se kterou pracuje analyzátor i HTTP cache"""
+    result = Response()
+    result.status_code = response.status_code
+    result.reason = response.reason_phrase
+    result.headers = CaseInsensitiveDict(response.headers)
+    result.url = str(response.url)
+    result._content = body
+    result._content_consumed = True
+    result.encoding = get_encoding_from_headers(result.headers)
+    result.truncated = truncated
+    return result
+
+
+class AsyncAnalyzer:
+    """Analýzy s neblokujícím síťovým I/O.
+
+    Síťová část analýzy (stránka, stylesheety s @importy, obrázky ikon) běží
+    jako korutiny nad sdíleným klientem httpx a používá stejnou HTTP cache a
+    rozpočet bajtů jako synchronní cesta. Připravený WebAnalyzer pak už jen
+    počítá v omezeném poolu vláken, takže počet vláken nezávisí na počtu
+    analýz čekajících na síť.
+    """
+
+    def __init__(self, cache=None, results=None, pool=None, cpu_workers=None, max_analyses=500,
+                 max_connections=200, per_host_limit=4, fetch_deadline=20, on_result=None, admission=None):
+        self.cache = cache
+        self.results = results
+        self.pool = pool
+        self.per_host_limit = per_host_limit
+        self.fetch_deadline = fetch_deadline
+        self.on_result = on_result
+        self.admission = admission
+        self.max_analyses = max_analyses
+        self.cpu_workers = cpu_workers or os.cpu_count() or 4
+        self.client = httpx.AsyncClient(
+            follow_redirects=True,
+            headers={'User-Agent': USER_AGENT},
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections // 2)
+        )
+        self.cpu = ThreadPoolExecutor(max_workers=self.cpu_workers, thread_name_prefix='analysis-cpu')
+        self._slots = asyncio.Semaphore(max_analyses)
+        self._flights = {}
+        self.counters = {'in_flight': 0, 'peak_in_flight': 0, 'completed': 0, 'failed': 0, 'coalesced': 0}
+
+    async def run_cpu(self, function, *args):
+        """Spustí výpočet v poolu vláken pro CPU"""
+        return await asyncio.get_running_loop().run_in_executor(self.cpu, functools.partial(function, *args))
+
+    async def get(self, analyzer, url, hosts, timeout=10):
+        """Asynchronní obdoba WebAnalyzer.http_get (rozpočet bajtů, HTTP cache, měření)"""
+        async with hosts[urlsplit(url).netloc]:
+            analyzer.admit_download(url)
+            response = await self._fetch(analyzer.guard, url, timeout, analyzer.budget.max_asset_bytes,
+                                         analyzer.budget)
+        return analyzer.settle_download(url, response)
+
+    async def _fetch(self, guard, url, timeout, limit, budget=None):
+        """Asynchronní obdoba WebAnalyzer._guarded_get (HTTP cache, jistič, adaptivní timeout, opakování)"""
+        key = entry = None
+        headers = {}
+        if self.cache:
+            key, entry, cached = self.cache.lookup(url, limit)
+            if cached is not None:
+                return cached
+            headers = self.cache.validators(entry)
+        attempt = 0
+        while True:
+            request_timeout = guard.admit(url, timeout)
+            start = time.monotonic()
+            try:
+                result = await self._request(url, request_timeout, limit, key, entry, headers,
+                                             pool_timeout=max(guard.remaining(), 0.1), budget=budget)
+            except httpx.PoolTimeout:
+                # Čekání na volné spojení v lokálním poolu není chyba vzdáleného hostitele
+                guard.abandoned(url, 'pool_timeout')
+                raise
+            except httpx.TransportError as e:
+                reason = guard.failed(url, 'timeout' if isinstance(e, httpx.TimeoutException) else 'connection')
+                delay = guard.retry_delay(url, attempt, reason)
+                if delay is None:
+                    raise
+            else:
+                reason = guard.completed(url, time.monotonic() - start, result.status_code)
+                delay = guard.retry_delay(url, attempt, reason) if reason else None
+                if delay is None:
+                    return result
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _request(self, url, timeout, limit, key, entry, headers, pool_timeout=None, budget=None):
+        # Na volné spojení se čeká do termínu analýzy, adaptivní timeout hostitele platí až pro síť
+        timeout = httpx.Timeout(timeout, pool=pool_timeout if pool_timeout is not None else timeout)
+        async with self.client.stream('GET', url, headers=headers, timeout=timeout) as response:
+            if entry and headers and response.status_code == 304:
+                return self.cache.not_modified(key, entry, response, limit)
+            body, truncated = await read_body_async(response, limit, budget)
+        result = to_response(response, body, truncated)
+        if self.cache:
+            return self.cache.complete(key, url, result)
+        result.from_cache = False
+        return result
+
+    async def prefetch(self, analyzer):
+        """Stáhne stránku a vstupy vybraných polí, aby analýza už nečekala na síť"""
+        hosts = defaultdict(lambda: asyncio.Semaphore(self.per_host_limit))
+        try:
+            response = await self.get(analyzer, analyzer.url, hosts)
+            await self.run_cpu(analyzer.load_page, response)
+        except Exception as e:
+            raise Exception(f"Chyba při načítání stránky: {str(e)}")
+        graph = analyzer.resources
+        inputs = analyzer.required_inputs()
+        resources = {}
+        images = {}
+        scheduled = set()
+
+        def schedule(urls, depth):
+            fresh = [url for url in dict.fromkeys(urls) if url not in scheduled]
+            scheduled.update(fresh)
+            return [stylesheet(url, depth) for url in fresh]
+
+        async def stylesheet(url, depth):
+            try:
+                resource = analyzer.css_resource(url, await self.get(analyzer, url, hosts))
+            except Exception:
+                resource = None
+            resources[url] = resource
+            if resource and resource['text'] and depth <= graph.max_import_depth:
+                await asyncio.gather(*schedule(graph.import_urls(resource['text'], resource['final_url']), depth + 1))
+
+        async def image(url):
+            try:
+                response = await self.get(analyzer, url, hosts)
+            except Exception:
+                images[url] = None
+                return
+            images[url] = await self.run_cpu(analyzer.image_resource, url, response)
+
+        tasks = []
+        if 'css' in inputs:
+            for style in analyzer.page.styles:
+                if style:
+                    tasks += schedule(graph.import_urls(style, analyzer.base_url), 1)
+            tasks += schedule(graph.link_urls(analyzer.page, analyzer.base_url), 0)
+        image_urls = list(dict.fromkeys(analyzer.image_urls())) if 'images' in inputs else []
+        tasks += [image(url) for url in image_urls]
+        skipped = []
+        if tasks:
+            try:
+                await asyncio.wait_for(asyncio.gather(*tasks), self.fetch_deadline)
+            except asyncio.TimeoutError:
+                # Co nedoběhlo do termínu, se už v této analýze znovu nestahuje
+                skipped = [url for url in scheduled if url not in resources]
+                skipped += [url for url in image_urls if url not in images]
+                resources.update((url, None) for url in scheduled if url not in resources)
+                images.update((url, None) for url in image_urls if url not in images)
+        graph.add_prefetched(resources, images, skipped, stylesheets='css' in inputs)
+
+    async def analyze(self, url, fields=None, refresh=False, client=None):
+        """Vrátí (výsledek, stav cache) stejně jako ResultCache.get_or_analyze
+
+        Novou analýzu musí nejdřív přijmout admission (jinak Overloaded);
+        zásah cache a připojení k běžící analýze místo nezabírají.
+        """
+        fields = parse_fields(fields)
+        variant = ','.join(fields) if fields != FIELDS else None
+        if self.results is not None and not refresh:
+            result = self.results.peek(url, variant)
+            if result is not None:
+                return result, 'hit'
+        key = (normalize_url(url), variant)
+        flight = self._flights.get(key)
+        if flight is not None:
+            result, status = await asyncio.shield(flight)
+            self.counters['coalesced'] += 1
+            return result, 'coalesced'
+        flight = self._flights[key] = asyncio.ensure_future(self._admitted(url, fields, refresh, variant, client))
+        flight.add_done_callback(lambda done: self._flights.pop(key, None))
+        # Odpojení klienta nesmí zrušit analýzu, na kterou čekají i další požadavky
+        return await asyncio.shield(flight)
+
+    async def _admitted(self, url, fields, refresh, variant, client):
+        if self.admission is None:
+            return await self._analyze(url, fields, refresh, variant)
+        ticket = await self.admission.wait_async(self.admission.enter(client))
+        try:
+            return await self._analyze(url, fields, refresh, variant)
+        finally:
+            self.admission.leave(ticket)
+
+    async def _analyze(self, url, fields, refresh, variant):
+        async with self._slots:
+            self.counters['in_flight'] += 1
+            self.counters['peak_in_flight'] = max(self.counters['peak_in_flight'], self.counters['in_flight'])
+            try:
+                analyzer = WebAnalyzer(url, pool=self.pool, cache=self.cache, fields=fields)
+                await self.prefetch(analyzer)
+                if self.results is None:
+                    result, status = await self.run_cpu(analyzer.analyze), 'miss'
+                else:
+                    result, status = await self.run_cpu(self.results.get_or_analyze, url, lambda: analyzer,
+                                                        refresh, variant)
+            except Exception:
+                self.counters['failed'] += 1
+                raise
+            finally:
+                self.counters['in_flight'] -= 1
+        self.counters['completed'] += 1
+        if status == 'miss' and self.on_result:
+            self.on_result(url, result)
+        return result, status
+
+    def stats(self):
+        return dict(self.counters, cpu_workers=self.cpu_workers, max_analyses=self.max_analyses,
+                    admission=self.admission.stats() if self.admission else None)
+
+    async def close(self):
+        await self.client.aclose()
+        self.cpu.shutdown(wait=False)
+
+
+async def read_request_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] != 'http.request':
+            break
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            break
+    return b''.join(chunks)
+
+
+async def send_json(send, status, data, headers=None, accept_encoding=None):
+    body = json.dumps(data, sort_keys=True).encode('utf-8')
+    raw_headers = [(b'content-type', b'application/json'), (b'vary', b'Accept-Encoding')]
+    encoding = choose_encoding(accept_encoding)
+    if encoding and compressible('application/json', len(body)):
+        body = compress(body, encoding)
+        raw_headers.append((b'content-encoding', encoding.encode('ascii')))
+    raw_headers.append((b'content-length', str(len(body)).encode('ascii')))
+    raw_headers += [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in (headers or {}).items()]
+    await send({'type': 'http.response.start', 'status': status, 'headers': raw_headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def wsgi_environ(scope, body):
+    """Sestaví WSGI environ z ASGI scope (PEP 3333)"""
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1] or 80),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        key = name if name in ('CONTENT_TYPE', 'CONTENT_LENGTH') else 'HTTP_' + name
+        value = value.decode('latin-1')
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+class AsgiApp:
+    """ASGI aplikace: POST /analyze asynchronně, ostatní cesty přes WSGI most do aplikace Flask"""
+
+    def __init__(self, analyzer, wsgi_app, wsgi_workers=16, trust_forwarded=False):
+        self.analyzer = analyzer
+        self.trust_forwarded = trust_forwarded
+        self.wsgi_app = wsgi_app
+        self.wsgi_executor = ThreadPoolExecutor(max_workers=wsgi_workers, thread_name_prefix='wsgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+        body = await read_request_body(receive)
+        if scope['path'] == '/analyze' and scope['method'] == 'POST':
+            await self.analyze(scope, body, send)
+        elif scope['path'] == '/stats/async' and scope['method'] == 'GET':
+            await send_json(send, 200, self.analyzer.stats())
+        else:
+            await self.wsgi(scope, body, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.analyzer.close()
+                self.wsgi_executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def analyze(self, scope, body, send):
+        try:
+            data = json.loads(body or b'{}')
+        except ValueError:
+            await send_json(send, 400, {'error': 'Tělo požadavku není platný JSON'})
+            return
+        if data.get('timings'):
+            # Měření fází potřebuje synchronní průběh celé analýzy
+            await self.wsgi(scope, body, send)
+            return
+        url = data.get('url')
+        if not url:
+            await send_json(send, 400, {'error': 'URL není zadána'})
+            return
+        if not url.startswith(('http://', 'https://')):
+            url = 'https://' + url
+        query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+        try:
+            fields = parse_fields(data.get('fields') or (query.get('fields') or [None])[0])
+        except Exception as e:
+            await send_json(send, 400, {'error': str(e)})
+            return
+        try:
+            result, cache_status = await self.analyzer.analyze(url, fields, refresh=bool(data.get('refresh')),
+                                                               client=self.client(scope))
+        except Overloaded as e:
+            await send_json(send, 429, {'error': str(e), 'reason': e.reason, 'retry_after': e.retry_after},
+                            {'Retry-After': str(e.retry_after)})
+            return
+        except Exception as e:
+            await send_json(send, 500, {'error': str(e), 'traceback': traceback.format_exc()})
+            return
+        result = dict(result, cache=cache_status)
+        result.pop('timings', None)
+        if data.get('compact') in (True, 1, '1', 'true') or (query.get('compact') or [None])[0] in ('1', 'true'):
+            result = compact_result(result, asset_store, link_pages, LINKS_PAGE_SIZE)
+        await send_json(send, 200, result, {'X-Cache': cache_status},
+                        dict(scope.get('headers', [])).get(b'accept-encoding', b'').decode('latin-1'))
+
+    def client(self, scope):
+        forwarded = None
+        if self.trust_forwarded:
+            forwarded = dict(scope.get('headers', [])).get(b'x-forwarded-for', b'').decode('latin-1')
+        return client_key((scope.get('client') or ('', 0))[0], forwarded)
+
+    async def wsgi(self, scope, body, send):
+        """Předá požadavek aplikaci WSGI ve vlákně; tělo odpovědi posílá po částech (i NDJSON proudy)"""
+        loop = asyncio.get_running_loop()
+        response = {}
+        written = []
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                                   for name, value in headers]
+            return written.append
+
+        async def start():
+            if not response.get('started'):
+                response['started'] = True
+                await send({'type': 'http.response.start', 'status': response['status'],
+                            'headers': response['headers']})
+
+        iterable = await loop.run_in_executor(self.wsgi_executor, self.wsgi_app, wsgi_environ(scope, body),
+                                              start_response)
+        iterator = iter(iterable)
+        try:
+            while True:
+                chunk = await loop.run_in_executor(self.wsgi_executor, next, iterator, None)
+                if chunk is None:
+                    break
+                await start()
+                for data in written + [chunk]:
+                    if data:
+                        await send({'type': 'http.response.body', 'body': data, 'more_body': True})
+                written.clear()
+        finally:
+            if hasattr(iterable, 'close'):
+                await loop.run_in_executor(self.wsgi_executor, iterable.close)
+        await start()
+        await send({'type': 'http.response.body', 'body': b''.join(written)})
+
+
+def create_app():
+    analyzer = AsyncAnalyzer(
+        cache=asset_cache,
+        results=result_cache,
+        pool=connection_pool,
+        cpu_workers=int(os.environ.get('ASGI_CPU_WORKERS', 0)) or None,
+        max_analyses=int(os.environ.get('ASGI_MAX_ANALYSES', 500)),
+        max_connections=int(os.environ.get('ASGI_MAX_CONNECTIONS', 200)),
+        on_result=record_result,
+        admission=admission
+    )
+    return AsgiApp(analyzer, wsgi_app, wsgi_workers=int(os.environ.get('ASGI_WSGI_WORKERS', 16)),
+                   trust_forwarded=os.environ.get('ADMISSION_TRUST_FORWARDED') in ('1', 'true'))
+
+
+application = create_app()
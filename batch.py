@@ -0,0 +1,310 @@
+"""Dávková analýza mnoha URL v paralelních procesech.
+
+Použití z příkazové řádky (výsledky jako NDJSON na stdout):
+    python batch.py urls.txt --workers 8 --per-domain 2 --delay 0.5 > results.ndjson
+    cat urls.txt | python batch.py - -o results.ndjson
+    python batch.py urls.txt --store results.db > /dev/null
+"""
+import argparse
+import functools
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import urlparse
+import requests
+from admission import Overloaded
+from ingest import DeadlineExceeded
+from store import ResultStore
+
+# Jak dlouho nejvýš čeká běh, jehož analýzy blokují limity sdílené s jinými běhy
+IDLE_WAIT = 0.5
+# Nad kolik domén se z paměti vyhazují časy startů, které už rozestup neovlivní
+MAX_TRACKED_DOMAINS = 4096
+
+_worker_pool = None
+_worker_cache = None
+
+
+def normalize_input_url(url):
+    """Doplní chybějící schéma jako /analyze"""
+    url = url.strip()
+    if url and not url.startswith(('http://', 'https://')):
+        url = 'https://' + url
+    return url
+
+
+class AnalysisFailed(Exception):
+    """Analýza v pracovním procesu selhala; transient říká, zda má smysl ji zopakovat.
+
+    Původní výjimka se mezi procesy nepřenáší celá (chybí jí řetěz příčin),
+    proto se o opakování rozhoduje už v pracovním procesu.
+    """
+
+    def __init__(self, message, transient):
+        super().__init__(message, transient)
+        self.transient = transient
+
+    def __str__(self):
+        return self.args[0]
+
+
+def is_transient(error):
+    """Zda chybu může spravit opakování: timeout, chyba spojení, odpověď 5xx nebo 429.
+
+    Prochází i příčiny, protože analyzátor chyby stahování obaluje.
+    """
+    from scraper import TRANSIENT_ERRORS
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if isinstance(error, AnalysisFailed):
+            return error.transient
+        if isinstance(error, TRANSIENT_ERRORS + (DeadlineExceeded, BrokenProcessPool)):
+            return True
+        if isinstance(error, requests.HTTPError) and error.response is not None:
+            return error.response.status_code >= 500 or error.response.status_code == 429
+        error = error.__cause__ or error.__context__
+    return False
+
+
+def _init_worker():
+    global _worker_pool, _worker_cache
+    from http_pool import ConnectionPool
+    from http_cache import HttpCache
+    _worker_pool = ConnectionPool()
+    _worker_cache = HttpCache()
+
+
+def analyze_in_worker(url):
+    """Analyzuje jednu URL v pracovním procesu se sdíleným poolem a cache procesu"""
+    from scraper import WebAnalyzer
+    start = time.monotonic()
+    try:
+        result = WebAnalyzer(url, pool=_worker_pool, cache=_worker_cache).analyze()
+    except Exception as e:
+        raise AnalysisFailed(str(e), is_transient(e)) from None
+    return result, time.monotonic() - start
+
+
+class BatchRunner:
+    """Plánovač dávkové analýzy nad poolem procesů.
+
+    Hlídá celkový počet souběžných analýz (workers), počet souběžných analýz
+    na doménu, minimální rozestup mezi starty na stejné doméně a opakuje
+    analýzy s přechodnou chybou (is_transient) s exponenciálním odstupem.
+    Rozbitý pool (spadlý pracovní proces) nahradí novým. Výsledky vrací
+    v pořadí dokončení. Limity platí pro všechny souběžné běhy run()
+    dohromady, protože sdílejí jeden pool procesů. S řadičem přijímání
+    (admission) zabírá každá běžící analýza jedno jeho místo.
+    """
+
+    def __init__(self, workers=None, per_domain=2, delay=0.0, retries=2, backoff=1.0):
+        self.workers = workers or os.cpu_count() or 4
+        self.per_domain = per_domain
+        self.delay = delay
+        self.retries = retries
+        self.backoff = backoff
+        self._executor = None
+        self._condition = threading.Condition()
+        self._active = 0
+        self._domain_active = Counter()
+        self._domain_last_start = {}
+
+    def _new_executor(self):
+        # Fork z vícevláknového serveru by mohl zdědit zamčené zámky, proto spawn
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                   mp_context=multiprocessing.get_context('spawn'))
+
+    def _get_executor(self):
+        with self._condition:
+            if self._executor is None:
+                self._executor = self._new_executor()
+            return self._executor
+
+    def _discard_executor(self, executor):
+        """Zahodí rozbitý pool; další _get_executor() vytvoří nový (i pro ostatní běhy)"""
+        with self._condition:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def _release(self, domain, future):
+        with self._condition:
+            self._active -= 1
+            self._domain_active[domain] -= 1
+            if not self._domain_active[domain]:
+                del self._domain_active[domain]
+            self._condition.notify_all()
+
+    def _start(self, queues, running, now, admit=None):
+        """Spustí připravené analýzy v rámci sdílených limitů; vrátí čas nejbližšího odloženého startu.
+
+        Volitelný admit() před každým startem vrátí funkci uvolňující místo
+        v řadiči přijímání, nebo None, když místo není; pak se nic dalšího
+        nespustí.
+        """
+        next_ready = None
+        for domain in list(queues):
+            if self._active >= self.workers:
+                break
+            queue = queues[domain]
+            while queue and self._active < self.workers and self._domain_active[domain] < self.per_domain:
+                url, attempt, ready_at = queue[0]
+                earliest = max(ready_at, self._domain_last_start.get(domain, -self.delay) + self.delay)
+                if earliest > now:
+                    next_ready = earliest if next_ready is None else min(next_ready, earliest)
+                    break
+                release = admit() if admit is not None else None
+                if admit is not None and release is None:
+                    return next_ready
+                queue.popleft()
+                executor = self._get_executor()
+                try:
+                    future = executor.submit(analyze_in_worker, url)
+                except BrokenProcessPool:
+                    # Pool rozbil jiný běh; úloha se zadá do nového
+                    self._discard_executor(executor)
+                    executor = self._get_executor()
+                    future = executor.submit(analyze_in_worker, url)
+                running[future] = (url, attempt, domain, executor)
+                self._active += 1
+                self._domain_active[domain] += 1
+                self._domain_last_start[domain] = now
+                # Místo se uvolní i tehdy, když volající přestane číst výsledky
+                future.add_done_callback(functools.partial(self._release, domain))
+                if release is not None:
+                    future.add_done_callback(lambda _, release=release: release())
+            if not queue:
+                del queues[domain]
+        if len(self._domain_last_start) > MAX_TRACKED_DOMAINS:
+            self._domain_last_start = {domain: started for domain, started in self._domain_last_start.items()
+                                       if now - started < self.delay or domain in self._domain_active}
+        return next_ready
+
+    def run(self, urls, admission=None, client='batch'):
+        """Spustí analýzy a postupně vrací záznamy {url, status, result|error, attempts, elapsed}.
+
+        S admission si každá analýza před startem vezme místo za klienta
+        client. Dokud dávce běží jiné analýzy, bere jen volná místa bez
+        čekání; jinak se řadí do fronty řadiče. Když ji řadič odmítne, zbylé
+        URL se vrátí se status 'rejected' a důvodem reason.
+        """
+        tickets = deque()
+        blocked = []
+
+        def admit():
+            ticket = tickets.popleft() if tickets else admission.try_enter(client)
+            if ticket is None:
+                blocked.append(client)
+                return None
+            return functools.partial(admission.leave, ticket)
+
+        queues = {}
+        invalid = []
+        for url in (normalize_input_url(u) for u in urls):
+            if url:
+                try:
+                    queues.setdefault(urlparse(url).netloc, deque()).append((url, 1, 0.0))
+                except ValueError as e:
+                    invalid.append({'url': url, 'status': 'error', 'error': str(e), 'attempts': 0})
+        yield from invalid
+        running = {}
+        try:
+            while queues or running:
+                blocked.clear()
+                with self._condition:
+                    now = time.monotonic()
+                    next_ready = self._start(queues, running, now, admit if admission is not None else None)
+                    if not running and not blocked:
+                        # Čeká na uvolnění místa jiným během nebo na odložený start
+                        self._condition.wait(max((next_ready or now + IDLE_WAIT) - now, 0.01))
+                        continue
+                if not running:
+                    # Dávce nic neběží, proto se o místo řadí do fronty řadiče jako ostatní klienti
+                    try:
+                        tickets.append(admission.wait(admission.enter(client)))
+                    except Overloaded as e:
+                        for queue in queues.values():
+                            for url, attempt, _ in queue:
+                                yield {'url': url, 'status': 'rejected', 'error': str(e), 'reason': e.reason,
+                                       'attempts': attempt - 1}
+                        queues.clear()
+                    continue
+                if next_ready is None:
+                    # Místo může uvolnit i jiný běh, proto se čeká nejvýš IDLE_WAIT
+                    timeout = IDLE_WAIT if queues else None
+                else:
+                    timeout = max(next_ready - time.monotonic(), 0.01)
+                done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    url, attempt, domain, executor = running.pop(future)
+                    try:
+                        result, elapsed = future.result()
+                    except Exception as e:
+                        if isinstance(e, BrokenProcessPool):
+                            self._discard_executor(executor)
+                        if attempt <= self.retries and is_transient(e):
+                            retry_at = time.monotonic() + self.backoff * 2 ** (attempt - 1)
+                            queues.setdefault(domain, deque()).append((url, attempt + 1, retry_at))
+                            continue
+                        yield {'url': url, 'status': 'error', 'error': str(e), 'attempts': attempt}
+                        continue
+                    yield {'url': url, 'status': 'ok', 'result': result, 'attempts': attempt,
+                           'elapsed': round(elapsed, 3)}
+        finally:
+            for future in running:
+                future.cancel()
+            while tickets:
+                admission.leave(tickets.popleft())
+
+
+def read_urls(source):
+    """Načte URL ze souboru (jedna na řádek, # uvozuje komentář)"""
+    for line in source:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            yield line
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Dávková analýza URL s výstupem NDJSON')
+    parser.add_argument('input', help='soubor s URL (jedna na řádek) nebo - pro stdin')
+    parser.add_argument('-o', '--output', help='výstupní soubor (výchozí stdout)')
+    parser.add_argument('--workers', type=int, default=None, help='počet souběžných analýz (procesů)')
+    parser.add_argument('--per-domain', type=int, default=2, help='max. souběžných analýz na doménu')
+    parser.add_argument('--delay', type=float, default=0.0, help='min. rozestup startů na doméně v sekundách')
+    parser.add_argument('--retries', type=int, default=2, help='počet opakování neúspěšné analýzy')
+    parser.add_argument('--store', help='uložit výsledky do úložiště analýz (cesta k SQLite)')
+    args = parser.parse_args(argv)
+
+    source = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    output = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    runner = BatchRunner(workers=args.workers, per_domain=args.per_domain, delay=args.delay, retries=args.retries)
+    store = ResultStore(args.store) if args.store else None
+    try:
+        for record in runner.run(list(read_urls(source))):
+            if store is not None and record['status'] == 'ok':
+                store.add(record['url'], record['result'])
+            output.write(json.dumps(record, ensure_ascii=False) + '\n')
+            output.flush()
+    finally:
+        runner.close()
+        if store is not None:
+            store.close()
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+"""Korpus stránek pro offline benchmarky.
+
+Korpus je adresář s manifest.json a soubory v files/<web>/...:
+    python benchmarks/corpus.py generate benchmarks/corpus
+    python benchmarks/corpus.py record benchmarks/corpus https://example.com https://getbootstrap.com
+
+generate vytvoří syntetické weby (velký minifikovaný bundle, hluboký řetězec
+@importů, stránka s 12 000 odkazy, design system s mnoha styly, sada ikon).
+record stáhne skutečné stránky se styly, fonty a ikonami a přepíše jejich
+absolutní i kořenové odkazy na lokální cesty korpusu.
+"""
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+from io import BytesIO
+from urllib.parse import urljoin, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from css_index_bench import synthetic_bundle, design_system_bundle
+
+TEXT_TYPES = ('text/html', 'text/css')
+# Kořenové odkazy (/cesta) v atributech, url() a @import, které je při záznamu potřeba přesměrovat
+ROOT_RELATIVE_PATTERN = re.compile(r'''((?:href|src|content)\s*=\s*["']?|url\(\s*["']?|@import\s+["'])/(?!/)''', re.I)
+FONT_URL_PATTERN = re.compile(r'url\(\s*["\']?([^)"\']+)["\']?\s*\)', re.I)
+
+
+class CorpusWriter:
+    def __init__(self, corpus_dir):
+        self.corpus_dir = corpus_dir
+        self.manifest = {'sites': {}, 'files': {}}
+        path = os.path.join(corpus_dir, 'manifest.json')
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self.manifest = json.load(f)
+
+    def add(self, path, content, content_type=None, headers=None):
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        full_path = os.path.join(self.corpus_dir, 'files', path.lstrip('/'))
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, 'wb') as f:
+            f.write(content)
+        entry = {}
+        if content_type:
+            entry['content_type'] = content_type
+        if headers:
+            entry['headers'] = headers
+        self.manifest['files'][path] = entry
+
+    def add_site(self, name, entry_path):
+        self.manifest['sites'][name] = entry_path
+
+    def save(self):
+        os.makedirs(self.corpus_dir, exist_ok=True)
+        with open(os.path.join(self.corpus_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=1, sort_keys=True)
+
+
+def _png(size, color):
+    from PIL import Image
+    buffer = BytesIO()
+    Image.new('RGB', (size, size), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def _page(title, head='', body=''):
+    return (f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{title}</title>'
+            f'<meta name="description" content="{title} - benchmark fixture">{head}</head>'
+            f'<body>{body}</body></html>')
+
+
+def generate(corpus_dir, seed=7):
+    """Vytvoří syntetický korpus"""
+    rng = random.Random(seed)
+    writer = CorpusWriter(corpus_dir)
+
+    # Velký minifikovaný bundle frameworku
+    writer.add('/framework/css/bundle.min.css', synthetic_bundle(3 * 1024 * 1024), 'text/css')
+    writer.add('/framework/favicon.ico', _png(32, (13, 110, 253)), 'image/x-icon')
+    anchors = ''.join(f'<a href="/docs/{i}" class="nav-link">Docs {i}</a>' for i in range(300))
+    writer.add('/framework/index.html', _page(
+        'Framework', '<link rel="stylesheet" href="css/bundle.min.css"><meta name="theme-color" content="#0d6efd">',
+        f'<h1>Framework</h1><nav>{anchors}</nav>'), 'text/html')
+    writer.add_site('framework', '/framework/index.html')
+
+    # Hluboký řetězec @importů s fonty
+    depth = 6
+    for level in range(depth):
+        next_import = f'@import url("level{level + 1}.css");' if level + 1 < depth else ''
+        faces = ''.join(f'@font-face{{font-family:"Level{level}";src:url(../fonts/level{level}-{w}.woff2) '
+                        f'format("woff2");font-weight:{w}}}' for w in (400, 700))
+        rules = ''.join(f'.l{level}-{i}{{color:#{rng.randrange(0xffffff):06x};font-family:"Level{level}",sans-serif}}'
+                        for i in range(500))
+        writer.add(f'/imports/css/level{level}.css', next_import + faces + rules, 'text/css')
+        for w in (400, 700):
+            writer.add(f'/imports/fonts/level{level}-{w}.woff2', os.urandom(20000), 'font/woff2')
+    writer.add('/imports/index.html', _page(
+        'Imports', '<link rel="stylesheet" href="css/level0.css"><link rel="icon" href="icon.png">',
+        '<h1>Imports</h1>'), 'text/html')
+    writer.add('/imports/icon.png', _png(64, (200, 40, 40)), 'image/png')
+    writer.add_site('imports', '/imports/index.html')
+
+    # Stránka s 12 000 odkazy a inline styly
+    links = []
+    for i in range(12000):
+        href = f'https://external{i % 50}.example/page/{i}' if i % 3 == 0 else f'/anchors/page/{i}'
+        links.append(f'<li style="margin:{i % 7}px"><a href="{href}" title="Link {i}">Link <b>{i}</b></a></li>')
+    writer.add('/anchors/index.html', _page(
+        'Anchors', '<style>body{background:#fafafa;font-family:Inter,sans-serif}a{color:#0645ad}</style>',
+        f'<h1>Anchors</h1><ul>{"".join(links)}</ul>'), 'text/html')
+    writer.add_site('anchors', '/anchors/index.html')
+
+    # Design system rozdělený do mnoha stylů
+    sheets = []
+    for i in range(8):
+        writer.add(f'/design-system/css/part{i}.css', design_system_bundle(128 * 1024, seed=i), 'text/css')
+        sheets.append(f'<link rel="stylesheet" href="css/part{i}.css">')
+    writer.add('/design-system/index.html', _page(
+        'Design system', ''.join(sheets) + '<style>:root{--primary-color:#6750a4;--secondary-color:#625b71}'
+        '.btn-primary{background:var(--primary-color);border-radius:20px}</style>',
+        '<h1>Design system</h1>'), 'text/html')
+    writer.add_site('design-system', '/design-system/index.html')
+
+    # Sada ikon a splash obrázků
+    head = ['<meta name="theme-color" content="#222222">',
+            '<meta name="apple-mobile-web-app-status-bar-style" content="black">']
+    for size in (16, 32, 96, 192, 512):
+        writer.add(f'/icons/icon-{size}.png', _png(size, (34, 34, 34)), 'image/png')
+        head.append(f'<link rel="icon" sizes="{size}x{size}" href="icon-{size}.png">')
+    for size in (120, 152, 180):
+        writer.add(f'/icons/apple-{size}.png', _png(size, (240, 240, 240)), 'image/png')
+        head.append(f'<link rel="apple-touch-icon" sizes="{size}x{size}" href="apple-{size}.png">')
+    writer.add('/icons/splash.png', _png(1024, (34, 34, 34)), 'image/png')
+    head.append('<link rel="apple-touch-startup-image" media="(device-width: 1024px)" href="splash.png">')
+    writer.add('/icons/index.html', _page('Icons', ''.join(head), '<h1>Icons</h1>'), 'text/html')
+    writer.add_site('icons', '/icons/index.html')
+
+    writer.save()
+    return writer.manifest
+
+
+def _local_path(site, url):
+    parts = urlsplit(url)
+    path = parts.path or '/'
+    if path.endswith('/'):
+        path += 'index.html'
+    if parts.query:
+        path += '__q' + hashlib.sha1(parts.query.encode()).hexdigest()[:8]
+    return f'/{site}/{parts.netloc.replace(":", "_")}{path}'
+
+
+def _rewrite(text, site, url, recorded):
+    """Přepíše odkazy na zaznamenané URL a kořenové cesty na lokální cesty korpusu"""
+    host = urlsplit(url).netloc.replace(':', '_')
+    text = ROOT_RELATIVE_PATTERN.sub(lambda m: f'{m.group(1)}/{site}/{host}/', text)
+    for original in sorted(recorded, key=len, reverse=True):
+        local = _local_path(site, original)
+        text = text.replace(original, local)
+        scheme_relative = original.split(':', 1)[1]
+        text = text.replace(scheme_relative, local)
+    return text
+
+
+def record(corpus_dir, url, site=None, max_bytes=5 * 1024 * 1024):
+    """Zaznamená skutečnou stránku: HTML, styly (včetně @importů), fonty a ikony"""
+    from scraper import WebAnalyzer
+    site = site or urlsplit(url).netloc.replace(':', '_')
+    analyzer = WebAnalyzer(url)
+    analyzer.fetch_page()
+    analyzer.prefetch_assets()
+    bodies = {analyzer.base_url: (analyzer.page_content, 'text/html')}
+    for resource_url, resource in analyzer.resources.resources.items():
+        if resource:
+            bodies[resource['final_url'] or resource_url] = (resource['text'].encode('utf-8'), 'text/css')
+    binary_urls = set()
+    for face in analyzer.get_css_index().font_faces:
+        for match in FONT_URL_PATTERN.findall(face['css']):
+            if not match.startswith('data:'):
+                binary_urls.add(urljoin(face['base'] or analyzer.base_url, match))
+    for link in analyzer.page.find_links(r'icon|apple-touch-icon|apple-touch-startup-image|shortcut'):
+        if link.get('href'):
+            binary_urls.add(urljoin(analyzer.base_url, link['href']))
+    binary_urls.add(urljoin(analyzer.base_url, '/favicon.ico'))
+    for binary_url in binary_urls - set(bodies):
+        try:
+            response = analyzer.http_get(binary_url, timeout=10)
+        except Exception:
+            continue
+        if response.status_code == 200 and len(response.content) <= max_bytes:
+            bodies[binary_url] = (response.content, response.headers.get('content-type'))
+
+    writer = CorpusWriter(corpus_dir)
+    for body_url, (content, content_type) in bodies.items():
+        if content_type and content_type.split(';')[0].strip() in TEXT_TYPES:
+            text = content.decode('utf-8', errors='replace')
+            content = _rewrite(text, site, body_url, bodies).encode('utf-8')
+        writer.add(_local_path(site, body_url), content, content_type)
+    writer.add_site(site, _local_path(site, analyzer.base_url))
+    writer.save()
+    return site, len(bodies)
+
+
+def main(argv):
+    if len(argv) < 2 or argv[0] not in ('generate', 'record'):
+        print(__doc__)
+        return 2
+    command, corpus_dir, urls = argv[0], argv[1], argv[2:]
+    if command == 'generate':
+        manifest = generate(corpus_dir)
+        print(f'{len(manifest["sites"])} webů, {len(manifest["files"])} souborů v {corpus_dir}')
+        return 0
+    for url in urls:
+        try:
+            site, count = record(corpus_dir, url)
+            print(f'{url}: {count} souborů jako {site}')
+        except Exception as e:
+            print(f'{url}: chyba záznamu: {e}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,128 @@
+"""Porovnání původních regexových průchodů CSS s jednorázovým CssIndex.
+
+Použití:
+    python benchmarks/css_index_bench.py                  # syntetický bundle
+    python benchmarks/css_index_bench.py bootstrap.min.css tailwind.css
+"""
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from css_index import CssIndex
+
+# Vzory, které extraktory spouštěly nad celým spojeným CSS před zavedením indexu
+LEGACY_PATTERNS = [
+    r'(?:body|html)[^{]*\{[^}]*background(?:-color)?:\s*([^;]+)',
+    r'background(?:-color)?:\s*([^;]+)',
+] + [
+    rf'{re.escape(selector)}[^{{]*\{{[^}}]*background(?:-color)?:\s*([^;]+)'
+    for selector in ['body', 'html', '#app', '#root', '.app', '.main', '.container']
+] + [
+    r'@font-face\s*\{[^}]+\}',
+] + [
+    rf'{re.escape(selector)}[^{{]*\{{[^}}]*font-family:\s*["\']?([^;"\']+)["\']?'
+    for selector in ['body', 'html', 'h1', 'h2', 'h3', '.heading', '.title', '.text', 'p']
+] + [
+    r'--([^:]+):\s*([^;]+)',
+    r'\.primary[^{}]*\{[^}]*color:\s*([^;]+)',
+    r'\.btn-primary[^{}]*\{[^}]*background(?:-color)?:\s*([^;]+)',
+    r'\.primary-color[^{}]*\{[^}]*color:\s*([^;]+)',
+    r'\.secondary[^{}]*\{[^}]*color:\s*([^;]+)',
+    r'\.btn-secondary[^{}]*\{[^}]*background(?:-color)?:\s*([^;]+)',
+    r'\.secondary-color[^{}]*\{[^}]*color:\s*([^;]+)',
+    r'\.tertiary[^{}]*\{[^}]*color:\s*([^;]+)',
+    r'\.btn-tertiary[^{}]*\{[^}]*background(?:-color)?:\s*([^;]+)',
+    r'button[^{}]*\{[^}]*background(?:-color)?:\s*([^;]+)',
+    r'\.btn[^{}]*\{[^}]*background(?:-color)?:\s*([^;]+)',
+    r'a[^{}]*\{[^}]*color:\s*([^;]+)',
+    r'box-shadow:\s*([^;]+)',
+    r'border(?:-width)?:\s*([^;]+)',
+    r'border-color:\s*([^;]+)',
+    r'border-radius:\s*([^;]+)',
+    r'gap:\s*([^;]+)',
+    r'margin:\s*([^;]+)',
+]
+
+
+def synthetic_bundle(target_bytes=3 * 1024 * 1024, seed=1):
+    """Vygeneruje minifikovaný bundle podobný velkým UI frameworkům"""
+    rng = random.Random(seed)
+    props = ['display:flex', 'padding:.5rem 1rem', 'margin:0 auto', 'color:#{:06x}',
+             'background-color:rgba({},{},{},.5)', 'border:1px solid #{:06x}', 'border-radius:.25rem',
+             'box-shadow:0 1px 2px rgba(0,0,0,.05)', 'font-size:.875rem', 'line-height:1.5',
+             'transition:color .15s ease-in-out', 'gap:.75rem', '--tw-ring-color:#{:06x}']
+    parts = [':root{--primary-color:#0d6efd;--secondary-color:#6c757d}']
+    size = len(parts[0])
+    counter = 0
+    while size < target_bytes:
+        counter += 1
+        selector = '.c{0}-{1},.c{0}-{1}:hover>.x'.format(rng.choice('abcdefghijklmnopqrstuvwxyz'), counter)
+        declarations = []
+        for prop in rng.sample(props, 5):
+            declarations.append(prop.format(rng.randrange(0xffffff), rng.randrange(256),
+                                            rng.randrange(256), rng.randrange(256))
+                                if '{' in prop else prop)
+        rule = selector + '{' + ';'.join(declarations) + '}'
+        if counter % 50 == 0:
+            rule = '@media (min-width:768px){' + rule + '}'
+        parts.append(rule)
+        size += len(rule)
+    return ''.join(parts)
+
+
+def design_system_bundle(target_bytes=3 * 1024 * 1024, seed=2):
+    """Vygeneruje bundle s dlouhými bloky vlastních vlastností (design tokeny)"""
+    rng = random.Random(seed)
+    parts = []
+    size = 0
+    counter = 0
+    while size < target_bytes:
+        counter += 1
+        tokens = ';'.join(f'--ds-{name}-{counter}-{i}:var(--ds-base-{i},#{rng.randrange(0xffffff):06x})'
+                          for i, name in enumerate(['space', 'radius', 'shadow', 'surface', 'accent'] * 8))
+        rule = f'[data-theme=t{counter}] .panel-{counter},.panel-{counter}>a{{{tokens}}}'
+        parts.append(rule)
+        size += len(rule)
+    return ''.join(parts)
+
+
+def bench_legacy(css_text):
+    start = time.perf_counter()
+    for pattern in LEGACY_PATTERNS:
+        re.findall(pattern, css_text, re.I)
+    return time.perf_counter() - start
+
+
+def bench_index(css_text):
+    start = time.perf_counter()
+    index = CssIndex()
+    index.add_source(css_text)
+    index.selector_values(('body', 'html'), ('background', 'background-color'))
+    index.values('background', 'background-color')
+    for token in ['#app', '#root', '.app', '.main', '.container', '.heading', '.title', '.text', 'p',
+                  '.primary', '.btn-primary', '.secondary', '.btn', 'button', 'a']:
+        index.selector_values((token,), ('color', 'background', 'background-color', 'font-family'))
+    for prop in ['box-shadow', 'border', 'border-color', 'border-radius', 'gap', 'margin']:
+        index.first(prop)
+    return time.perf_counter() - start
+
+
+def main(paths):
+    bundles = [(path, open(path, encoding='utf-8', errors='replace').read()) for path in paths]
+    if not bundles:
+        bundles = [('synthetic framework 3 MB', synthetic_bundle()),
+                   ('synthetic design system 3 MB', design_system_bundle())]
+    for name, css_text in bundles:
+        legacy = bench_legacy(css_text)
+        indexed = bench_index(css_text)
+        print(f'{name}: {len(css_text) / 1024:.0f} KiB')
+        print(f'  regex scans: {legacy * 1000:9.1f} ms')
+        print(f'  CssIndex:    {indexed * 1000:9.1f} ms  ({legacy / indexed:.1f}x)')
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,124 @@
+"""Lokální HTTP server, který servíruje zaznamenaný korpus stránek.
+
+Soubory leží v <korpus>/files/<cesta>, typy obsahu a hlavičky v
+<korpus>/manifest.json. Server počítá požadavky a odeslané bajty podle webu
+(první segment cesty); GET /__stats je vrátí a vynuluje. S latency server
+každou odpověď zdrží, aby se dal simulovat pomalý web.
+"""
+import json
+import mimetypes
+import os
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+
+def load_manifest(corpus_dir):
+    with open(os.path.join(corpus_dir, 'manifest.json'), encoding='utf-8') as f:
+        return json.load(f)
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def do_GET(self):
+        if self.path == '/__stats':
+            body = json.dumps(self.server.take_stats()).encode()
+            self._send(200, body, 'application/json')
+            return
+        self._serve(send_body=True)
+
+    def _send(self, status, body, content_type, headers=None, send_body=True):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def _serve(self, send_body):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        path = unquote(urlsplit(self.path).path)
+        site = path.strip('/').split('/', 1)[0]
+        entry = self.server.files.get(path)
+        if entry is None and path.endswith('/'):
+            path += 'index.html'
+            entry = self.server.files.get(path)
+        if entry is None:
+            self.server.count(site, 0)
+            self._send(404, b'', 'text/plain', send_body=send_body)
+            return
+        with open(os.path.join(self.server.root, path.lstrip('/')), 'rb') as f:
+            body = f.read()
+        content_type = entry.get('content_type') or mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.server.count(site, len(body) if send_body else 0)
+        self._send(200, body, content_type, entry.get('headers'), send_body)
+
+
+class FixtureServer(ThreadingHTTPServer):
+    """Server korpusu na náhodném volném portu, běžící ve vlákně na pozadí"""
+
+    daemon_threads = True
+    # Zátěžové testy otevírají stovky spojení najednou
+    request_queue_size = 1024
+
+    def __init__(self, corpus_dir, host='127.0.0.1', port=0, latency=0.0):
+        super().__init__((host, port), FixtureHandler)
+        self.latency = latency
+        self.corpus_dir = corpus_dir
+        self.root = os.path.join(corpus_dir, 'files')
+        self.manifest = load_manifest(corpus_dir)
+        self.files = self.manifest['files']
+        self.requests = Counter()
+        self.bytes = Counter()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def site_url(self, site):
+        return self.base_url + self.manifest['sites'][site]
+
+    def count(self, site, size):
+        with self._lock:
+            self.requests[site] += 1
+            self.bytes[site] += size
+
+    def take_stats(self):
+        with self._lock:
+            stats = {'requests': dict(self.requests), 'bytes': dict(self.bytes)}
+            self.requests.clear()
+            self.bytes.clear()
+        return stats
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == '__main__':
+    import sys
+    corpus = sys.argv[1] if len(sys.argv) > 1 else os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpus')
+    server = FixtureServer(corpus, port=int(sys.argv[2]) if len(sys.argv) > 2 else 8000)
+    for name in server.manifest['sites']:
+        print(f'{name}: {server.site_url(name)}')
+    server.serve_forever()
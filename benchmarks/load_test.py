@@ -0,0 +1,224 @@
+"""Zátěžový test /analyze: synchronní server (Flask) proti ASGI režimu.
+
+Použití:
+    python benchmarks/load_test.py                                  # oba režimy, 200 požadavků, 100 souběžně
+    python benchmarks/load_test.py --requests 500 --concurrency 300 --latency 1.0
+    python benchmarks/load_test.py --modes async --sites framework icons --save load.json
+
+Korpus servíruje lokální server, který každou odpověď zdrží o --latency
+sekund (pomalé weby). Každý režim běží v samostatném procesu serveru;
+synchronní server má pevný počet vláken (--sync-threads) jako obvyklé
+nasazení WSGI. Každý požadavek míří na jinou URL a s refresh, takže se
+pokaždé provede celá analýza. Vypisuje propustnost, percentily latence,
+špičku vláken a RSS procesu serveru a u ASGI i nejvyšší počet souběžně
+rozběhnutých analýz.
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from socketserver import ThreadingMixIn
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+
+from fixture_server import FixtureServer
+from suite import DEFAULT_CORPUS, percentiles
+
+MODES = ('sync', 'async')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def serve_sync(port, threads):
+    """Obslouží aplikaci Flask pevným poolem vláken (jako synchronní WSGI server s N vlákny)"""
+    from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+    from app import app
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+    class PooledWSGIServer(ThreadingMixIn, WSGIServer):
+        executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='wsgi')
+        request_queue_size = 1024
+
+        def process_request(self, request, client_address):
+            self.executor.submit(self.process_request_thread, request, client_address)
+
+    server = PooledWSGIServer(('127.0.0.1', port), QuietHandler)
+    server.set_app(app)
+    server.serve_forever()
+
+
+def start_server(mode, port, sync_threads):
+    env = dict(os.environ, RESULT_STORE='off', RESULT_CACHE_TTL='0')
+    if mode == 'sync':
+        command = [sys.executable, os.path.abspath(__file__), '--serve-sync', str(port),
+                   '--sync-threads', str(sync_threads)]
+    else:
+        command = [sys.executable, '-m', 'uvicorn', 'asgi:application', '--host', '127.0.0.1',
+                   '--port', str(port), '--log-level', 'warning', '--backlog', '1024']
+    process = subprocess.Popen(command, cwd=ROOT_DIR, env=env)
+    import requests
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f'http://127.0.0.1:{port}/stats', timeout=1).status_code == 200:
+                return process
+        except requests.RequestException:
+            pass
+        if process.poll() is not None:
+            break
+        time.sleep(0.2)
+    process.kill()
+    raise Exception(f"Server režimu {mode} se nespustil")
+
+
+class ProcessSampler:
+    """Průběžně sleduje počet vláken a RSS procesu (Linux /proc)"""
+
+    def __init__(self, pid, interval=0.05):
+        self.pid = pid
+        self.interval = interval
+        self.peak_threads = 0
+        self.peak_rss_kb = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                with open(f'/proc/{self.pid}/status') as f:
+                    for line in f:
+                        if line.startswith('Threads:'):
+                            self.peak_threads = max(self.peak_threads, int(line.split()[1]))
+                        elif line.startswith('VmRSS:'):
+                            self.peak_rss_kb = max(self.peak_rss_kb, int(line.split()[1]))
+            except OSError:
+                pass
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_load(base_url, urls, concurrency, timeout):
+    import requests
+    local = threading.local()
+
+    def one(url):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        start = time.perf_counter()
+        try:
+            response = session.post(base_url + '/analyze', json={'url': url, 'refresh': True}, timeout=timeout)
+            ok = response.status_code == 200
+        except requests.RequestException:
+            ok = False
+        return ok, time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        outcomes = list(executor.map(one, urls))
+    return outcomes, time.perf_counter() - start
+
+
+def measure(mode, fixtures, sites, args):
+    import requests
+    port = free_port()
+    process = start_server(mode, port, args.sync_threads)
+    base_url = f'http://127.0.0.1:{port}'
+    urls = [f'{fixtures.site_url(sites[i % len(sites)])}?load={i}' for i in range(args.requests)]
+    try:
+        # Zahřátí (importy, první spojení) se nepočítá
+        run_load(base_url, urls[:len(sites)], len(sites), args.timeout)
+        with ProcessSampler(process.pid) as sampler:
+            outcomes, elapsed = run_load(base_url, urls, args.concurrency, args.timeout)
+        server_stats = None
+        if mode == 'async':
+            server_stats = requests.get(base_url + '/stats/async', timeout=5).json()
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    latencies = [latency for ok, latency in outcomes if ok]
+    return {
+        'requests': len(outcomes),
+        'errors': sum(1 for ok, latency in outcomes if not ok),
+        'elapsed_s': round(elapsed, 2),
+        'throughput_rps': round(len(latencies) / elapsed, 2),
+        'latency': percentiles(latencies) if latencies else None,
+        'peak_threads': sampler.peak_threads,
+        'peak_rss_kb': sampler.peak_rss_kb,
+        'peak_in_flight': server_stats['peak_in_flight'] if server_stats else None,
+    }
+
+
+def print_report(results):
+    for mode, data in results.items():
+        latency = data['latency'] or {}
+        print(f'{mode}')
+        print(f'  {data["requests"]} požadavků, {data["errors"]} chyb, {data["elapsed_s"]} s, '
+              f'{data["throughput_rps"]} analýz/s')
+        print(f'  latence p50 {latency.get("p50_ms", 0):9.1f} ms  p90 {latency.get("p90_ms", 0):9.1f} ms  '
+              f'p99 {latency.get("p99_ms", 0):9.1f} ms')
+        in_flight = f', souběžných analýz {data["peak_in_flight"]}' if data['peak_in_flight'] is not None else ''
+        print(f'  špička vláken {data["peak_threads"]}, RSS {data["peak_rss_kb"] / 1024:.0f} MiB{in_flight}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Zátěžový test /analyze: synchronní server proti ASGI')
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS, help='adresář korpusu (výchozí benchmarks/corpus)')
+    parser.add_argument('--sites', nargs='*', help='weby korpusu, na které míří požadavky')
+    parser.add_argument('--modes', nargs='*', choices=MODES, default=list(MODES), help='měřené režimy')
+    parser.add_argument('--requests', type=int, default=200, help='počet požadavků na režim')
+    parser.add_argument('--concurrency', type=int, default=100, help='počet souběžných klientů')
+    parser.add_argument('--latency', type=float, default=0.5, help='zdržení každé odpovědi korpusu v sekundách')
+    parser.add_argument('--sync-threads', type=int, default=32, help='počet vláken synchronního serveru')
+    parser.add_argument('--timeout', type=float, default=120, help='časový limit jednoho požadavku')
+    parser.add_argument('--save', help='uložit výsledky do JSON souboru')
+    parser.add_argument('--serve-sync', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.serve_sync:
+        serve_sync(args.serve_sync, args.sync_threads)
+        return 0
+    if not os.path.exists(os.path.join(args.corpus, 'manifest.json')):
+        from corpus import generate
+        print(f'Generuji syntetický korpus do {args.corpus}')
+        generate(args.corpus)
+
+    fixtures = FixtureServer(args.corpus, latency=args.latency)
+    fixtures.start()
+    sites = args.sites or sorted(fixtures.manifest['sites'])
+    results = {}
+    try:
+        for mode in args.modes:
+            results[mode] = measure(mode, fixtures, sites, args)
+    finally:
+        fixtures.stop()
+    print_report(results)
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
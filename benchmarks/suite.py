@@ -0,0 +1,192 @@
+"""Offline benchmark WebAnalyzer nad lokálním korpusem.
+
+Použití:
+    python benchmarks/suite.py                              # vygeneruje korpus, je-li potřeba, a změří ho
+    python benchmarks/suite.py --iterations 10 --save baseline.json
+    python benchmarks/suite.py --baseline baseline.json --threshold 0.15
+    python benchmarks/suite.py --corpus recorded/ --sites framework anchors
+
+Každý web se měří v samostatném procesu, aby špička RSS patřila jen jemu.
+Pro analyze() i jednotlivé extract_* metody vypisuje percentily latence,
+dále počet požadavků a přenesené bajty na jednu analýzu (počítané serverem)
+a špičku RSS. S --baseline porovná výsledky s uloženými a skončí kódem 1,
+pokud některá metrika překročí práh.
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from fixture_server import FixtureServer
+
+DEFAULT_CORPUS = os.path.join(BENCH_DIR, 'corpus')
+# Metriky porovnávané s baseline: (cesta, popis)
+COMPARED_METRICS = [
+    (('analyze', 'p50_ms'), 'analyze p50'),
+    (('analyze', 'p90_ms'), 'analyze p90'),
+    (('requests',), 'requests'),
+    (('bytes',), 'bytes'),
+    (('peak_rss_kb',), 'peak RSS'),
+]
+
+
+def percentiles(samples):
+    """Percentily metodou nejbližšího pořadí, v milisekundách"""
+    ordered = sorted(samples)
+
+    def rank(p):
+        return ordered[max(0, min(len(ordered) - 1, int(round(p / 100 * len(ordered) + 0.5)) - 1))]
+
+    return {
+        'p50_ms': round(rank(50) * 1000, 2),
+        'p90_ms': round(rank(90) * 1000, 2),
+        'p99_ms': round(rank(99) * 1000, 2),
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 2),
+    }
+
+
+def _take_server_stats(session, base_url, site):
+    stats = session.get(base_url + '/__stats', timeout=10).json()
+    return stats['requests'].get(site, 0), stats['bytes'].get(site, 0)
+
+
+def measure_site(base_url, site, url, iterations, warmup):
+    """Změří jeden web; běží v samostatném procesu"""
+    import requests
+    from http_pool import ConnectionPool
+    from scraper import WebAnalyzer, EXTRACTORS
+
+    control = requests.Session()
+    pool = ConnectionPool()
+    for _ in range(warmup):
+        WebAnalyzer(url, pool=pool).analyze()
+    _take_server_stats(control, base_url, site)
+
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        WebAnalyzer(url, pool=pool).analyze()
+        samples.append(time.perf_counter() - start)
+    requests_total, bytes_total = _take_server_stats(control, base_url, site)
+
+    # Extraktory zvlášť nad už staženou stránkou; index CSS se staví jako samostatný krok
+    steps = {'css_index': []}
+    steps.update((method, []) for field, method in EXTRACTORS)
+    for _ in range(iterations):
+        analyzer = WebAnalyzer(url, pool=pool)
+        analyzer.fetch_page()
+        analyzer.prefetch_assets()
+        start = time.perf_counter()
+        analyzer.get_css_index()
+        steps['css_index'].append(time.perf_counter() - start)
+        for field, method in EXTRACTORS:
+            start = time.perf_counter()
+            getattr(analyzer, method)()
+            steps[method].append(time.perf_counter() - start)
+    pool.close()
+
+    return {
+        'analyze': percentiles(samples),
+        'extractors': {name: percentiles(values) for name, values in steps.items()},
+        'requests': round(requests_total / iterations, 2),
+        'bytes': round(bytes_total / iterations),
+        'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def run(corpus_dir, sites=None, iterations=5, warmup=1):
+    server = FixtureServer(corpus_dir).start()
+    results = {}
+    try:
+        for site in sites or sorted(server.manifest['sites']):
+            # Nový proces pro každý web, aby se neslučovala špička paměti
+            with ProcessPoolExecutor(max_workers=1) as executor:
+                future = executor.submit(measure_site, server.base_url, site, server.site_url(site),
+                                         iterations, warmup)
+                results[site] = future.result()
+    finally:
+        server.stop()
+    return results
+
+
+def _lookup(data, path):
+    for key in path:
+        data = data.get(key) if isinstance(data, dict) else None
+    return data
+
+
+def compare(results, baseline, threshold):
+    """Vrátí seznam regresí proti baseline (zhoršení o více než threshold)"""
+    regressions = []
+    for site, data in results.items():
+        base = baseline.get(site)
+        if not base:
+            continue
+        metrics = list(COMPARED_METRICS) + [
+            (('extractors', name, 'p50_ms'), f'{name} p50') for name in data['extractors']
+        ]
+        for path, label in metrics:
+            new, old = _lookup(data, path), _lookup(base, path)
+            if new is None or not old:
+                continue
+            # Velmi krátké časy kolísají, proto se porovnávají až od 1 ms
+            if path[-1].endswith('_ms') and max(new, old) < 1:
+                continue
+            change = (new - old) / old
+            if change > threshold:
+                regressions.append((site, label, old, new, change))
+    return regressions
+
+
+def print_report(results):
+    for site, data in results.items():
+        analyze = data['analyze']
+        print(f'{site}')
+        print(f'  analyze      p50 {analyze["p50_ms"]:9.1f} ms  p90 {analyze["p90_ms"]:9.1f} ms  '
+              f'p99 {analyze["p99_ms"]:9.1f} ms')
+        print(f'  requests {data["requests"]:g}, bytes {data["bytes"] / 1024:.0f} KiB, '
+              f'peak RSS {data["peak_rss_kb"] / 1024:.0f} MiB')
+        for name, values in data['extractors'].items():
+            print(f'    {name:<24} p50 {values["p50_ms"]:9.2f} ms  p90 {values["p90_ms"]:9.2f} ms')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Offline benchmark WebAnalyzer nad lokálním korpusem')
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS, help='adresář korpusu (výchozí benchmarks/corpus)')
+    parser.add_argument('--sites', nargs='*', help='měřit jen vybrané weby')
+    parser.add_argument('--iterations', type=int, default=5, help='počet měřených analýz na web')
+    parser.add_argument('--warmup', type=int, default=1, help='počet neměřených analýz před měřením')
+    parser.add_argument('--save', help='uložit výsledky jako baseline do JSON souboru')
+    parser.add_argument('--baseline', help='porovnat s baseline z JSON souboru')
+    parser.add_argument('--threshold', type=float, default=0.2, help='povolené zhoršení proti baseline (0.2 = 20 %%)')
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(os.path.join(args.corpus, 'manifest.json')):
+        from corpus import generate
+        print(f'Generuji syntetický korpus do {args.corpus}')
+        generate(args.corpus)
+
+    results = run(args.corpus, args.sites, args.iterations, args.warmup)
+    print_report(results)
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for site, label, old, new, change in regressions:
+            print(f'REGRESE {site}: {label} {old:g} -> {new:g} (+{change * 100:.0f} %)')
+        if regressions:
+            return 1
+        print('Bez regresí proti baseline')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
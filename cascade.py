@@ -0,0 +1,678 @@
+import re
+from bs4.dammit import EncodingDetector
+from lxml import etree, html as lxml_html
+from css_vars import substitute, MAX_VAR_DEPTH
+from palette import HEX_PATTERN, FUNCTION_PATTERN, NAMED_COLORS
+
+# Šířka okna, pro kterou se vyhodnocují @media (desktop)
+VIEWPORT_WIDTH = 1280
+# Vlastnosti, které prvek dědí od rodiče, pokud je sám nedeklaruje
+INHERITED_PROPERTIES = {
+    'color', 'font', 'font-family', 'font-size', 'font-style', 'font-variant', 'font-weight', 'font-stretch',
+    'line-height', 'letter-spacing', 'word-spacing', 'text-align', 'text-indent', 'text-transform',
+    'text-shadow', 'white-space', 'visibility', 'cursor', 'direction', 'list-style', 'list-style-type',
+    'quotes', 'caret-color', 'accent-color', 'color-scheme',
+}
+# Pseudotřídy stavu a pseudoelementy; výchozí vzhled prvku neovlivňují
+STATE_PSEUDO_CLASSES = {
+    'hover', 'focus', 'active', 'visited', 'focus-visible', 'focus-within', 'target', 'checked',
+    'indeterminate', 'placeholder-shown', 'autofill', '-webkit-autofill', 'invalid', 'valid',
+    'user-invalid', 'user-valid', 'open', 'modal', 'fullscreen', 'popover-open', 'current', 'past', 'future',
+}
+PSEUDO_ELEMENTS = {'before', 'after', 'first-line', 'first-letter', 'selection', 'placeholder', 'marker', 'backdrop'}
+# Klíčové prvky stránky a náhradní prvky, které se vloží do <body>, když na stránce chybí
+ROLES = ['body', 'h1', 'h2', 'h3', 'paragraph', 'button', 'link', 'card']
+PROBES = {
+    'h1': ('h1', {}),
+    'h2': ('h2', {}),
+    'h3': ('h3', {}),
+    'paragraph': ('p', {}),
+    'button': ('button', {'class': 'btn'}),
+    'link': ('a', {'href': '#'}),
+    'card': ('div', {'class': 'card'}),
+}
+MAX_ROLE_ELEMENTS = 5
+# Tagy klíčových prvků a role, po jejímž naplnění se procházení tagu ukončí
+ROLE_TAGS = {'body': 'body', 'h1': 'h1', 'h2': 'h2', 'h3': 'h3', 'p': 'paragraph', 'button': 'button',
+             'a': 'link', 'input': 'button'}
+# Atributy tříd a rolí; výsledky XPath jsou řetězce s odkazem na prvek (getparent)
+ROLE_ATTRIBUTES_XPATH = etree.XPath('//@class | //@role')
+
+SIMPLE_PATTERN = re.compile(r'''
+    (?P<tag>\*|[a-zA-Z][\w-]*)
+  | \#(?P<id>(?:[\w-]|\\.)+)
+  | \.(?P<cls>(?:[\w-]|\\.)+)
+  | \[\s*(?P<attr>[\w:-]+)\s*(?:(?P<op>[~|^$*]?=)\s*(?:"(?P<dq>[^"]*)"|'(?P<sq>[^']*)'|(?P<bare>[^\]\s]+))\s*(?P<flag>[iIsS])?\s*)?\]
+  | (?P<pseudo>::?[\w-]+)(?:\((?P<arg>(?:[^()]|\((?:[^()]|\([^()]*\))*\))*)\))?
+''', re.X)
+COMBINATOR_PATTERN = re.compile(r'\s*([>+~])\s*|\s+')
+SIMPLE_SELECTOR_SPLIT = re.compile(r'\s*[\s>+~]\s*')
+ESCAPE_PATTERN = re.compile(r'\\(.)')
+MEDIA_WIDTH_PATTERN = re.compile(r'\(\s*(min|max)-width\s*:\s*([\d.]+)\s*(px|em|rem)?\s*\)')
+FONT_SHORTHAND_PATTERN = re.compile(r'(?:^|\s)([\d.]+(?:px|em|rem|%|pt|vw|vh)|(?:x{0,2}-)?(?:small|large)|medium|smaller|larger)'
+                                    r'(?:\s*/\s*\S+)?\s+(.+)$', re.I)
+BORDER_STYLES = {'none', 'hidden', 'dotted', 'dashed', 'solid', 'double', 'groove', 'ridge', 'inset', 'outset'}
+
+
+def parse_document(content):
+    """Sestaví strom dokumentu pro párování selektorů; None, pokud HTML nejde načíst"""
+    if not content:
+        return None
+    encoding = next(iter(EncodingDetector(content, is_html=True).encodings), None) or 'utf-8'
+    try:
+        parser = lxml_html.HTMLParser(encoding=encoding, remove_comments=True, remove_pis=True)
+        return lxml_html.document_fromstring(content, parser=parser)
+    except (etree.LxmlError, LookupError, ValueError):
+        return None
+
+
+def split_selector_list(text):
+    """Rozdělí seznam selektorů podle čárek mimo závorky"""
+    if '(' not in text and '[' not in text:
+        return [part.strip() for part in text.split(',') if part.strip()]
+    parts = []
+    depth = 0
+    start = 0
+    for position, char in enumerate(text):
+        if char in '([':
+            depth += 1
+        elif char in ')]':
+            depth -= 1
+        elif char == ',' and depth == 0:
+            parts.append(text[start:position].strip())
+            start = position + 1
+    parts.append(text[start:].strip())
+    return [part for part in parts if part]
+
+
+def rightmost_compound(selector):
+    """Vrátí poslední jednoduchý selektor (ten, který se páruje s prvkem samotným)"""
+    if '(' not in selector and '[' not in selector and '\\' not in selector:
+        return SIMPLE_SELECTOR_SPLIT.split(selector)[-1]
+    depth = 0
+    start = 0
+    position = 0
+    while position < len(selector):
+        char = selector[position]
+        if char == '\\':
+            position += 2
+            continue
+        if char in '([':
+            depth += 1
+        elif char in ')]':
+            depth -= 1
+        elif depth == 0 and (char in '>+~' or char.isspace()):
+            start = position + 1
+        position += 1
+    return selector[start:]
+
+
+def media_matches(prelude):
+    """Vyhodnotí @media pro desktopové okno ve světlém režimu; ostatní at-pravidla platí"""
+    prelude = prelude.lower()
+    if not prelude.startswith('@media'):
+        return True
+    alternatives = prelude[6:].split(',')
+    return any(_media_query_matches(query.strip()) for query in alternatives)
+
+
+def _media_query_matches(query):
+    if query.startswith('not '):
+        return not _media_query_matches(query[4:].strip())
+    if query.startswith('only '):
+        query = query[5:]
+    if query.startswith('print') or query.startswith('speech'):
+        return False
+    if 'prefers-color-scheme' in query and 'dark' in query:
+        return False
+    if 'orientation' in query and 'portrait' in query:
+        return False
+    for kind, number, unit in MEDIA_WIDTH_PATTERN.findall(query):
+        width = float(number) * (16 if unit in ('em', 'rem') else 1)
+        if kind == 'min' and width > VIEWPORT_WIDTH or kind == 'max' and width < VIEWPORT_WIDTH:
+            return False
+    return True
+
+
+def _unescape(name):
+    return ESCAPE_PATTERN.sub(r'\1', name) if '\\' in name else name
+
+
+def _parent(element):
+    parent = element.getparent()
+    return parent if parent is not None and isinstance(parent.tag, str) else None
+
+
+def _previous(element):
+    previous = element.getprevious()
+    while previous is not None and not isinstance(previous.tag, str):
+        previous = previous.getprevious()
+    return previous
+
+
+def _next(element):
+    following = element.getnext()
+    while following is not None and not isinstance(following.tag, str):
+        following = following.getnext()
+    return following
+
+
+class Compound:
+    """Jednoduchý selektor (tag, #id, .třídy, [atributy], pseudotřídy) párovaný s jedním prvkem"""
+
+    __slots__ = ('tag', 'ids', 'classes', 'attributes', 'pseudos', 'specificity')
+
+    def __init__(self):
+        self.tag = None
+        self.ids = []
+        self.classes = []
+        self.attributes = []
+        self.pseudos = []
+        self.specificity = (0, 0, 0)
+
+    def add(self, match):
+        """Přidá jeden token; vrátí False, pokud ho engine neumí nebo nemůže odpovídat výchozímu stavu"""
+        a, b, c = self.specificity
+        if match.group('tag'):
+            self.tag = match.group('tag').lower()
+            if self.tag != '*':
+                c += 1
+        elif match.group('id'):
+            self.ids.append(_unescape(match.group('id')))
+            a += 1
+        elif match.group('cls'):
+            self.classes.append(_unescape(match.group('cls')))
+            b += 1
+        elif match.group('attr'):
+            value = next((v for v in (match.group('dq'), match.group('sq'), match.group('bare')) if v is not None), None)
+            insensitive = (match.group('flag') or '').lower() == 'i'
+            self.attributes.append((match.group('attr').lower(), match.group('op'), value, insensitive))
+            b += 1
+        else:
+            pseudo = match.group('pseudo')
+            name = pseudo.lstrip(':').lower()
+            if pseudo.startswith('::') or name in PSEUDO_ELEMENTS or name in STATE_PSEUDO_CLASSES:
+                return False
+            argument = match.group('arg')
+            if name in ('is', 'matches', 'where', '-webkit-any', 'not'):
+                selectors = [parse_selector(part) for part in split_selector_list(argument or '')]
+                if name == 'not':
+                    if not selectors or None in selectors:
+                        return False
+                else:
+                    # :is() a :where() jsou shovívavé - neznámé alternativy se vynechají
+                    selectors = [selector for selector in selectors if selector]
+                    if not selectors:
+                        return False
+                self.pseudos.append((name, selectors))
+                if name != 'where':
+                    extra = max(selector.specificity for selector in selectors)
+                    a, b, c = a + extra[0], b + extra[1], c + extra[2]
+            elif name in ('root', 'first-child', 'last-child', 'only-child', 'first-of-type', 'last-of-type',
+                          'link', 'any-link', 'empty', 'enabled', 'disabled', 'scope', 'defined'):
+                self.pseudos.append((name, None))
+                b += 1
+            else:
+                return False
+        self.specificity = (a, b, c)
+        return True
+
+    def matches(self, element):
+        tag = element.tag
+        if self.tag and self.tag != '*' and self.tag != tag:
+            return False
+        if self.ids and any(element.get('id') != element_id for element_id in self.ids):
+            return False
+        if self.classes:
+            classes = element.get('class')
+            if not classes:
+                return False
+            classes = classes.split()
+            if any(name not in classes for name in self.classes):
+                return False
+        for name, op, value, insensitive in self.attributes:
+            actual = element.get(name)
+            if actual is None:
+                return False
+            if op is None:
+                continue
+            if insensitive:
+                actual, value = actual.lower(), value.lower()
+            if op == '=' and actual != value or \
+               op == '~=' and value not in actual.split() or \
+               op == '|=' and not (actual == value or actual.startswith(value + '-')) or \
+               op == '^=' and not (value and actual.startswith(value)) or \
+               op == '$=' and not (value and actual.endswith(value)) or \
+               op == '*=' and not (value and value in actual):
+                return False
+        for name, argument in self.pseudos:
+            if not self._pseudo_matches(name, argument, element):
+                return False
+        return True
+
+    @staticmethod
+    def _pseudo_matches(name, argument, element):
+        if name in ('is', 'matches', 'where', '-webkit-any'):
+            return any(selector.matches(element) for selector in argument)
+        if name == 'not':
+            return not any(selector.matches(element) for selector in argument)
+        if name in ('root', 'scope'):
+            return _parent(element) is None
+        if name in ('first-child', 'only-child') and _previous(element) is not None:
+            return False
+        if name in ('last-child', 'only-child') and _next(element) is not None:
+            return False
+        if name == 'first-of-type':
+            sibling = _previous(element)
+            while sibling is not None:
+                if sibling.tag == element.tag:
+                    return False
+                sibling = _previous(sibling)
+        if name == 'last-of-type':
+            sibling = _next(element)
+            while sibling is not None:
+                if sibling.tag == element.tag:
+                    return False
+                sibling = _next(sibling)
+        if name in ('link', 'any-link'):
+            return element.tag in ('a', 'area') and element.get('href') is not None
+        if name == 'empty':
+            return len(element) == 0 and not (element.text or '').strip()
+        if name == 'enabled':
+            return element.get('disabled') is None
+        if name == 'disabled':
+            return element.get('disabled') is not None
+        return True
+
+
+class Selector:
+    """Složený selektor: jednoduché selektory zleva doprava s kombinátory mezi nimi"""
+
+    __slots__ = ('parts', 'specificity')
+
+    def __init__(self, parts):
+        self.parts = parts
+        a = b = c = 0
+        for combinator, compound in parts:
+            a += compound.specificity[0]
+            b += compound.specificity[1]
+            c += compound.specificity[2]
+        self.specificity = (a, b, c)
+
+    def matches(self, element, index=None):
+        """Páruje zprava doleva: nejdřív prvek samotný, pak rodiče a sourozence"""
+        if index is None:
+            index = len(self.parts) - 1
+        combinator, compound = self.parts[index]
+        if not compound.matches(element):
+            return False
+        if index == 0:
+            return True
+        if combinator == '>':
+            parent = _parent(element)
+            return parent is not None and self.matches(parent, index - 1)
+        if combinator == '+':
+            previous = _previous(element)
+            return previous is not None and self.matches(previous, index - 1)
+        if combinator == '~':
+            sibling = _previous(element)
+            while sibling is not None:
+                if self.matches(sibling, index - 1):
+                    return True
+                sibling = _previous(sibling)
+            return False
+        ancestor = _parent(element)
+        while ancestor is not None:
+            if self.matches(ancestor, index - 1):
+                return True
+            ancestor = _parent(ancestor)
+        return False
+
+
+def parse_selector(text):
+    """Rozloží selektor na Selector; None, pokud ho engine nepodporuje"""
+    text = text.strip()
+    parts = []
+    position = 0
+    combinator = None
+    while position < len(text):
+        compound = Compound()
+        start = position
+        while position < len(text):
+            match = SIMPLE_PATTERN.match(text, position)
+            if not match:
+                break
+            if not compound.add(match):
+                return None
+            position = match.end()
+        if position == start:
+            return None
+        parts.append((combinator, compound))
+        if position >= len(text):
+            break
+        match = COMBINATOR_PATTERN.match(text, position)
+        if not match or match.end() == position:
+            return None
+        combinator = match.group(1) or ' '
+        position = match.end()
+    return Selector(parts) if parts else None
+
+
+def bucket_key(selector):
+    """Kbelík pravidla podle posledního jednoduchého selektoru: ('id'|'class'|'tag'|'*', jméno).
+
+    Vrátí None pro selektory, které výchozímu stavu prvku odpovídat nemohou
+    (pseudoelementy, :hover, ...).
+    """
+    if '(' not in selector and '[' not in selector and '\\' not in selector:
+        # Rychlá cesta bez závorek a escapování: jen řetězcové operace
+        compound = selector[max(selector.rfind(' '), selector.rfind('>'), selector.rfind('+'), selector.rfind('~')) + 1:]
+        base, colon, pseudo = compound.partition(':')
+        if colon:
+            for name in pseudo.lower().split(':'):
+                if not name or name in PSEUDO_ELEMENTS or name in STATE_PSEUDO_CLASSES:
+                    return None
+        if '#' in base:
+            return ('id', base.split('#', 1)[1].split('.', 1)[0])
+        if '.' in base:
+            return ('class', base.split('.', 2)[1])
+        if base and base != '*':
+            return ('tag', base.lower())
+        return ('*', None)
+    compound = rightmost_compound(selector)
+    key = None
+    tag = None
+    position = 0
+    while position < len(compound):
+        match = SIMPLE_PATTERN.match(compound, position)
+        if not match:
+            break
+        if match.group('id') and (key is None or key[0] != 'id'):
+            key = ('id', _unescape(match.group('id')))
+        elif match.group('cls') and key is None:
+            key = ('class', _unescape(match.group('cls')))
+        elif match.group('tag'):
+            tag = match.group('tag').lower()
+        elif match.group('pseudo'):
+            name = match.group('pseudo').lstrip(':').lower()
+            if match.group('pseudo').startswith('::') or name in PSEUDO_ELEMENTS or name in STATE_PSEUDO_CLASSES:
+                return None
+        position = match.end()
+    if key:
+        return key
+    if tag and tag != '*':
+        return ('tag', tag)
+    return ('*', None)
+
+
+def element_role(element):
+    """Role klíčového prvku (tělo, nadpisy, tlačítka, odkazy, karty) nebo None"""
+    tag = element.tag
+    if tag == 'body':
+        return 'body'
+    if tag in ('h1', 'h2', 'h3'):
+        return tag
+    classes = (element.get('class') or '').lower().split()
+    if tag == 'button' or tag == 'input' and (element.get('type') or '').lower() in ('submit', 'button') or \
+       (element.get('role') or '').lower() == 'button' or \
+       tag in ('a', 'input', 'span', 'div') and any(c == 'btn' or c.startswith('btn-') or c == 'button' for c in classes):
+        return 'button'
+    if tag == 'a' and element.get('href') is not None:
+        return 'link'
+    if tag == 'p':
+        return 'paragraph'
+    if any(c == 'card' or c.endswith('-card') or c.endswith('_card') for c in classes):
+        return 'card'
+    return None
+
+
+def _color_token(value):
+    lower = value.lower()
+    match = HEX_PATTERN.search(value) or ('rgb' in lower or 'hsl' in lower) and FUNCTION_PATTERN.search(value)
+    if match:
+        return match.group(0)
+    for word in lower.split():
+        if word in NAMED_COLORS or word in ('transparent', 'currentcolor'):
+            return word
+    return None
+
+
+def expand_shorthand(name, value, style):
+    """Zapíše do stylu podélné vlastnosti zkratek background, border a font"""
+    if name == 'background':
+        style['background-color'] = _color_token(value) or 'transparent'
+    elif name == 'border':
+        width = style_name = None
+        for part in value.split():
+            lower = part.lower()
+            if lower in BORDER_STYLES:
+                style_name = lower
+            elif part[0].isdigit() or part[0] == '.' or lower in ('thin', 'medium', 'thick'):
+                width = part
+        color = _color_token(value)
+        style['border-width'] = width or ('0' if style_name in (None, 'none', 'hidden') else 'medium')
+        style['border-style'] = style_name or 'none'
+        if color:
+            style['border-color'] = color
+        else:
+            style.pop('border-color', None)
+    elif name == 'font':
+        match = FONT_SHORTHAND_PATTERN.search(value)
+        if match:
+            style['font-size'] = match.group(1)
+            style['font-family'] = match.group(2).strip()
+            weight = re.search(r'(?:^|\s)(bold|bolder|lighter|[1-9]00)(?=\s)', value[:match.start(1)], re.I)
+            style['font-weight'] = weight.group(1) if weight else 'normal'
+
+
+class Cascade:
+    """Vypočtené styly prvků stránky ze zaindexovaných pravidel.
+
+    Pravidla se jednou roztřídí do kbelíků podle posledního jednoduchého
+    selektoru (#id, .třída, tag, ostatní) jako v prohlížečích. Pro prvek se pak
+    zkoušejí jen pravidla z jeho kbelíků a selektor se páruje zprava doleva.
+    Vítězné deklarace se řadí podle !important, specificity a pořadí; zděděné
+    vlastnosti, vlastní vlastnosti a var() se počítají po předcích. Výsledky
+    se pamatují pro každý prvek.
+    """
+
+    def __init__(self, css_index, document):
+        self.css_index = css_index
+        self.document = document
+        self.by_id = {}
+        self.by_class = {}
+        self.by_tag = {}
+        self.universal = []
+        self._selectors = {}
+        self._styles = {}
+        self._custom = {}
+        self._roles = None
+        buckets = {'id': self.by_id, 'class': self.by_class, 'tag': self.by_tag}
+        keys = {}
+        media_results = {}
+        for rule in css_index.rules:
+            if not rule.declarations:
+                continue
+            if rule.media:
+                matches = media_results.get(rule.media)
+                if matches is None:
+                    matches = media_results[rule.media] = media_matches(rule.media)
+                if not matches:
+                    continue
+            for selector in split_selector_list(rule.selector):
+                key = keys.get(selector, False)
+                if key is False:
+                    key = keys[selector] = bucket_key(selector)
+                if key is None:
+                    continue
+                if key[0] == '*':
+                    self.universal.append((selector, rule))
+                else:
+                    buckets[key[0]].setdefault(key[1], []).append((selector, rule))
+
+    def _selector(self, text):
+        if text not in self._selectors:
+            self._selectors[text] = parse_selector(text)
+        return self._selectors[text]
+
+    def matching_rules(self, element):
+        """Vrátí (specificita, pořadí, pravidlo) pro pravidla, jejichž selektor prvku odpovídá"""
+        candidates = []
+        element_id = element.get('id')
+        if element_id and element_id in self.by_id:
+            candidates += self.by_id[element_id]
+        for name in (element.get('class') or '').split():
+            if name in self.by_class:
+                candidates += self.by_class[name]
+        candidates += self.by_tag.get(element.tag, [])
+        candidates += self.universal
+        matched = {}
+        for text, rule in candidates:
+            selector = self._selector(text)
+            if selector is None or not selector.matches(element):
+                continue
+            # Ze seznamu selektorů jednoho pravidla platí ten nejspecifičtější
+            previous = matched.get(rule.order)
+            if previous is None or previous[0] < selector.specificity:
+                matched[rule.order] = (selector.specificity, rule.order, rule)
+        return sorted(matched.values(), key=lambda item: (item[0], item[1]))
+
+    def _declarations(self, element):
+        entries = []
+        for specificity, order, rule in self.matching_rules(element):
+            for position, (name, value, important) in enumerate(rule.declarations):
+                entries.append(((important, 0, specificity, order, position), name, value))
+        inline = element.get('style')
+        if inline:
+            for position, (name, value, important) in enumerate(self.css_index.split_declarations(inline)):
+                entries.append(((important, 1, (0, 0, 0), 0, position), name, value))
+        entries.sort(key=lambda entry: entry[0])
+        return entries
+
+    def _custom_properties(self, declared, inherited):
+        """Vlastní vlastnosti prvku: zděděné + vlastní s dosazenými var(); cyklus je neplatný"""
+        if not declared:
+            return inherited
+        computed = dict(inherited)
+        active = []
+        cyclic = set()
+        done = {}
+
+        def resolve(name):
+            if name in done:
+                return done[name]
+            if name not in declared:
+                return inherited.get(name)
+            if name in active:
+                cyclic.update(active[active.index(name):])
+                return None
+            if len(active) >= MAX_VAR_DEPTH:
+                return None
+            value = declared[name]
+            if 'var(' in value.lower():
+                active.append(name)
+                value = substitute(value, resolve)
+                active.pop()
+                if name in cyclic:
+                    value = None
+            done[name] = value
+            return value
+
+        for name in declared:
+            value = resolve(name)
+            if value is None:
+                computed.pop(name, None)
+            else:
+                computed[name] = value
+        return computed
+
+    def computed_style(self, element):
+        """Vypočtený styl prvku: {vlastnost: hodnota} včetně zděděných vlastností"""
+        style = self._styles.get(element)
+        if style is not None:
+            return style
+        parent = _parent(element)
+        parent_style = self.computed_style(parent) if parent is not None else {}
+        parent_custom = self._custom.get(parent, {}) if parent is not None else {}
+        entries = self._declarations(element)
+        declared_custom = {name[2:]: value for key, name, value in entries if name[:2] == '--'}
+        custom = self._custom_properties(declared_custom, parent_custom)
+        style = {name: value for name, value in parent_style.items() if name in INHERITED_PROPERTIES}
+        for key, name, value in entries:
+            if name[:2] == '--':
+                continue
+            if 'var(' in value.lower():
+                value = substitute(value, custom.get)
+                if value is None:
+                    # Neplatná hodnota se chová jako unset
+                    value = 'unset'
+            keyword = value.lower()
+            if keyword in ('inherit', 'unset', 'initial', 'revert', 'revert-layer'):
+                if keyword == 'inherit' or keyword != 'initial' and name in INHERITED_PROPERTIES:
+                    if name in parent_style:
+                        style[name] = parent_style[name]
+                    else:
+                        style.pop(name, None)
+                else:
+                    style.pop(name, None)
+                continue
+            style[name] = value
+            expand_shorthand(name, value, style)
+        self._custom[element] = custom
+        self._styles[element] = style
+        return style
+
+    def custom_properties(self, element):
+        """Vlastní vlastnosti platné pro prvek (bez úvodních --)"""
+        self.computed_style(element)
+        return self._custom.get(element, {})
+
+    def key_elements(self):
+        """Klíčové prvky podle rolí; chybějící role zastoupí náhradní prvek na konci <body>"""
+        if self._roles is not None:
+            return self._roles
+        roles = {role: [] for role in ROLES}
+        if self.document is None:
+            self._roles = roles
+            return roles
+        # Kandidáty vybere libxml2 podle tagu a tříd; role se v Pythonu určuje jen jim
+        seen = set()
+
+        def add(element):
+            role = element_role(element)
+            if role and len(roles[role]) < MAX_ROLE_ELEMENTS and element not in seen:
+                seen.add(element)
+                roles[role].append(element)
+
+        for tag, tag_role in ROLE_TAGS.items():
+            for element in self.document.iter(tag):
+                add(element)
+                if len(roles[tag_role]) >= MAX_ROLE_ELEMENTS:
+                    break
+        for value in ROLE_ATTRIBUTES_XPATH(self.document):
+            lower = value.lower()
+            if 'btn' in lower or 'button' in lower or 'card' in lower:
+                add(value.getparent())
+        body = roles['body'][0] if roles['body'] else self.document.find('body')
+        if body is None:
+            body = etree.SubElement(self.document, 'body')
+            roles['body'].append(body)
+        for role, (tag, attrs) in PROBES.items():
+            if not roles[role]:
+                roles[role].append(etree.SubElement(body, tag, attrs))
+        self._roles = roles
+        return roles
+
+    def role_styles(self, role):
+        """Vypočtené styly prvků dané role v pořadí dokumentu"""
+        return [self.computed_style(element) for element in self.key_elements().get(role, [])]
+
+    def role_value(self, roles, *props):
+        """První vyplněná hodnota některé z vlastností u prvků rolí (v pořadí rolí); none a 0 se přeskočí"""
+        for role in roles:
+            for style in self.role_styles(role):
+                for prop in props:
+                    value = style.get(prop)
+                    if value and value.lower() not in ('none', '0', '0px', 'transparent'):
+                        return value
+        return None
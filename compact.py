@@ -0,0 +1,238 @@
+import base64
+import gzip
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+from urllib.parse import unquote_to_bytes
+
+try:
+    import brotli
+except ImportError:
+    # Bez balíčku brotli se odpovědi komprimují jen gzipem
+    brotli = None
+
+DATA_URI = re.compile(r'data:([\w.+-]+/[\w.+-]+)?((?:;[\w.+-]+=[\w.+-]+)*)(;base64)?,([^\'")\s]*)', re.I)
+# Typy, které se ze /assets servírují jako takové; ostatní jako binární data (data: URI je cizí obsah)
+SAFE_ASSET_TYPES = {
+    'font/woff', 'font/woff2', 'font/ttf', 'font/otf', 'font/sfnt', 'application/font-woff',
+    'application/x-font-woff', 'application/font-woff2', 'application/x-font-ttf', 'application/x-font-opentype',
+    'application/vnd.ms-fontobject', 'image/png', 'image/jpeg', 'image/gif', 'image/webp', 'image/x-icon',
+    'image/vnd.microsoft.icon', 'image/avif',
+}
+# Menší data: URI se nevyplatí nahrazovat odkazem
+MIN_ASSET_BYTES = 256
+LINK_KINDS = ('all', 'internal', 'external')
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'text/')
+MIN_COMPRESS_BYTES = 1024
+
+
+def decode_data_uri(uri):
+    """Vrátí (bajty, typ) z data: URI, nebo None, není-li platné"""
+    match = DATA_URI.fullmatch(uri.strip())
+    if not match:
+        return None
+    mimetype = (match.group(1) or 'text/plain').lower()
+    try:
+        if match.group(3):
+            data = base64.b64decode(match.group(4) + '=' * (-len(match.group(4)) % 4))
+        else:
+            data = unquote_to_bytes(match.group(4))
+    except ValueError:
+        return None
+    return data, mimetype
+
+
+class AssetStore:
+    """Obsahově adresované paměťové úložiště blobů (klíčem je SHA-256) s LRU vyřazováním.
+
+    Stejný obsah má vždy stejný klíč, takže odkazy na něj se dají cacheovat
+    v prohlížeči natrvalo. Úložiště je omezené celkovou velikostí.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {'stored': 0, 'deduplicated': 0, 'served': 0, 'missing': 0}
+
+    def put(self, data, mimetype):
+        """Uloží blob a vrátí jeho hash"""
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            if digest in self._entries:
+                self._entries.move_to_end(digest)
+                self.counters['deduplicated'] += 1
+                return digest
+            self._entries[digest] = (data, mimetype)
+            self.size += len(data)
+            self.counters['stored'] += 1
+            while self.size > self.max_bytes and len(self._entries) > 1:
+                old, _ = self._entries.popitem(last=False)
+                self.size -= len(old[0])
+        return digest
+
+    def get(self, digest):
+        """Vrátí (bajty, typ) nebo None"""
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                self.counters['missing'] += 1
+                return None
+            self._entries.move_to_end(digest)
+            self.counters['served'] += 1
+            return entry
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, entries=len(self._entries), bytes=self.size)
+
+
+def encode_cursor(offset):
+    return base64.urlsafe_b64encode(str(offset).encode('ascii')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return 0
+    try:
+        return max(int(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))), 0)
+    except ValueError:
+        raise ValueError("Neplatný kurzor")
+
+
+class LinkPages:
+    """Seznamy odkazů z analýz stránkované a filtrované na serveru.
+
+    Seznam se uloží pod hashem svého obsahu; kurzor kóduje pozici ve
+    vyfiltrovaném seznamu, který je pro daný seznam a filtr vždy stejný.
+    """
+
+    def __init__(self, max_sets=256):
+        self.max_sets = max_sets
+        self._sets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, links):
+        """Uloží seznam odkazů a vrátí jeho id"""
+        digest = hashlib.sha256(json.dumps(links, sort_keys=True).encode('utf-8')).hexdigest()[:32]
+        with self._lock:
+            self._sets.pop(digest, None)
+            self._sets[digest] = links
+            while len(self._sets) > self.max_sets:
+                self._sets.popitem(last=False)
+        return digest
+
+    def get(self, links_id):
+        with self._lock:
+            links = self._sets.get(links_id)
+            if links is not None:
+                self._sets.move_to_end(links_id)
+            return links
+
+    @staticmethod
+    def page(links, kind='all', query=None, cursor=None, limit=100):
+        """Vrátí stránku odkazů: items, total (po filtru) a next_cursor (None na konci)"""
+        if kind not in LINK_KINDS:
+            raise ValueError(f"Neznámý druh odkazů: {kind}")
+        selected = links
+        if kind != 'all':
+            internal = kind == 'internal'
+            selected = [link for link in selected if link['is_internal'] == internal]
+        if query:
+            needle = query.lower()
+            selected = [link for link in selected
+                        if needle in link['url'].lower() or needle in link['text'].lower()
+                        or needle in link['title'].lower()]
+        offset = decode_cursor(cursor)
+        end = offset + limit
+        return {
+            'items': selected[offset:end],
+            'total': len(selected),
+            'next_cursor': encode_cursor(end) if end < len(selected) else None,
+        }
+
+    def summary(self, links, limit=100):
+        """Náhrada pole links v kompaktní odpovědi: počty, první stránka a id pro další stránky"""
+        links_id = self.add(links)
+        first = self.page(links, limit=limit)
+        internal = sum(1 for link in links if link['is_internal'])
+        return {
+            'id': links_id,
+            'total': len(links),
+            'internal': internal,
+            'external': len(links) - internal,
+            'items': first['items'],
+            'next_cursor': first['next_cursor'],
+        }
+
+
+def compact_fonts(fonts, assets, prefix='/assets/'):
+    """Nahradí data: URI ve fontech (urls i CSS @font-face) odkazy na úložiště blobů"""
+    def replace(match):
+        # Nekódovaná data (typicky SVG) mohou obsahovat uvozovky, jejich konec v CSS nelze spolehlivě určit
+        if not match.group(3):
+            return match.group(0)
+        decoded = decode_data_uri(match.group(0))
+        if decoded is None or len(decoded[0]) < MIN_ASSET_BYTES:
+            return match.group(0)
+        return prefix + assets.put(*decoded)
+
+    urls = {name: DATA_URI.sub(replace, url) if url else url for name, url in fonts.get('urls', {}).items()}
+    return dict(fonts, styles=[DATA_URI.sub(replace, css) for css in fonts.get('styles', [])], urls=urls)
+
+
+def compact_section(field, value, assets, link_pages, links_limit=100):
+    """Kompaktní podoba jednoho pole výsledku (ostatní pole se nemění)"""
+    if field == 'fonts' and isinstance(value, dict):
+        return compact_fonts(value, assets)
+    if field == 'links' and isinstance(value, list):
+        return link_pages.summary(value, links_limit)
+    return value
+
+
+def compact_result(result, assets, link_pages, links_limit=100):
+    """Kopie výsledku s bloby nahrazenými odkazy a odkazy stránkovanými na serveru"""
+    return {field: compact_section(field, value, assets, link_pages, links_limit)
+            for field, value in result.items()}
+
+
+def choose_encoding(accept_encoding):
+    """Vybere kompresi podle Accept-Encoding: br, gzip, nebo None.
+
+    Vyhrává kódování s nejvyšší hodnotou q, při shodě br; q=0 kódování
+    zakazuje a * platí pro kódování, která hlavička nejmenuje. br je
+    k dispozici jen s volitelným balíčkem brotli (není v requirements.txt).
+    """
+    accepted = {}
+    for part in (accept_encoding or '').lower().split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = min(max(float(value), 0.0), 1.0)
+                except ValueError:
+                    quality = 0.0
+        if name.strip():
+            accepted[name.strip()] = quality
+    available = ('br', 'gzip') if brotli is not None else ('gzip',)
+    best, best_quality = None, 0.0
+    for encoding in available:
+        quality = accepted.get(encoding, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+
+def compressible(mimetype, size):
+    return size >= MIN_COMPRESS_BYTES and (mimetype or '').startswith(COMPRESSIBLE_TYPES)
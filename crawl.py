@@ -0,0 +1,466 @@
+"""Procházení více stránek jednoho webu a sloučení design tokenů do jedné zprávy.
+
+Použití z příkazové řádky (zpráva jako JSON na stdout):
+    python crawl.py https://example.com --pages 20 --depth 2 --workers 4 --delay 0.5
+"""
+import argparse
+import hashlib
+import json
+import math
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from urllib.robotparser import RobotFileParser
+import requests
+from result_cache import normalize_url
+
+# Pole, která se počítají pro každou stránku; odkazy plní frontu
+CRAWL_FIELDS = ['title', 'fonts', 'colors', 'ui_specs', 'links']
+# Parametry dotazu, které nemění obsah stránky
+TRACKING_PARAMETERS = re.compile(r'^(utm_\w+|fbclid|gclid|mc_cid|mc_eid|ref|_ga)$', re.I)
+# Odkazy na soubory, které nejsou HTML stránkou
+NON_HTML_PATTERN = re.compile(r'\.(pdf|zip|gz|rar|7z|exe|dmg|jpe?g|png|gif|webp|svg|ico|mp[34]|webm|avi|mov|'
+                              r'css|js|json|xml|rss|woff2?|ttf|eot|docx?|xlsx?|pptx?)$', re.I)
+# Kolik barev palety a hodnot frekvencí se vrací ve sloučené zprávě
+MERGED_PALETTE_SIZE = 12
+MAX_FREQUENCIES = 5
+# Nejdelší Crawl-delay z robots.txt, který crawl dodrží; delší hodnoty se zkrátí
+MAX_CRAWL_DELAY = 10
+
+
+class BloomFilter:
+    """Pravděpodobnostní množina navštívených URL s pevnou pamětí.
+
+    Falešně pozitivní odpověď (URL se omylem považuje za navštívenou) nastává
+    s pravděpodobností nejvýš error_rate, dokud počet prvků nepřekročí capacity.
+    Pozice bitů se odvozují ze dvou polovin jednoho hashe (Kirsch-Mitzenmacher).
+    """
+
+    def __init__(self, capacity=100000, error_rate=0.001):
+        self.size = max(8, int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.hashes = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'big')
+        second = int.from_bytes(digest[8:], 'big') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    def add(self, item):
+        """Přidá prvek; vrátí False, pokud už (pravděpodobně) byl v množině"""
+        added = False
+        for position in self._positions(item):
+            mask = 1 << (position & 7)
+            if not self.bits[position >> 3] & mask:
+                self.bits[position >> 3] |= mask
+                added = True
+        if added:
+            self.count += 1
+        return added
+
+
+def canonical_url(url):
+    """Normalizovaná URL stránky: bez fragmentu a sledovacích parametrů, se seřazeným dotazem"""
+    url = normalize_url(url)
+    parts = urlsplit(url)
+    if parts.query:
+        query = sorted((name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+                       if not TRACKING_PARAMETERS.match(name))
+        url = urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ''))
+    return url
+
+
+def site_host(url):
+    """Hostitel bez www., podle kterého se pozná, že odkaz patří k procházenému webu"""
+    host = (urlsplit(url).hostname or '').lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+class RobotsPolicy:
+    """Pravidla robots.txt jednotlivých hostitelů, stažená jednou za crawl.
+
+    Podle RFC 9309: chybějící robots.txt (4xx) povoluje vše, nedostupný (5xx,
+    chyba spojení) zakazuje vše. Plánovač crawlu stahuje pravidla přes
+    prefetch() na pozadí, aby čekání na robots.txt neblokovalo ostatní stránky.
+    Crawl-delay se omezuje na max_delay, aby ho web nemohl natáhnout neomezeně.
+    """
+
+    def __init__(self, session, user_agent='*', timeout=5, max_delay=MAX_CRAWL_DELAY):
+        self.session = session
+        self.user_agent = user_agent
+        self.timeout = timeout
+        self.max_delay = max_delay
+        self._parsers = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _origin(url):
+        parts = urlsplit(url)
+        return f'{parts.scheme}://{parts.netloc}'
+
+    def _parser(self, url):
+        origin = self._origin(url)
+        with self._lock:
+            if origin in self._parsers:
+                return self._parsers[origin]
+        return self._load(origin)
+
+    def prefetch(self, url, executor):
+        """Začne stahovat robots.txt hostitele v executoru.
+
+        Vrátí future stahování, nebo None, jsou-li pravidla už načtená.
+        """
+        origin = self._origin(url)
+        with self._lock:
+            if origin in self._parsers:
+                return None
+            future = self._pending.get(origin)
+            if future is None:
+                future = self._pending[origin] = executor.submit(self._load, origin)
+            return future
+
+    def _load(self, origin):
+        parser = RobotFileParser(origin + '/robots.txt')
+        try:
+            response = self.session.get(origin + '/robots.txt', timeout=self.timeout)
+            if response.status_code >= 500:
+                parser.disallow_all = True
+            elif response.status_code >= 400:
+                parser.allow_all = True
+            else:
+                parser.parse(response.text.splitlines())
+        except Exception:
+            parser.disallow_all = True
+        with self._lock:
+            self._parsers[origin] = parser
+            self._pending.pop(origin, None)
+        return parser
+
+    def allowed(self, url):
+        return self._parser(url).can_fetch(self.user_agent, url)
+
+    def crawl_delay(self, url):
+        """Crawl-delay hostitele v sekundách (0, pokud ho robots.txt neuvádí), nejvýš max_delay"""
+        parser = self._parser(url)
+        delay = parser.crawl_delay(self.user_agent)
+        if delay is None:
+            rate = parser.request_rate(self.user_agent)
+            delay = rate.seconds / rate.requests if rate and rate.requests else 0
+        return min(float(delay or 0), self.max_delay)
+
+
+class SharedAssets:
+    """Styly a obrázky stažené během crawlu, sdílené mezi stránkami.
+
+    Stejný soubor stylů na dalších stránkách se nestahuje znovu; souběžné
+    požadavky na tutéž URL počkají na jediné stažení. Ukládají se jen úspěšná
+    stažení do celkového limitu velikosti.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self.counters = {'hits': 0, 'misses': 0}
+
+    def wrap(self, kind, fetch):
+        """Vrátí fetch(url, timeout) se sdílenou pamětí výsledků"""
+        def shared_fetch(url, timeout=10):
+            key = (kind, url)
+            with self._lock:
+                if key in self._entries:
+                    self.counters['hits'] += 1
+                    return self._entries[key]
+                url_lock = self._locks.setdefault(key, threading.Lock())
+            with url_lock:
+                with self._lock:
+                    if key in self._entries:
+                        self.counters['hits'] += 1
+                        return self._entries[key]
+                    self.counters['misses'] += 1
+                result = fetch(url, timeout)
+                if result:
+                    size = len(result.get('text') or '') or result.get('bytes', 0)
+                    with self._lock:
+                        if self.bytes + size <= self.max_bytes:
+                            self._entries[key] = result
+                            self.bytes += size
+                return result
+        return shared_fetch
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, entries=len(self._entries), bytes=self.bytes)
+
+
+def _top(counter, total, limit=MAX_FREQUENCIES):
+    return [{'value': value, 'pages': count, 'weight': round(count / total, 3)}
+            for value, count in counter.most_common(limit)]
+
+
+def merge_reports(results):
+    """Sloučí výsledky jednotlivých stránek do jedné zprávy webu.
+
+    Každá hodnota nese počet stránek, na kterých se vyskytla, a váhu (podíl
+    stránek). Sloučený výsledek je nejčastější hodnota; paleta sčítá podíly
+    barev přes stránky.
+    """
+    total = len(results)
+    if not total:
+        return {'fonts': None, 'colors': None, 'ui_specs': None}
+    font_counts = Counter()
+    font_urls = {}
+    font_styles = {}
+    for result in results:
+        fonts = result.get('fonts') or {}
+        for name in set(fonts.get('names') or []):
+            font_counts[name] += 1
+            if fonts.get('urls', {}).get(name):
+                font_urls.setdefault(name, fonts['urls'][name])
+        for css in fonts.get('styles') or []:
+            font_styles.setdefault(css, True)
+    fonts = {
+        'names': [name for name, count in font_counts.most_common(10)],
+        'frequencies': [{'name': name, 'pages': count, 'weight': round(count / total, 3)}
+                        for name, count in font_counts.most_common(10)],
+        'styles': list(font_styles)[:10],
+        'urls': {name: font_urls.get(name) for name, count in font_counts.most_common(10)},
+    }
+
+    role_counts = {role: Counter() for role in ('primary', 'secondary', 'tertiary')}
+    palette_weights = Counter()
+    palette_pages = Counter()
+    for result in results:
+        colors = result.get('colors') or {}
+        for role, counter in role_counts.items():
+            if colors.get(role):
+                counter[colors[role]] += 1
+        for entry in colors.get('palette') or []:
+            palette_weights[entry['color']] += entry['share']
+            palette_pages[entry['color']] += 1
+    colors = {role: (counter.most_common(1)[0][0] if counter else None) for role, counter in role_counts.items()}
+    colors['palette'] = [{'color': color, 'weight': round(weight / total, 4), 'pages': palette_pages[color]}
+                         for color, weight in palette_weights.most_common(MERGED_PALETTE_SIZE)]
+    colors['frequencies'] = {role: _top(counter, total) for role, counter in role_counts.items()}
+
+    spec_paths = [('shadow', 'color'), ('shadow', 'opacity'), ('shadow', 'angle'), ('border', 'color'),
+                  ('border', 'thickness'), ('corner_radius',), ('item_spacing',)]
+    spec_counts = {path: Counter() for path in spec_paths}
+    for result in results:
+        for path, counter in spec_counts.items():
+            value = result.get('ui_specs') or {}
+            for key in path:
+                value = value.get(key) if isinstance(value, dict) else None
+            if value:
+                counter[value] += 1
+    ui_specs = {'shadow': {}, 'border': {}, 'frequencies': {}}
+    for path, counter in spec_counts.items():
+        target = ui_specs[path[0]] if len(path) > 1 else ui_specs
+        target[path[-1]] = counter.most_common(1)[0][0] if counter else None
+        ui_specs['frequencies']['.'.join(path)] = _top(counter, total)
+    return {'fonts': fonts, 'colors': colors, 'ui_specs': ui_specs}
+
+
+class SiteCrawler:
+    """Procházení webu od vstupní URL do šířky s rozpočtem stránek a hloubky.
+
+    Fronta drží normalizované URL (nejvýš max_frontier), navštívené URL hlídá
+    Bloomův filtr. Stránky se analyzují souběžně, ale na jednoho hostitele běží
+    nejvýš per_host analýz a starty dělí aspoň delay sekund (nebo Crawl-delay
+    z robots.txt). Odkazy zakázané v robots.txt se přeskočí; vstupní URL si
+    uživatel vyžádal, proto se analyzuje vždy. Styly sdílené stránkami se
+    stahují jednou. S timeout (sekundy) crawl po uplynutí času nezačíná další
+    stránky, nečeká na rozpracované a vrátí částečnou zprávu. Volitelný admit
+    vrací kontextový manažer, ve kterém běží analýza každé stránky (místo
+    v řadiči přijímání).
+    """
+
+    def __init__(self, url, max_pages=20, max_depth=2, workers=4, per_host=2, delay=0.5, pool=None,
+                 cache=None, max_frontier=10000, respect_robots=True, make_analyzer=None, timeout=None,
+                 admit=None):
+        from scraper import WebAnalyzer
+        self.url = url
+        self.entry = canonical_url(url)
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+        self.workers = workers
+        self.per_host = per_host
+        self.delay = delay
+        self.max_frontier = max_frontier
+        self.timeout = timeout
+        self.admit = admit
+        self.host = site_host(url)
+        self.shared_assets = SharedAssets()
+        self.make_analyzer = make_analyzer or (lambda page_url: WebAnalyzer(
+            page_url, pool=pool, cache=cache, fields=CRAWL_FIELDS, shared_assets=self.shared_assets))
+        self.robots = None
+        if respect_robots:
+            session = pool.session() if pool else requests.Session()
+            self.robots = RobotsPolicy(session)
+        self.seen = BloomFilter(capacity=max(1000, max_frontier * 10))
+        self.stats = Counter()
+
+    def _allowed(self, url):
+        if self.robots is None or url == self.entry:
+            return True
+        return self.robots.allowed(url)
+
+    def _host_delay(self, url):
+        delay = self.delay
+        if self.robots is not None:
+            delay = max(delay, self.robots.crawl_delay(url))
+        return delay
+
+    def _enqueue_links(self, frontier, links, depth):
+        if depth > self.max_depth:
+            return
+        for link in links:
+            url = link.get('url') or ''
+            if not url.startswith(('http://', 'https://')) or site_host(url) != self.host:
+                continue
+            url = canonical_url(url)
+            if NON_HTML_PATTERN.search(urlsplit(url).path):
+                continue
+            if not self.seen.add(url):
+                continue
+            if len(frontier) >= self.max_frontier:
+                self.stats['frontier_dropped'] += 1
+                continue
+            frontier.append((url, depth))
+
+    def _analyze(self, url):
+        with self.admit() if self.admit else nullcontext():
+            start = time.monotonic()
+            return self.make_analyzer(url).analyze(), time.monotonic() - start
+
+    def crawl(self, progress=None):
+        """Projde web a vrátí (záznamy stránek, výsledky úspěšně analyzovaných stránek).
+
+        progress(url) se volá po každé dokončené stránce.
+        """
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        self.seen.add(self.entry)
+        frontier = deque([(self.entry, 0)])
+        pages = []
+        results = []
+        running = {}
+        robots_pending = set()
+        host_active = Counter()
+        host_last_start = {}
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='crawl')
+        robots_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='robots')
+        try:
+            while (frontier and len(pages) + len(running) < self.max_pages) or running:
+                now = time.monotonic()
+                if deadline is not None and now >= deadline:
+                    self.stats['deadline_exceeded'] = 1
+                    for url, depth, host in running.values():
+                        pages.append({'url': url, 'depth': depth, 'status': 'timeout'})
+                    running.clear()
+                    break
+                next_ready = None
+                deferred = deque()
+                while frontier and len(running) < self.workers and len(pages) + len(running) < self.max_pages:
+                    url, depth = frontier.popleft()
+                    if self.robots is not None:
+                        # Dokud se robots.txt hostitele stahuje, jeho URL čekají ve frontě
+                        loading = self.robots.prefetch(url, robots_executor)
+                        if loading is not None:
+                            robots_pending.add(loading)
+                            deferred.append((url, depth))
+                            break
+                    if not self._allowed(url):
+                        self.stats['robots_skipped'] += 1
+                        continue
+                    host = urlsplit(url).netloc
+                    earliest = host_last_start.get(host, -math.inf) + self._host_delay(url)
+                    if host_active[host] >= self.per_host or earliest > now:
+                        deferred.append((url, depth))
+                        if earliest > now:
+                            next_ready = earliest if next_ready is None else min(next_ready, earliest)
+                        # Ostatní URL ve frontě patří zpravidla stejnému hostiteli
+                        break
+                    running[executor.submit(self._analyze, url)] = (url, depth, host)
+                    host_active[host] += 1
+                    host_last_start[host] = now
+                frontier.extendleft(reversed(deferred))
+                if deadline is not None:
+                    next_ready = deadline if next_ready is None else min(next_ready, deadline)
+                if not running and not robots_pending:
+                    if frontier and next_ready is not None:
+                        time.sleep(max(next_ready - time.monotonic(), 0.01))
+                        continue
+                    break
+                timeout = None if next_ready is None else max(next_ready - time.monotonic(), 0.01)
+                done, _ = wait(list(running) + list(robots_pending), timeout=timeout, return_when=FIRST_COMPLETED)
+                robots_pending.difference_update(done)
+                for future in done:
+                    if future not in running:
+                        continue
+                    url, depth, host = running.pop(future)
+                    host_active[host] -= 1
+                    try:
+                        result, elapsed = future.result()
+                    except Exception as e:
+                        pages.append({'url': url, 'depth': depth, 'status': 'error', 'error': str(e)})
+                    else:
+                        pages.append({'url': url, 'depth': depth, 'status': 'ok', 'title': result.get('title'),
+                                      'elapsed': round(elapsed, 3)})
+                        results.append(result)
+                        self._enqueue_links(frontier, result.get('links') or [], depth + 1)
+                    if progress:
+                        progress(url)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+            robots_executor.shutdown(wait=False, cancel_futures=True)
+        self.stats['frontier_left'] = len(frontier)
+        return pages, results
+
+    def run(self, progress=None):
+        """Projde web a vrátí sloučenou zprávu o jeho design tokenech"""
+        pages, results = self.crawl(progress)
+        report = {'url': self.url, 'partial': bool(self.stats['deadline_exceeded']), 'pages': pages}
+        report.update(merge_reports(results))
+        report['stats'] = dict(self.stats, pages=len(pages), errors=sum(1 for p in pages if p['status'] != 'ok'),
+                               assets=self.shared_assets.stats())
+        return report
+
+
+def main(argv=None):
+    from batch import normalize_input_url
+    from http_pool import ConnectionPool
+    from http_cache import HttpCache
+    parser = argparse.ArgumentParser(description='Procházení webu a sloučení design tokenů do jedné zprávy')
+    parser.add_argument('url', help='vstupní URL webu')
+    parser.add_argument('--pages', type=int, default=20, help='max. počet analyzovaných stránek')
+    parser.add_argument('--depth', type=int, default=2, help='max. hloubka odkazů od vstupní stránky')
+    parser.add_argument('--workers', type=int, default=4, help='počet souběžně analyzovaných stránek')
+    parser.add_argument('--per-host', type=int, default=2, help='max. souběžných stránek na hostitele')
+    parser.add_argument('--delay', type=float, default=0.5, help='min. rozestup startů na hostiteli v sekundách')
+    parser.add_argument('--timeout', type=float, help='max. doba crawlu v sekundách (pak částečná zpráva)')
+    parser.add_argument('--ignore-robots', action='store_true', help='neřídit se robots.txt')
+    args = parser.parse_args(argv)
+
+    pool = ConnectionPool()
+    crawler = SiteCrawler(normalize_input_url(args.url), max_pages=args.pages, max_depth=args.depth,
+                          workers=args.workers, per_host=args.per_host, delay=args.delay, pool=pool,
+                          cache=HttpCache(), respect_robots=not args.ignore_robots, timeout=args.timeout)
+    json.dump(crawler.run(), sys.stdout, ensure_ascii=False, indent=1)
+    sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,271 @@
+import re
+from heapq import merge
+from css_vars import CssVariables
+
+# Jediný průchod textem: komentáře, řetězce, url(...) a strukturální znaky
+TOKEN_PATTERN = re.compile(r'/\*.*?(?:\*/|\Z)|"(?:\\.|[^"\\])*"?|\'(?:\\.|[^\'\\])*\'?|url\([^)"\']*\)|[{};]', re.S | re.I)
+# Rychlá cesta pro běžné pravidlo bez řetězců, komentářů a vnořených bloků
+FAST_RULE_PATTERN = re.compile(r'([^{}@;"\'/]*(?:/(?!\*)[^{}@;"\'/]*)*)\{([^{}"\'/]*(?:/(?!\*)[^{}"\'/]*)*)\}')
+# Deklarace 'vlastnost: hodnota'; středník uvnitř url(...) deklaraci neukončuje
+DECLARATION_PATTERN = re.compile(r'([^:;]+):([^;u]*(?:(?:url\([^)]*\)|u)[^;u]*)*)', re.I)
+SELECTOR_TOKEN_PATTERN = re.compile(r'[.#]?-?[_a-zA-Z][\w-]*')
+# Příznak !important; mezi vykřičníkem a slovem smí být mezery
+IMPORTANT_PATTERN = re.compile(r'!\s*important\s*$', re.I)
+IMPORT_URL_PATTERN = re.compile(r'@import\s+(?:url\()?\s*["\']?([^)"\'\s;]+)', re.I)
+
+# At-pravidla, jejichž obsah jsou běžná pravidla
+GROUP_AT_RULES = {'@media', '@supports', '@layer', '@container', '@document', '@scope', '@-moz-document'}
+
+
+class CssRule:
+    """Jedno stylové pravidlo: selektor, jeho deklarace a nejbližší obalující at-pravidlo"""
+
+    __slots__ = ('selector', 'declarations', 'source', 'order', 'media')
+
+    def __init__(self, selector, declarations, source, order, media=None):
+        self.selector = selector
+        self.declarations = declarations
+        self.source = source
+        self.order = order
+        self.media = media
+
+    def get(self, prop):
+        """Vrátí poslední hodnotu vlastnosti v pravidle nebo None"""
+        for name, value, important in reversed(self.declarations):
+            if name == prop:
+                return value
+        return None
+
+
+class CssIndex:
+    """Index CSS sestavený jedním průchodem přes všechny zdroje stránky.
+
+    Místo opakovaných regulárních výrazů nad celým textem drží pravidla, mapu
+    vlastnost -> hodnoty (v pořadí dokumentu), mapu tokenů selektorů
+    (tag, .třída, #id) -> pravidla, vlastní vlastnosti (--var, poslední hodnota
+    i všechny deklarace), bloky @font-face a @importy.
+    """
+
+    def __init__(self):
+        self.rules = []
+        self.sources = []
+        self.by_property = {}
+        self.by_selector_token = {}
+        self.custom_properties = {}
+        self.custom_declarations = []
+        self.font_faces = []
+        self.imports = []
+        self._order = 0
+        self._variables = None
+
+    @classmethod
+    def from_sources(cls, sources):
+        index = cls()
+        for source in sources:
+            index.add_source(source['content'], source.get('base'), source.get('origin', 'link'))
+        return index
+
+    def _next_order(self):
+        self._order += 1
+        return self._order
+
+    @staticmethod
+    def parse_declaration(text):
+        """Rozloží 'vlastnost: hodnota !important' na trojici"""
+        name, sep, value = text.partition(':')
+        if not sep:
+            return None
+        name = name.strip()
+        if not name:
+            return None
+        value = value.strip()
+        important = False
+        if '!' in value:
+            flag = IMPORTANT_PATTERN.search(value)
+            if flag:
+                important = True
+                value = value[:flag.start()].rstrip()
+        return name.lower(), value, important
+
+    def split_declarations(self, body):
+        """Rozdělí tělo pravidla na seznam deklarací"""
+        if 'url(' in body or 'URL(' in body:
+            pairs = DECLARATION_PATTERN.findall(body)
+        else:
+            pairs = [(name, value) for name, sep, value in (part.partition(':') for part in body.split(';')) if sep]
+        if '!' in body:
+            return [declaration for declaration in (self.parse_declaration(f'{name}:{value}') for name, value in pairs)
+                    if declaration]
+        return [(name.strip().lower(), value.strip(), False) for name, value in pairs if name.strip()]
+
+    def _add_rule(self, selector, declarations, source_id, media=None):
+        order = self._next_order()
+        rule = CssRule(selector, declarations, source_id, order, media)
+        self.rules.append(rule)
+        by_property = self.by_property
+        for name, value, important in declarations:
+            entries = by_property.get(name)
+            if entries is None:
+                entries = by_property[name] = []
+            entries.append((order, value, rule))
+            if name[0] == '-' and name.startswith('--'):
+                custom_name = name[2:].strip().lower()
+                self.custom_properties[custom_name] = value
+                self.custom_declarations.append((custom_name, value))
+        by_selector_token = self.by_selector_token
+        for token in set(SELECTOR_TOKEN_PATTERN.findall(selector.lower())):
+            rules = by_selector_token.get(token)
+            if rules is None:
+                rules = by_selector_token[token] = []
+            rules.append(rule)
+
+    def add_source(self, text, base=None, origin='link'):
+        """Zaindexuje jeden CSS zdroj"""
+        source_id = len(self.sources)
+        self.sources.append({'base': base, 'origin': origin})
+        self._variables = None
+        # Zásobník kontextů: [druh, prelude, deklarace, začátek bloku]
+        stack = [['sheet', None, None, 0]]
+        buffer = []
+        buffer_start = 0
+        position = 0
+        length = len(text)
+
+        def flush_declaration(context):
+            declaration = self.parse_declaration(''.join(buffer))
+            if declaration:
+                context[2].append(declaration)
+
+        while position < length:
+            kind = stack[-1][0]
+            if not buffer and kind in ('sheet', 'group'):
+                fast = FAST_RULE_PATTERN.match(text, position)
+                if fast and fast.group(1).strip():
+                    self._add_rule(fast.group(1).strip(), self.split_declarations(fast.group(2)), source_id,
+                                   stack[-1][1])
+                    position = buffer_start = fast.end()
+                    continue
+            match = TOKEN_PATTERN.search(text, position)
+            if not match:
+                buffer.append(text[position:])
+                position = length
+                break
+            start = match.start()
+            if start > position:
+                buffer.append(text[position:start])
+            position = match.end()
+            token = match.group(0)
+            if token.startswith('/*'):
+                continue
+            if len(token) > 1:
+                buffer.append(token)
+                continue
+            if token == ';':
+                if kind in ('rule', 'font-face'):
+                    flush_declaration(stack[-1])
+                elif kind in ('sheet', 'group'):
+                    statement = ''.join(buffer).strip()
+                    if statement[:7].lower() == '@import':
+                        import_match = IMPORT_URL_PATTERN.match(statement)
+                        if import_match:
+                            self.imports.append((import_match.group(1), base))
+                buffer = []
+                buffer_start = position
+                continue
+            if token == '{':
+                raw = ''.join(buffer)
+                prelude = raw.strip()
+                block_start = buffer_start + len(raw) - len(raw.lstrip())
+                buffer = []
+                buffer_start = position
+                if kind in ('sheet', 'group'):
+                    if prelude.startswith('@'):
+                        at_name = prelude.split(None, 1)[0].split('(')[0].lower()
+                        if at_name in GROUP_AT_RULES:
+                            stack.append(['group', prelude, None, block_start])
+                        elif at_name == '@font-face':
+                            stack.append(['font-face', prelude, [], block_start])
+                        else:
+                            stack.append(['skip', prelude, None, block_start])
+                    else:
+                        stack.append(['rule', prelude, [], block_start])
+                else:
+                    stack.append(['skip', prelude, None, block_start])
+                continue
+            # token == '}'
+            context = stack[-1]
+            if context[0] in ('rule', 'font-face'):
+                flush_declaration(context)
+            buffer = []
+            buffer_start = position
+            if len(stack) == 1:
+                continue
+            stack.pop()
+            if context[0] == 'rule':
+                self._add_rule(context[1], context[2], source_id, stack[-1][1])
+            elif context[0] == 'font-face':
+                self.font_faces.append({
+                    'declarations': context[2],
+                    'css': text[context[3]:position],
+                    'base': base,
+                })
+        # Neuzavřená pravidla na konci textu (useknuté zdroje)
+        if len(stack) > 1:
+            if stack[-1][0] in ('rule', 'font-face'):
+                flush_declaration(stack[-1])
+            for depth in range(len(stack) - 1, 0, -1):
+                if stack[depth][0] == 'rule':
+                    self._add_rule(stack[depth][1], stack[depth][2], source_id, stack[depth - 1][1])
+
+    # --- dotazy ----------------------------------------------------------
+
+    def variables(self):
+        """Vrátí resolver vlastních vlastností; graf závislostí se staví jednou pro index"""
+        if self._variables is None:
+            self._variables = CssVariables(self)
+        return self._variables
+
+    def values(self, *props):
+        """Vrátí hodnoty vlastností v pořadí dokumentu"""
+        lists = [self.by_property.get(prop, []) for prop in props]
+        if len(lists) == 1:
+            return [value for order, value, rule in lists[0]]
+        return [value for order, value, rule in merge(*lists, key=lambda item: item[0])]
+
+    def first(self, *props):
+        """Vrátí první hodnotu některé z vlastností nebo None"""
+        values = self.values(*props)
+        return values[0] if values else None
+
+    def rules_for(self, *tokens):
+        """Vrátí pravidla, jejichž selektor obsahuje některý z tokenů"""
+        lists = [self.by_selector_token.get(token.lower(), []) for token in tokens]
+        if len(lists) == 1:
+            return lists[0]
+        seen = set()
+        rules = []
+        for rule in merge(*lists, key=lambda r: r.order):
+            if rule.order not in seen:
+                seen.add(rule.order)
+                rules.append(rule)
+        return rules
+
+    def selector_values(self, tokens, props):
+        """Vrátí hodnoty vlastností z pravidel s daným tokenem selektoru"""
+        values = []
+        for rule in self.rules_for(*tokens):
+            for name, value, important in rule.declarations:
+                if name in props:
+                    values.append(value)
+        return values
+
+    def source_values(self, prop, origin):
+        """Vrátí hodnoty vlastnosti ze zdrojů daného původu (inline / link)"""
+        return [value for order, value, rule in self.by_property.get(prop, [])
+                if self.sources[rule.source]['origin'] == origin]
+
+    def all_values(self):
+        """Vrátí hodnoty všech deklarací v pořadí dokumentu"""
+        for rule in self.rules:
+            for name, value, important in rule.declarations:
+                yield value
@@ -0,0 +1,157 @@
+import re
+
+# Odkazy var(--jméno...) v hodnotě; pro graf závislostí stačí jména
+VAR_REFERENCE_PATTERN = re.compile(r'var\(\s*--([\w-]+)', re.I)
+VAR_START_PATTERN = re.compile(r'var\(', re.I)
+# Selektory, jejichž vlastní vlastnosti dědí celá stránka
+ROOT_SELECTORS = {':root', 'html', ':host', '*'}
+# Rozsahy, které vypadají jako barevné téma (tmavý režim, data-theme, ...)
+THEME_PATTERN = re.compile(r'theme|dark|light|prefers-color-scheme|color-scheme|mode', re.I)
+# Hloubka řetězce var(), za kterou se hodnota považuje za neplatnou
+MAX_VAR_DEPTH = 64
+
+
+def scope_of(selector, media=None):
+    """Rozsah deklarace: None pro :root a html, jinak selektor (případně s @media tématu)"""
+    selector = ' '.join(selector.split()).lower()
+    is_root = selector in ROOT_SELECTORS
+    if media and 'prefers-color-scheme' in media.lower():
+        media = ' '.join(media.split()).lower()
+        return media if is_root else f'{media} {selector}'
+    return None if is_root else selector
+
+
+def substitute(value, resolve):
+    """Dosadí do hodnoty všechny var(); resolve(jméno bez --) vrací hodnotu nebo None.
+
+    Záloha var(--x, záloha) se použije, když proměnnou nelze rozřešit; pokud
+    chybí i ta, je neplatná celá hodnota a vrátí se None.
+    """
+    parts = []
+    position = 0
+    while True:
+        match = VAR_START_PATTERN.search(value, position)
+        if not match:
+            parts.append(value[position:])
+            break
+        parts.append(value[position:match.start()])
+        # Konec var(...) podle vyvážených závorek; záloha může obsahovat další funkce
+        depth = 1
+        end = match.end()
+        while end < len(value) and depth:
+            if value[end] == '(':
+                depth += 1
+            elif value[end] == ')':
+                depth -= 1
+            end += 1
+        inner = value[match.end():end - 1] if depth == 0 else value[match.end():]
+        name, comma, fallback = inner.partition(',')
+        name = name.strip().lower()
+        resolved = resolve(name[2:]) if name.startswith('--') else None
+        if resolved is None and comma:
+            resolved = substitute(fallback.strip(), resolve)
+        if resolved is None:
+            return None
+        parts.append(resolved)
+        position = end
+    return ''.join(parts).strip()
+
+
+class CssVariables:
+    """Vlastní vlastnosti (--jméno) indexu CSS s dosazováním var().
+
+    Deklarace se rozdělí podle rozsahu (:root, téma, komponenta) a pro každou
+    se jednou zaznamená, na které proměnné odkazuje. Rozřešené hodnoty se
+    pamatují, takže opakovaný dotaz je jen vyhledání ve slovníku. Proměnná
+    na cyklu je neplatná (jako v prohlížeči) a použije se záložní hodnota
+    z var(--jméno, záloha).
+    """
+
+    def __init__(self, css_index):
+        self.scopes = {None: {}}
+        # Poslední deklarace jména v libovolném rozsahu (pro jména mimo :root)
+        self.last = {}
+        self.graph = {}
+        self._cache = {}
+        self._values = {}
+        self._active = set()
+        self._stack = []
+        self._cyclic = set()
+        rule_scopes = {}
+        for prop, entries in css_index.by_property.items():
+            if prop[:2] != '--':
+                continue
+            name = prop[2:].strip()
+            for order, value, rule in entries:
+                scopes = rule_scopes.get(rule.order)
+                if scopes is None:
+                    scopes = rule_scopes[rule.order] = {scope_of(part, rule.media)
+                                                        for part in rule.selector.split(',') if part.strip()}
+                references = tuple(VAR_REFERENCE_PATTERN.findall(value.lower())) if 'var(' in value.lower() else ()
+                for scope in scopes:
+                    self.scopes.setdefault(scope, {})[name] = value
+                    self.graph[(name, scope)] = references
+                    self.last[name] = (scope, value)
+        self.names = list(css_index.custom_properties)
+
+    def themes(self):
+        """Vrátí rozsahy, které vypadají jako barevná témata"""
+        return [scope for scope in self.scopes if scope and THEME_PATTERN.search(scope)]
+
+    def _lookup(self, name, scope):
+        if scope is not None:
+            declared = self.scopes.get(scope)
+            if declared and name in declared:
+                return scope, declared[name]
+        root = self.scopes[None]
+        if name in root:
+            return None, root[name]
+        return self.last.get(name)
+
+    def get(self, name, scope=None):
+        """Vrátí rozřešenou hodnotu proměnné (bez úvodních --) nebo None"""
+        return self._resolve(name.lower().lstrip('-'), scope)
+
+    def _resolve(self, name, scope):
+        found = self._lookup(name, scope)
+        if found is None:
+            return None
+        declared_scope, value = found
+        key = (name, declared_scope)
+        if key in self._cache:
+            return self._cache[key]
+        if key in self._active:
+            # Všechny proměnné na cyklu jsou neplatné
+            self._cyclic.update(self._stack[self._stack.index(key):])
+            return None
+        if len(self._stack) >= MAX_VAR_DEPTH:
+            return None
+        if not self.graph.get(key):
+            result = value
+        else:
+            self._active.add(key)
+            self._stack.append(key)
+            # Odkazy se dosazují v rozsahu, kde je proměnná deklarovaná
+            result = self._substitute(value, declared_scope)
+            self._stack.pop()
+            self._active.discard(key)
+            if key in self._cyclic:
+                result = None
+        self._cache[key] = result
+        return result
+
+    def _substitute(self, value, scope):
+        return substitute(value, lambda name: self._resolve(name, scope))
+
+    def resolve_value(self, value, scope=None):
+        """Dosadí var() v libovolné hodnotě deklarace; None, pokud ji nelze rozřešit"""
+        if value is None or 'var(' not in value.lower():
+            return value
+        key = (value, scope)
+        if key not in self._values:
+            self._values[key] = self._substitute(value, scope)
+        return self._values[key]
+
+    def resolved(self, scope=None):
+        """Vrátí všechny proměnné viditelné z rozsahu i s rozřešenými hodnotami"""
+        return {name: self._resolve(name, scope) for name in self.names}
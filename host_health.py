@@ -0,0 +1,263 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from urllib.parse import urlsplit
+
+# Odpovědi, které znamenají potíže hostitele; u těch z RETRY_STATUSES má smysl požadavek zopakovat
+FAILURE_STATUS = 500
+RETRY_STATUSES = (502, 503, 504)
+RETRY_REASONS = ('timeout', 'connection') + tuple(f'status {status}' for status in RETRY_STATUSES)
+RETRY_BACKOFF = 0.25
+# Kolik rozhodnutí se nejvýš vypisuje ve výsledku analýzy
+MAX_DECISIONS = 50
+
+
+def host_of(url):
+    return urlsplit(url).netloc.lower()
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class _Host:
+    """Stav jednoho hostitele: poslední latence a výsledky a stav jističe"""
+
+    def __init__(self, window):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.state = 'closed'
+        self.open_until = 0
+        self.opened = 0
+        self.probe_started = None
+
+
+class HostHealth:
+    """Zdraví hostitelů sdílené všemi analýzami procesu.
+
+    Pro každého hostitele si pamatuje latence a výsledky posledních požadavků.
+    Z 95. percentilu latence odvozuje timeout, takže rychlý hostitel nedostane
+    na odpověď plných 10 s. Po sérii chyb nebo při vysoké chybovosti otevře
+    jistič: požadavky na hostitele pak okamžitě selžou, dokud neuplyne doba
+    otevření. Potom projde jediný zkušební požadavek, jehož úspěch jistič zavře
+    a neúspěch ho otevře na dvojnásobnou dobu.
+    """
+
+    def __init__(self, window=50, min_samples=5, min_timeout=2.0, timeout_factor=4.0, failure_threshold=5,
+                 max_error_rate=0.5, open_seconds=30, max_open_seconds=300, max_hosts=1024):
+        self.window = window
+        self.min_samples = min_samples
+        self.min_timeout = min_timeout
+        self.timeout_factor = timeout_factor
+        self.failure_threshold = failure_threshold
+        self.max_error_rate = max_error_rate
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.max_hosts = max_hosts
+        self._hosts = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {'opened': 0, 'rejected': 0, 'probes': 0}
+
+    def _host(self, host):
+        entry = self._hosts.get(host)
+        if entry is None:
+            entry = self._hosts[host] = _Host(self.window)
+            while len(self._hosts) > self.max_hosts:
+                self._hosts.popitem(last=False)
+        self._hosts.move_to_end(host)
+        return entry
+
+    def timeout(self, host, cap):
+        """Vrátí timeout pro požadavek na hostitele, nejvýš cap.
+
+        Každá chyba v řadě timeout zkrátí na polovinu, takže nedostupný
+        hostitel zdrží analýzy čím dál méně ještě před otevřením jističe.
+        """
+        with self._lock:
+            entry = self._hosts.get(host)
+            latencies = list(entry.latencies) if entry else []
+            failures = entry.consecutive_failures if entry else 0
+        timeout = cap
+        if len(latencies) >= self.min_samples:
+            timeout = min(percentile(latencies, 0.95) * self.timeout_factor, cap)
+        return max(timeout / 2 ** failures, min(self.min_timeout, cap))
+
+    def allow(self, host):
+        """Vrátí stav jističe ('closed' nebo 'half_open'), smí-li požadavek projít, jinak None"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._hosts.get(host)
+            if entry is None or entry.state == 'closed':
+                return 'closed'
+            if entry.state == 'open' and now >= entry.open_until:
+                entry.state = 'half_open'
+                entry.probe_started = None
+            # Zkušební požadavek, který se nedočkal výsledku (zrušení), po době otevření uvolní místo dalšímu
+            if entry.state == 'half_open' and (entry.probe_started is None
+                                               or now - entry.probe_started > self.open_seconds):
+                entry.probe_started = now
+                self.counters['probes'] += 1
+                return 'half_open'
+            self.counters['rejected'] += 1
+            return None
+
+    def is_open(self, host):
+        with self._lock:
+            entry = self._hosts.get(host)
+            return entry is not None and entry.state == 'open' and time.monotonic() < entry.open_until
+
+    def success(self, host, elapsed):
+        """Zaznamená úspěšný požadavek a jeho latenci"""
+        with self._lock:
+            entry = self._host(host)
+            entry.latencies.append(elapsed)
+            entry.outcomes.append(True)
+            entry.consecutive_failures = 0
+            if entry.state != 'closed':
+                # Chyby z doby před otevřením už chybovost neovlivňují
+                entry.state = 'closed'
+                entry.opened = 0
+                entry.outcomes.clear()
+                entry.outcomes.append(True)
+
+    def failure(self, host):
+        """Zaznamená chybu hostitele; vrátí True, pokud tím otevřela jistič"""
+        with self._lock:
+            entry = self._host(host)
+            entry.outcomes.append(False)
+            entry.consecutive_failures += 1
+            if entry.state == 'open':
+                return False
+            error_rate = entry.outcomes.count(False) / len(entry.outcomes)
+            if (entry.state == 'half_open' or entry.consecutive_failures >= self.failure_threshold
+                    or (len(entry.outcomes) >= 2 * self.min_samples and error_rate >= self.max_error_rate)):
+                entry.opened += 1
+                entry.state = 'open'
+                entry.open_until = time.monotonic() + min(self.open_seconds * 2 ** (entry.opened - 1),
+                                                          self.max_open_seconds)
+                self.counters['opened'] += 1
+                return True
+            return False
+
+    def release(self, host):
+        """Uvolní místo zkušebního požadavku, který skončil bez výsledku (např. lokální chybou)"""
+        with self._lock:
+            entry = self._hosts.get(host)
+            if entry is not None and entry.state == 'half_open':
+                entry.probe_started = None
+
+    def stats(self):
+        """Vrátí počty hostitelů a hostitele s otevřeným jističem (se zbývající dobou v sekundách)"""
+        now = time.monotonic()
+        with self._lock:
+            stats = dict(self.counters, hosts=len(self._hosts))
+            stats['open'] = {host: round(max(entry.open_until - now, 0), 1)
+                             for host, entry in self._hosts.items() if entry.state == 'open'}
+            stats['half_open'] = [host for host, entry in self._hosts.items() if entry.state == 'half_open']
+        return stats
+
+
+class FetchGuard:
+    """Termín, rozpočet opakování a záznam rozhodnutí pro stahování jedné analýzy.
+
+    Každý síťový požadavek analýzy projde admit (termín analýzy, jistič,
+    adaptivní timeout) a jeho výsledek se zapíše do sdíleného HostHealth.
+    Opakuje se jen po přechodné chybě a jen dokud zbývá rozpočet opakování
+    a čas. Rozhodnutí se vypisují ve výsledku analýzy v sekci fetch.
+    """
+
+    def __init__(self, health, deadline=30, retry_budget=3):
+        self.health = health
+        self.deadline = deadline
+        self.retry_budget = retry_budget
+        self.retries = 0
+        self.started = time.monotonic()
+        self.decisions = []
+        self.timeouts = {}
+        self._lock = threading.Lock()
+
+    def remaining(self):
+        return self.deadline - (time.monotonic() - self.started)
+
+    def _decide(self, url, decision, **detail):
+        with self._lock:
+            if len(self.decisions) < MAX_DECISIONS:
+                self.decisions.append(dict(url=url, decision=decision, **detail))
+
+    def admit(self, url, timeout):
+        """Vrátí timeout požadavku; vyhodí výjimku, když vypršel termín analýzy nebo je jistič hostitele otevřený"""
+        remaining = self.remaining()
+        if remaining <= 0:
+            self._decide(url, 'deadline')
+            raise Exception("Vypršel časový limit stahování analýzy")
+        host = host_of(url)
+        state = self.health.allow(host)
+        if state is None:
+            self._decide(url, 'circuit_open')
+            raise Exception(f"Hostitel {host} je dočasně vyřazen po opakovaných chybách")
+        if state == 'half_open':
+            self._decide(url, 'probe')
+        adaptive = self.health.timeout(host, timeout)
+        if adaptive < timeout:
+            with self._lock:
+                self.timeouts[host] = round(adaptive, 2)
+        return min(adaptive, remaining)
+
+    def completed(self, url, elapsed, status):
+        """Zapíše dokončený požadavek; vrátí důvod chyby hostitele (např. 'status 503') nebo None"""
+        if status >= FAILURE_STATUS or status == 429:
+            return self.failed(url, f'status {status}')
+        self.health.success(host_of(url), elapsed)
+        return None
+
+    def failed(self, url, reason):
+        """Zapíše chybu hostitele (timeout, spojení, 5xx) a vrátí její důvod"""
+        if self.health.failure(host_of(url)):
+            self._decide(url, 'circuit_opened', reason=reason)
+        return reason
+
+    def abandoned(self, url, reason):
+        """Zapíše požadavek, který selhal lokálně (např. čekáním na spojení z poolu).
+
+        Hostitel za chybu nemůže, proto se nezapisuje do HostHealth a
+        neopakuje se (nespotřebuje rozpočet opakování).
+        """
+        self.health.release(host_of(url))
+        self._decide(url, 'failed', reason=reason)
+        return reason
+
+    def retry_delay(self, url, attempt, reason):
+        """Vrátí prodlevu před opakováním požadavku, nebo None, když se opakovat nemá"""
+        if reason not in RETRY_REASONS or self.health.is_open(host_of(url)):
+            self._decide(url, 'failed', reason=reason)
+            return None
+        delay = RETRY_BACKOFF * 2 ** attempt
+        if self.remaining() <= delay:
+            self._decide(url, 'failed', reason=reason, retry='deadline')
+            return None
+        with self._lock:
+            allowed = self.retries < self.retry_budget
+            if allowed:
+                self.retries += 1
+        if not allowed:
+            self._decide(url, 'failed', reason=reason, retry='budget_exhausted')
+            return None
+        self._decide(url, 'retry', reason=reason, attempt=attempt + 1)
+        return delay
+
+    def report(self):
+        """Shrnutí pro výsledek analýzy"""
+        with self._lock:
+            return {
+                'deadline_s': self.deadline,
+                'elapsed_s': round(time.monotonic() - self.started, 2),
+                'retries': self.retries,
+                'retry_budget': self.retry_budget,
+                'timeouts': dict(self.timeouts),
+                'decisions': list(self.decisions),
+            }
+
+
+host_health = HostHealth()
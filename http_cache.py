@@ -0,0 +1,288 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from ingest import read_body
+
+# Hlavičky, které má smysl si k uložené odpovědi pamatovat
+STORED_HEADERS = ('content-type', 'cache-control', 'expires', 'etag', 'last-modified', 'date', 'vary')
+
+
+def parse_cache_control(value):
+    """Rozloží hlavičku Cache-Control na slovník direktiv"""
+    directives = {}
+    for part in (value or '').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, arg = part.partition('=')
+        directives[name.strip().lower()] = arg.strip().strip('"') or True
+    return directives
+
+
+def freshness_lifetime(headers):
+    """Spočítá, kolik sekund je odpověď čerstvá; None znamená neukládat"""
+    directives = parse_cache_control(headers.get('cache-control'))
+    if 'no-store' in directives or 'private' in directives:
+        return None
+    vary = headers.get('vary', '')
+    if vary and any(v.strip().lower() not in ('accept-encoding', '') for v in vary.split(',')):
+        return None
+    if 'no-cache' in directives:
+        return 0
+    for name in ('s-maxage', 'max-age'):
+        if name in directives:
+            try:
+                return max(int(directives[name]), 0)
+            except (TypeError, ValueError):
+                return 0
+    if headers.get('expires'):
+        try:
+            expires = parsedate_to_datetime(headers['expires']).timestamp()
+            return max(expires - time.time(), 0)
+        except (TypeError, ValueError):
+            return 0
+    return 0
+
+
+class HttpCache:
+    """Paměťová a disková cache HTTP odpovědí s revalidací a LRU vyřazováním.
+
+    Ukládá jen úspěšné GET odpovědi. Čerstvé záznamy (podle Cache-Control nebo
+    Expires) vrací bez síťového požadavku, prošlé záznamy s ETag/Last-Modified
+    revaliduje podmíněným požadavkem. Paměťová vrstva je omezená počtem záznamů
+    i celkovou velikostí, disková vrstva (je-li zadán adresář) celkovou velikostí.
+    """
+
+    def __init__(self, max_entries=512, max_bytes=64 * 1024 * 1024, directory=None,
+                 max_disk_bytes=512 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._disk = OrderedDict()
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self.counters = {'hits': 0, 'misses': 0, 'revalidations': 0, 'stores': 0, 'evictions': 0}
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._load_disk_index()
+
+    # --- paměťová vrstva -------------------------------------------------
+
+    def _remember(self, key, entry):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old:
+                self._bytes -= len(old['body'])
+            self._entries[key] = entry
+            self._bytes += len(entry['body'])
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted['body'])
+                self.counters['evictions'] += 1
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                self._entries.move_to_end(key)
+                return entry
+        entry = self._read_disk(key)
+        if entry:
+            self._remember(key, entry)
+        return entry
+
+    # --- disková vrstva --------------------------------------------------
+
+    def _path(self, key, suffix):
+        return os.path.join(self.directory, key + suffix)
+
+    def _load_disk_index(self):
+        files = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.body'):
+                path = os.path.join(self.directory, name)
+                stat = os.stat(path)
+                files.append((stat.st_mtime, name[:-5], stat.st_size))
+        for _, key, size in sorted(files):
+            self._disk[key] = size
+            self._disk_bytes += size
+
+    def _read_disk(self, key):
+        if not self.directory or key not in self._disk:
+            return None
+        try:
+            with open(self._path(key, '.json'), encoding='utf-8') as f:
+                entry = json.load(f)
+            with open(self._path(key, '.body'), 'rb') as f:
+                entry['body'] = f.read()
+            os.utime(self._path(key, '.body'))
+        except (OSError, ValueError):
+            return None
+        with self._lock:
+            if key in self._disk:
+                self._disk.move_to_end(key)
+        return entry
+
+    def _write_disk(self, key, entry):
+        if not self.directory:
+            return
+        meta = {k: v for k, v in entry.items() if k != 'body'}
+        try:
+            with open(self._path(key, '.body'), 'wb') as f:
+                f.write(entry['body'])
+            with open(self._path(key, '.json'), 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+        except OSError:
+            return
+        evicted = []
+        with self._lock:
+            self._disk_bytes -= self._disk.pop(key, 0)
+            self._disk[key] = len(entry['body'])
+            self._disk_bytes += len(entry['body'])
+            while len(self._disk) > 1 and self._disk_bytes > self.max_disk_bytes:
+                old_key, size = self._disk.popitem(last=False)
+                self._disk_bytes -= size
+                evicted.append(old_key)
+        for old_key in evicted:
+            for suffix in ('.json', '.body'):
+                try:
+                    os.remove(self._path(old_key, suffix))
+                except OSError:
+                    pass
+
+    # --- HTTP ------------------------------------------------------------
+
+    @staticmethod
+    def key(url):
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def _store(self, key, url, response, lifetime):
+        headers = {name: response.headers[name] for name in STORED_HEADERS if name in response.headers}
+        entry = {
+            'url': url,
+            'final_url': response.url,
+            'status': response.status_code,
+            'headers': headers,
+            'body': response.content,
+            'expires': time.time() + lifetime,
+        }
+        self._remember(key, entry)
+        self._write_disk(key, entry)
+        with self._lock:
+            self.counters['stores'] += 1
+        return entry
+
+    def _refresh(self, key, entry, response):
+        """Vrátí obnovenou kopii záznamu; sdílený záznam mohou současně číst jiná vlákna"""
+        with self._lock:
+            entry = dict(entry, headers=dict(entry['headers']))
+        for name in STORED_HEADERS:
+            if name in response.headers:
+                entry['headers'][name] = response.headers[name]
+        lifetime = freshness_lifetime(CaseInsensitiveDict(entry['headers']))
+        entry['expires'] = time.time() + (lifetime or 0)
+        self._remember(key, entry)
+        self._write_disk(key, entry)
+        return entry
+
+    @staticmethod
+    def to_response(entry, max_bytes=None):
+        """Sestaví z uloženého záznamu objekt requests.Response"""
+        body = entry['body']
+        truncated = 'asset_limit' if max_bytes is not None and len(body) > max_bytes else False
+        response = requests.Response()
+        response.status_code = entry['status']
+        response.reason = 'OK'
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        response.url = entry['final_url']
+        response._content = body[:max_bytes] if truncated else body
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.from_cache = True
+        response.truncated = truncated
+        return response
+
+    def lookup(self, url, max_bytes=None):
+        """Vrátí (klíč, záznam, odpověď); odpověď je vyplněná, pokud je záznam ještě čerstvý"""
+        key = self.key(url)
+        entry = self._lookup(key)
+        if entry and entry['expires'] > time.time():
+            with self._lock:
+                self.counters['hits'] += 1
+            return key, entry, self.to_response(entry, max_bytes)
+        return key, entry, None
+
+    @staticmethod
+    def validators(entry):
+        """Podmíněné hlavičky pro revalidaci prošlého záznamu"""
+        headers = {}
+        if entry:
+            if entry['headers'].get('etag'):
+                headers['If-None-Match'] = entry['headers']['etag']
+            if entry['headers'].get('last-modified'):
+                headers['If-Modified-Since'] = entry['headers']['last-modified']
+        return headers
+
+    def not_modified(self, key, entry, response, max_bytes=None):
+        """Obnoví záznam podle odpovědi 304 a vrátí uloženou odpověď"""
+        with self._lock:
+            self.counters['revalidations'] += 1
+        return self.to_response(self._refresh(key, entry, response), max_bytes)
+
+    def complete(self, key, url, response):
+        """Započítá stažení a uloží odpověď s načteným tělem, pokud smí do cache"""
+        with self._lock:
+            self.counters['misses'] += 1
+        response.from_cache = False
+        if response.status_code == 200 and not response.truncated:
+            lifetime = freshness_lifetime(response.headers)
+            has_validator = 'etag' in response.headers or 'last-modified' in response.headers
+            if lifetime is not None and (lifetime > 0 or has_validator):
+                self._store(key, url, response, lifetime)
+        return response
+
+    def get(self, session, url, timeout=10, max_bytes=None, deadline=None, budget=None):
+        """Provede GET přes cache a vrátí requests.Response.
+
+        S max_bytes se tělo čte po částech a useknuté odpovědi se neukládají.
+        Čtení těla po termínu deadline se přeruší a nic se neuloží. Načtené
+        bajty se odečítají z rozpočtu budget (ingest.ByteBudget).
+        """
+        key, entry, cached = self.lookup(url, max_bytes)
+        if cached is not None:
+            return cached
+        return self.fetch(session, url, key, entry, timeout, max_bytes, deadline, budget)
+
+    def fetch(self, session, url, key, entry, timeout=10, max_bytes=None, deadline=None, budget=None):
+        """Stáhne URL, jejíž záznam (nebo None) už vrátil lookup; prošlý záznam revaliduje"""
+        headers = self.validators(entry)
+        response = session.get(url, timeout=timeout, headers=headers, stream=max_bytes is not None)
+        if entry and headers and response.status_code == 304:
+            response.close()
+            return self.not_modified(key, entry, response, max_bytes)
+        if max_bytes is not None:
+            read_body(response, max_bytes, deadline, budget)
+        else:
+            response.truncated = False
+        return self.complete(key, url, response)
+
+    def stats(self):
+        """Vrátí statistiky cache"""
+        with self._lock:
+            stats = dict(self.counters)
+            stats.update({
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'disk_entries': len(self._disk),
+                'disk_bytes': self._disk_bytes,
+            })
+        return stats
@@ -0,0 +1,86 @@
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+# Hostitelé, ke kterým analýzy přistupují nejčastěji a zaslouží si větší pool
+DEFAULT_HOST_POOL_SIZES = {
+    'fonts.googleapis.com': 16,
+    'fonts.gstatic.com': 16,
+    'cdnjs.cloudflare.com': 16,
+    'cdn.jsdelivr.net': 16,
+}
+
+
+class ConnectionPool:
+    """Sdílený, vláknově bezpečný pool HTTP spojení pro všechny analýzy.
+
+    Každá analýza dostane vlastní requests.Session (vlastní cookies a hlavičky),
+    ale všechny sdílejí stejné adaptéry, takže keep-alive spojení a TLS relace
+    k CDN přežívají mezi analýzami. Session z poolu se nesmí zavírat, zavřela
+    by i sdílené adaptéry. Počty požadavků a spojení poolů, které urllib3
+    vyřadí, se přičítají k součtům poolu, takže statistiky se neztrácejí.
+    """
+
+    def __init__(self, pool_connections=64, pool_maxsize=8, host_pool_sizes=None, max_retries=0):
+        self._lock = threading.Lock()
+        self._retired = {}
+        self.default_adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                                           max_retries=max_retries)
+        sizes = dict(DEFAULT_HOST_POOL_SIZES)
+        sizes.update(host_pool_sizes or {})
+        self.host_adapters = {
+            host: HTTPAdapter(pool_connections=2, pool_maxsize=size, max_retries=max_retries)
+            for host, size in sizes.items()
+        }
+        for adapter in self._adapters():
+            adapter.poolmanager.pools.dispose_func = self._retire
+
+    def _retire(self, pool):
+        """Zapamatuje si počty vyřazeného poolu hostitele a zavře ho"""
+        with self._lock:
+            entry = self._retired.setdefault(pool.host, {'requests': 0, 'connections': 0})
+            entry['requests'] += pool.num_requests
+            entry['connections'] += pool.num_connections
+        pool.close()
+
+    def session(self):
+        """Vytvoří novou Session napojenou na sdílené adaptéry"""
+        session = requests.Session()
+        session.mount('http://', self.default_adapter)
+        session.mount('https://', self.default_adapter)
+        for host, adapter in self.host_adapters.items():
+            # Bez lomítka by prefix odpovídal i hostiteli fonts.googleapis.com.evil.com
+            session.mount(f'http://{host}/', adapter)
+            session.mount(f'https://{host}/', adapter)
+        return session
+
+    def _adapters(self):
+        return [self.default_adapter] + list(self.host_adapters.values())
+
+    def stats(self):
+        """Vrátí počty požadavků, nových spojení a znovupoužití spojení"""
+        with self._lock:
+            hosts = {host: dict(entry) for host, entry in self._retired.items()}
+            for adapter in self._adapters():
+                pools = adapter.poolmanager.pools
+                for key in pools.keys():
+                    pool = pools.get(key)
+                    if pool is None:
+                        continue
+                    entry = hosts.setdefault(pool.host, {'requests': 0, 'connections': 0})
+                    entry['requests'] += pool.num_requests
+                    entry['connections'] += pool.num_connections
+        for entry in hosts.values():
+            entry['misses'] = entry['connections']
+            entry['hits'] = max(entry['requests'] - entry['connections'], 0)
+        return {
+            'requests': sum(e['requests'] for e in hosts.values()),
+            'hits': sum(e['hits'] for e in hosts.values()),
+            'misses': sum(e['misses'] for e in hosts.values()),
+            'hosts': hosts,
+        }
+
+    def close(self):
+        """Zavře všechna spojení v poolu"""
+        for adapter in self._adapters():
+            adapter.close()
@@ -0,0 +1,117 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from io import BytesIO
+import numpy as np
+from PIL import Image
+
+# Ikony se analyzují zmenšené; na barvy a průhlednost stačí pár desítek pixelů
+ANALYSIS_SIDE = 64
+ALPHA_THRESHOLD = 16
+# Mřížka pro hledání převládající barvy (bitů na kanál)
+QUANTIZE_BITS = 4
+
+
+def _hex(rgb):
+    return '#' + ''.join(f'{int(round(c)):02x}' for c in rgb[:3])
+
+
+def _dominant(pixels):
+    """Převládající barva pixelů N x 3: nejčetnější buňka mřížky a průměr jejích pixelů"""
+    if not len(pixels):
+        return None
+    shift = 8 - QUANTIZE_BITS
+    cells = pixels.astype(np.int64) >> shift
+    packed = (cells[:, 0] << (2 * QUANTIZE_BITS)) | (cells[:, 1] << QUANTIZE_BITS) | cells[:, 2]
+    counts = np.bincount(packed)
+    best = np.argmax(counts)
+    return _hex(pixels[packed == best].mean(axis=0))
+
+
+def pixel_stats(rgba):
+    """Spočítá barvy a průhlednost z pole H x W x 4 (uint8)"""
+    alpha = rgba[..., 3]
+    transparent = alpha < ALPHA_THRESHOLD
+    stats = {
+        'transparent': bool(transparent.any()),
+        'transparent_ratio': round(float(transparent.mean()), 3),
+        'background_color': None,
+        'dominant_color': None,
+    }
+    # Pozadí = převládající barva krajních pixelů, pokud jsou krajní pixely neprůhledné
+    edges = np.concatenate([rgba[0], rgba[-1], rgba[1:-1, 0], rgba[1:-1, -1]])
+    opaque_edges = edges[edges[:, 3] >= 255 - ALPHA_THRESHOLD]
+    if len(opaque_edges) >= len(edges) * 0.6:
+        stats['background_color'] = _dominant(opaque_edges[:, :3])
+    opaque = rgba[alpha >= ALPHA_THRESHOLD][:, :3]
+    foreground = opaque
+    if stats['background_color'] and len(opaque):
+        background = np.array([int(stats['background_color'][i:i + 2], 16) for i in (1, 3, 5)])
+        # Převládající barva motivu bez pixelů blízkých pozadí
+        distant = np.abs(opaque.astype(np.int64) - background).sum(axis=1) > 48
+        if distant.any():
+            foreground = opaque[distant]
+    stats['dominant_color'] = _dominant(foreground)
+    return stats
+
+
+def analyze_image(content):
+    """Dekóduje obrázek co nejlevněji a vrátí jeho rozměry, formát, barvy a průhlednost.
+
+    JPEG se díky Image.draft dekóduje rovnou ve zmenšeném měřítku, u ICO se
+    vybere největší obsažená velikost a ostatní se přeskočí. SVG Pillow neumí,
+    takže u něj se vrátí jen formát.
+    """
+    head = content[:256].lstrip().lower()
+    if head.startswith(b'<svg') or head.startswith(b'<?xml') and b'<svg' in content[:1024].lower():
+        return {'format': 'svg', 'width': None, 'height': None}
+    try:
+        image = Image.open(BytesIO(content))
+        width, height = image.size
+        info = {'format': (image.format or '').lower(), 'width': width, 'height': height}
+        if image.format == 'ICO':
+            info['sizes'] = sorted(f'{w}x{h}' for w, h in image.info.get('sizes', [image.size]))
+        if image.format == 'JPEG':
+            image.draft('RGB', (ANALYSIS_SIDE, ANALYSIS_SIDE))
+        image.thumbnail((ANALYSIS_SIDE, ANALYSIS_SIDE), reducing_gap=2.0)
+        rgba = np.asarray(image.convert('RGBA'))
+    except Exception:
+        return None
+    info.update(pixel_stats(rgba))
+    return info
+
+
+class ImageCache:
+    """Výsledky analýzy obrázků podle hashe obsahu (stejná ikona na různých URL se počítá jednou)"""
+
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {'hits': 0, 'misses': 0}
+
+    def analyze(self, content):
+        key = hashlib.sha256(content).hexdigest()
+        with self._lock:
+            info = self._entries.get(key)
+            if info is not None:
+                self._entries.move_to_end(key)
+                self.counters['hits'] += 1
+                return dict(info, sha256=key)
+            self.counters['misses'] += 1
+        info = analyze_image(content)
+        if info is None:
+            return None
+        with self._lock:
+            self._entries[key] = info
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return dict(info, sha256=key)
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, entries=len(self._entries))
+
+
+# Sdílená cache procesu; analýzy ji používají, pokud nedostanou vlastní
+image_cache = ImageCache()
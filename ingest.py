@@ -0,0 +1,85 @@
+import threading
+import time
+
+CHUNK_SIZE = 64 * 1024
+
+
+class DeadlineExceeded(Exception):
+    """Stažení nestihlo termín (např. termín paralelního stahování analýzy)"""
+
+
+def read_body(response, limit, deadline=None, budget=None):
+    """Načte tělo odpovědi po částech nejvýše do limitu bajtů.
+
+    Výsledek uloží do response.content a nastaví response.truncated na False,
+    nebo na důvod useknutí ('asset_limit', 'analysis_budget'). Každá načtená
+    část se hned odečte z rozpočtu budget (ByteBudget), pokud je zadaný.
+    Useknuté spojení se zavře, aby se nečetl zbytek těla. Po termínu
+    deadline (time.monotonic) se čtení přeruší výjimkou DeadlineExceeded.
+    """
+    chunks = []
+    size = 0
+    truncated = False
+    for chunk in response.iter_content(CHUNK_SIZE):
+        if deadline is not None and time.monotonic() > deadline:
+            response.close()
+            raise DeadlineExceeded("Vypršel termín stahování")
+        if size + len(chunk) > limit:
+            chunk = chunk[:limit - size]
+            truncated = 'asset_limit'
+        if budget is not None:
+            granted = budget.charge(len(chunk))
+            if granted < len(chunk):
+                chunk = chunk[:granted]
+                truncated = 'analysis_budget'
+        chunks.append(chunk)
+        size += len(chunk)
+        if truncated:
+            break
+    if truncated:
+        response.close()
+    response._content = b''.join(chunks)
+    response._content_consumed = True
+    response.truncated = truncated
+    return response
+
+
+class ByteBudget:
+    """Rozpočet stažených bajtů jedné analýzy.
+
+    Jedno stažení smí načíst nejvýše max_asset_bytes. Z celkového limitu
+    max_total_bytes se odečítají skutečně načtené bajty, jak přicházejí po
+    částech, takže souběžná stahování si nic neblokují předem a stažení se
+    zastaví, až když se celkový limit opravdu vyčerpá.
+    """
+
+    def __init__(self, max_asset_bytes=5 * 1024 * 1024, max_total_bytes=25 * 1024 * 1024):
+        self.max_asset_bytes = max_asset_bytes
+        self.max_total_bytes = max_total_bytes
+        self.remaining = max_total_bytes
+        self.used = 0
+        self.truncated = []
+        self._lock = threading.Lock()
+
+    def exhausted(self):
+        with self._lock:
+            return self.remaining <= 0
+
+    def charge(self, size):
+        """Odečte načtené bajty; vrátí, kolik z nich se do rozpočtu ještě vešlo"""
+        with self._lock:
+            granted = min(size, self.remaining)
+            self.remaining -= granted
+            self.used += granted
+            return granted
+
+    def settle(self, url, size, truncated):
+        """Zaznamená useknuté stažení; truncated je False nebo důvod useknutí"""
+        if truncated:
+            with self._lock:
+                self.truncated.append({'url': url, 'bytes': size, 'reason': truncated})
+
+    def skip(self, url):
+        """Zaznamená zdroj, který se kvůli vyčerpanému rozpočtu vůbec nestáhl"""
+        with self._lock:
+            self.truncated.append({'url': url, 'bytes': 0, 'reason': 'analysis_budget'})
@@ -0,0 +1,176 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from scraper import ANALYSIS_STAGES
+
+
+class QueueFull(Exception):
+    """Fronta úloh je plná"""
+
+
+class MemoryJobStore:
+    """Úložiště úloh v paměti procesu (výchozí)"""
+
+    def __init__(self, max_jobs=1000):
+        self.max_jobs = max_jobs
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, job):
+        with self._lock:
+            self._jobs[job['id']] = dict(job)
+            # Nejstarší dokončené úlohy se zapomínají
+            while len(self._jobs) > self.max_jobs:
+                oldest = next((job_id for job_id, j in self._jobs.items()
+                               if j['status'] in ('done', 'error')), None)
+                if oldest is None:
+                    break
+                del self._jobs[oldest]
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                job.update(fields)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+
+class SqliteJobStore:
+    """Úložiště úloh v SQLite, sdílitelné mezi procesy jednoho stroje"""
+
+    COLUMNS = ('id', 'url', 'kind', 'total', 'status', 'stages', 'result', 'error', 'created_at', 'updated_at')
+    JSON_COLUMNS = ('stages', 'result')
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            'id TEXT PRIMARY KEY, url TEXT, kind TEXT, total INTEGER, status TEXT, stages TEXT, result TEXT, '
+            'error TEXT, created_at REAL, updated_at REAL)'
+        )
+        # Databáze ze starší verze nemají sloupce druhu úlohy a počtu kroků
+        existing = {row[1] for row in self._conn.execute('PRAGMA table_info(jobs)')}
+        for name, type in (('kind', 'TEXT'), ('total', 'INTEGER')):
+            if name not in existing:
+                self._conn.execute(f'ALTER TABLE jobs ADD COLUMN {name} {type}')
+        self._conn.commit()
+
+    def _encode(self, name, value):
+        return json.dumps(value) if name in self.JSON_COLUMNS and value is not None else value
+
+    def create(self, job):
+        values = [self._encode(name, job.get(name)) for name in self.COLUMNS]
+        with self._lock:
+            self._conn.execute(f'INSERT INTO jobs ({", ".join(self.COLUMNS)}) VALUES ({", ".join("?" * len(self.COLUMNS))})',
+                               values)
+            self._conn.commit()
+
+    def update(self, job_id, **fields):
+        fields = {name: value for name, value in fields.items() if name in self.COLUMNS}
+        if not fields:
+            return
+        assignments = ', '.join(f'{name} = ?' for name in fields)
+        values = [self._encode(name, value) for name, value in fields.items()] + [job_id]
+        with self._lock:
+            self._conn.execute(f'UPDATE jobs SET {assignments} WHERE id = ?', values)
+            self._conn.commit()
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute(f'SELECT {", ".join(self.COLUMNS)} FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if not row:
+            return None
+        job = dict(zip(self.COLUMNS, row))
+        for name in self.JSON_COLUMNS:
+            if job[name] is not None:
+                job[name] = json.loads(job[name])
+        return job
+
+
+def create_job_store(spec):
+    """Vytvoří úložiště podle specifikace: 'memory' nebo 'sqlite:///cesta.db'"""
+    if spec and spec.startswith('sqlite:///'):
+        return SqliteJobStore(spec[len('sqlite:///'):])
+    return MemoryJobStore()
+
+
+class JobQueue:
+    """Asynchronní fronta analýz nad lokálním poolem vláken.
+
+    submit() hned vrací id úlohy; analýza běží na pozadí a průběžně zapisuje
+    dokončené fáze do úložiště. Místo analýzy lze předat vlastní úlohu
+    task(progress) jiného druhu (kind), např. crawl webu, s očekávaným počtem
+    kroků total pro výpočet průběhu. Počet čekajících úloh je omezený, aby
+    fronta nerostla bez kontroly. Volitelný admit(client) vrací kontextový
+    manažer, ve kterém běží analýza (místo v řadiči přijímání); vlastní úlohy
+    si místa berou samy.
+    """
+
+    def __init__(self, store, make_analyzer, workers=4, max_pending=100, on_result=None, admit=None):
+        self.store = store
+        self.make_analyzer = make_analyzer
+        self.admit = admit
+        # Volá se s (url, výsledek) po každé dokončené analýze
+        self.on_result = on_result
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='analysis-job')
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def submit(self, url, task=None, kind='analysis', total=None, client=None):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise QueueFull("Fronta analýz je plná")
+            self._pending += 1
+        now = time.time()
+        job = {'id': uuid.uuid4().hex, 'url': url, 'kind': kind, 'total': total, 'status': 'queued', 'stages': [],
+               'result': None, 'error': None, 'created_at': now, 'updated_at': now}
+        self.store.create(job)
+        self._executor.submit(self._run, job['id'], url, task, client)
+        return job['id']
+
+    def _run(self, job_id, url, task=None, client=None):
+        stages = []
+
+        def progress(stage):
+            stages.append(stage)
+            self.store.update(job_id, stages=list(stages), updated_at=time.time())
+
+        try:
+            self.store.update(job_id, status='running', updated_at=time.time())
+            if task is not None:
+                result = task(progress)
+            else:
+                with self.admit(client) if self.admit else nullcontext():
+                    result = self.make_analyzer(url).analyze(progress=progress)
+            self.store.update(job_id, status='done', result=result, updated_at=time.time())
+            if task is None and self.on_result:
+                self.on_result(url, result)
+        except Exception as e:
+            self.store.update(job_id, status='error', error=str(e), updated_at=time.time())
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def get(self, job_id):
+        """Vrátí stav úlohy včetně podílu dokončených fází (u crawlu stránek)"""
+        job = self.store.get(job_id)
+        if job:
+            job['kind'] = job.get('kind') or 'analysis'
+            total = job.get('total') or len(ANALYSIS_STAGES)
+            job['progress'] = round(min(len(job['stages'] or []) / total, 1), 2)
+            if job['kind'] == 'analysis':
+                job['all_stages'] = ANALYSIS_STAGES
+        return job
@@ -0,0 +1,281 @@
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# Hranice histogramů latence v sekundách
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + list(extra or [])
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if value != float('inf') else '+Inf'
+
+
+class Counter:
+    """Monotónně rostoucí čítač s volitelnými štítky"""
+
+    type = 'counter'
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield self.name + '_total', _format_labels(self.labelnames, key), value
+
+
+class Gauge:
+    """Okamžitá hodnota s volitelnými štítky"""
+
+    type = 'gauge'
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def set(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = value
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield self.name, _format_labels(self.labelnames, key), value
+
+
+class Histogram:
+    """Histogram s kumulativními koši jako v Prometheu"""
+
+    type = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, ([*counts], total, count)) for key, (counts, total, count) in self._values.items())
+        for key, (counts, total, count) in items:
+            for bound, bucket_count in zip(self.buckets, counts):
+                yield (self.name + '_bucket', _format_labels(self.labelnames, key, [('le', _format_value(bound))]),
+                       bucket_count)
+            yield self.name + '_sum', _format_labels(self.labelnames, key), total
+            yield self.name + '_count', _format_labels(self.labelnames, key), count
+
+
+class Registry:
+    """Sada metrik vykreslitelná v textovém formátu Prometheu"""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name, help, labelnames=()):
+        return self.register(Gauge(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{labels} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+ANALYSIS_SECONDS = REGISTRY.histogram('webanalyzer_analysis_seconds', 'Celková doba analýzy', ['status'])
+STAGE_SECONDS = REGISTRY.histogram('webanalyzer_stage_seconds', 'Doba jednotlivých fází analýzy', ['stage'])
+STAGE_CPU_SECONDS = REGISTRY.counter('webanalyzer_stage_cpu_seconds', 'Procesorový čas fází analýzy', ['stage'])
+HTTP_REQUESTS = REGISTRY.counter('webanalyzer_http_requests', 'HTTP požadavky podle fáze a výsledku cache',
+                                 ['stage', 'cache'])
+HTTP_BYTES = REGISTRY.counter('webanalyzer_http_bytes', 'Stažené bajty podle fáze', ['stage'])
+
+_tracing_users = 0
+_tracing_started = False
+_tracing_lock = threading.Lock()
+
+
+def _start_tracing():
+    """Zapne tracemalloc; souběžné analýzy ho sdílejí, vypne se až po poslední"""
+    global _tracing_users, _tracing_started
+    with _tracing_lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracing_started = True
+        _tracing_users += 1
+
+
+def _stop_tracing():
+    global _tracing_users, _tracing_started
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0 and _tracing_started:
+            tracemalloc.stop()
+            _tracing_started = False
+
+
+class StageStats:
+    __slots__ = ('wall', 'cpu', 'requests', 'bytes', 'cache_hits', 'peak_memory')
+
+    def __init__(self):
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.requests = 0
+        self.bytes = 0
+        self.cache_hits = 0
+        self.peak_memory = None
+
+    def as_dict(self):
+        data = {
+            'wall_ms': round(self.wall * 1000, 2),
+            'cpu_ms': round(self.cpu * 1000, 2),
+            'requests': self.requests,
+            'bytes': self.bytes,
+            'cache_hits': self.cache_hits,
+        }
+        if self.peak_memory is not None:
+            data['peak_memory'] = self.peak_memory
+        return data
+
+
+class AnalysisMetrics:
+    """Měření jedné analýzy po fázích.
+
+    Zaznamenává čas (skutečný i procesorový vlákna analýzy), HTTP požadavky,
+    bajty a zásahy cache a s trace_memory také špičku alokované paměti
+    (tracemalloc; sdílí se v rámci procesu, proto je jen přibližná při
+    souběžných analýzách). Požadavky z pomocných vláken se připíší fázi,
+    která je právě aktivní.
+    """
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.stages = {}
+        self.current = None
+        self.started = time.perf_counter()
+        self.total = None
+        self._lock = threading.Lock()
+        self._tracing = False
+
+    def _stats(self, stage):
+        stats = self.stages.get(stage)
+        if stats is None:
+            stats = self.stages[stage] = StageStats()
+        return stats
+
+    @contextmanager
+    def stage(self, name):
+        with self._lock:
+            stats = self._stats(name)
+        previous = self.current
+        self.current = name
+        memory_start = None
+        if self.trace_memory:
+            if not self._tracing:
+                _start_tracing()
+                self._tracing = True
+            memory_start = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        wall_start = time.perf_counter()
+        cpu_start = time.thread_time()
+        try:
+            yield stats
+        finally:
+            stats.wall += time.perf_counter() - wall_start
+            stats.cpu += time.thread_time() - cpu_start
+            if memory_start is not None and tracemalloc.is_tracing():
+                peak = max(tracemalloc.get_traced_memory()[1] - memory_start, 0)
+                stats.peak_memory = max(stats.peak_memory or 0, peak)
+            self.current = previous
+
+    def record_request(self, size, from_cache=False):
+        """Zaznamená HTTP požadavek do aktuální fáze"""
+        with self._lock:
+            stats = self._stats(self.current or 'other')
+            stats.requests += 1
+            stats.bytes += size
+            if from_cache:
+                stats.cache_hits += 1
+
+    def finish(self, status='ok'):
+        """Ukončí měření a zapíše je do globálních metrik"""
+        if self._tracing:
+            _stop_tracing()
+            self._tracing = False
+        self.total = total = time.perf_counter() - self.started
+        ANALYSIS_SECONDS.observe(total, status=status)
+        with self._lock:
+            stages = list(self.stages.items())
+        for name, stats in stages:
+            STAGE_SECONDS.observe(stats.wall, stage=name)
+            STAGE_CPU_SECONDS.inc(stats.cpu, stage=name)
+            if stats.requests - stats.cache_hits:
+                HTTP_REQUESTS.inc(stats.requests - stats.cache_hits, stage=name, cache='miss')
+            if stats.cache_hits:
+                HTTP_REQUESTS.inc(stats.cache_hits, stage=name, cache='hit')
+            if stats.bytes:
+                HTTP_BYTES.inc(stats.bytes, stage=name)
+        return total
+
+    def report(self):
+        """Vrátí sekci timings pro výsledek analýzy"""
+        with self._lock:
+            stages = {name: stats.as_dict() for name, stats in self.stages.items()}
+        total = self.total if self.total is not None else time.perf_counter() - self.started
+        return {
+            'total_ms': round(total * 1000, 2),
+            'requests': sum(stage['requests'] for stage in stages.values()),
+            'bytes': sum(stage['bytes'] for stage in stages.values()),
+            'cache_hits': sum(stage['cache_hits'] for stage in stages.values()),
+            'stages': stages,
+        }
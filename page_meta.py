@@ -0,0 +1,112 @@
+import re
+from io import BytesIO
+from bs4.dammit import EncodingDetector
+from lxml import etree
+
+# Prvky, jejichž text se sbírá - jejich potomky nelze během průchodu uvolňovat
+TEXT_TAGS = {'a', 'title', 'h1', 'style'}
+MULTI_VALUED_ATTRIBUTES = {'rel', 'class'}
+
+
+def _attributes(element):
+    attrs = {}
+    for name, value in element.attrib.items():
+        if not isinstance(name, str):
+            continue
+        name = name.lower()
+        attrs[name] = value.split() if name in MULTI_VALUED_ATTRIBUTES else value
+    return attrs
+
+
+def _text(element):
+    return ''.join(part.strip() for part in element.itertext())
+
+
+class PageMeta:
+    """Plochý index prvků stránky sestavený jedním průchodem přes HTML.
+
+    Obsahuje vše, co potřebují extraktory metadat: <meta>, <link>, <title>,
+    první <h1>, obsah <style>, inline atributy style= a odkazy <a>. Atributy
+    jsou slovníky jako v BeautifulSoup (rel a class jsou seznamy), takže s nimi
+    lze pracovat stejně jako s tagy.
+    """
+
+    def __init__(self):
+        self.title = None
+        self.h1 = None
+        self.metas = []
+        self.links = []
+        self.styles = []
+        self.inline_styles = []
+        self.anchors = []
+        self.body_style = None
+
+    @classmethod
+    def parse(cls, content):
+        page = cls()
+        encoding = next(iter(EncodingDetector(content, is_html=True).encodings), None) or 'utf-8'
+        try:
+            events = etree.iterparse(BytesIO(content), events=('start', 'end'), html=True,
+                                     encoding=encoding, recover=True, remove_comments=True)
+            page._consume(events)
+        except (etree.LxmlError, LookupError, ValueError):
+            pass
+        return page
+
+    def _consume(self, events):
+        text_depth = 0
+        for event, element in events:
+            tag = element.tag
+            if not isinstance(tag, str):
+                continue
+            tag = tag.lower()
+            if event == 'start':
+                if tag in TEXT_TAGS:
+                    text_depth += 1
+                continue
+            attrs = None
+            style = element.get('style')
+            if style:
+                self.inline_styles.append((tag, style))
+                if tag == 'body':
+                    self.body_style = style
+            if tag == 'meta':
+                self.metas.append(_attributes(element))
+            elif tag == 'link':
+                self.links.append(_attributes(element))
+            elif tag == 'style':
+                self.styles.append(element.text or '')
+            elif tag == 'title':
+                if self.title is None:
+                    self.title = _text(element)
+            elif tag == 'h1':
+                if self.h1 is None:
+                    self.h1 = _text(element)
+            elif tag == 'a':
+                attrs = _attributes(element)
+                if attrs.get('href') is not None:
+                    attrs['text'] = _text(element)
+                    self.anchors.append(attrs)
+            if tag in TEXT_TAGS:
+                text_depth -= 1
+            if text_depth == 0 and tag not in ('html', 'body', 'head'):
+                # Zpracovaný prvek i předchozí sourozence lze uvolnit z paměti
+                element.clear(keep_tail=False)
+                parent = element.getparent()
+                if parent is not None:
+                    while element.getprevious() is not None:
+                        del parent[0]
+
+    def find_meta(self, **attrs):
+        """Vrátí první <meta> s danými hodnotami atributů nebo None"""
+        for meta in self.metas:
+            if all(meta.get(name) == value for name, value in attrs.items()):
+                return meta
+        return None
+
+    def find_links(self, rel_pattern):
+        """Vrátí <link> prvky, jejichž rel odpovídá regulárnímu výrazu"""
+        pattern = re.compile(rel_pattern, re.I)
+        return [link for link in self.links
+                if any(pattern.search(rel) for rel in link.get('rel', [])) or
+                pattern.search(' '.join(link.get('rel', [])))]
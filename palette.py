@@ -0,0 +1,330 @@
+import colorsys
+import math
+import re
+from collections import Counter
+import numpy as np
+import webcolors
+
+# Barevné tokeny v hodnotách deklarací: hex, funkce rgb()/hsl() a slova (jména se ověří proti CSS3)
+HEX_PATTERN = re.compile(r'#[0-9a-fA-F]{3,8}(?![\w-])')
+# Hodnoty se spojují znakem NUL (CSS ho v hodnotách nepřipouští), funkce nesmí přesáhnout do další hodnoty
+VALUE_SEPARATOR = '\0'
+FUNCTION_PATTERN = re.compile(r'(?:rgba?|hsla?)\([^)\0]*\)', re.I)
+WORD_PATTERN = re.compile(r'(?<![\w-])[a-zA-Z]{3,20}(?![\w(-])')
+VAR_REFERENCE_PATTERN = re.compile(r'var\(\s*--([\w-]+)')
+NUMBER_PATTERN = re.compile(r'[-+]?(?:\d+\.?\d*|\.\d+)(?:e[-+]?\d+)?(?:%|deg|grad|rad|turn)?', re.I)
+# Jednoduchý zápis rgb(r, g, b[, a]) - převádí se hromadně; ostatní řádky (.*) jednotlivě
+SIMPLE_RGB_LINE_PATTERN = re.compile(
+    r'^(?:rgba?\(\s*(\d+(?:\.\d+)?)\s*,\s*(\d+(?:\.\d+)?)\s*,\s*(\d+(?:\.\d+)?)\s*(?:,\s*(\d*\.?\d+)\s*)?\)|(.*))$',
+    re.M | re.I)
+NAMED_COLORS = {name: webcolors.hex_to_rgb(value) for name, value in webcolors.CSS3_NAMES_TO_HEX.items()}
+
+# Váha barvy podle vlastnosti, ve které se vyskytuje (ostatní vlastnosti mají 1)
+PROPERTY_WEIGHTS = {
+    'background': 3.0,
+    'background-color': 3.0,
+    'color': 3.0,
+    'border-color': 1.5,
+    'fill': 1.5,
+    'stroke': 1.5,
+    'outline-color': 1.0,
+    'box-shadow': 0.5,
+    'text-shadow': 0.5,
+}
+CUSTOM_PROPERTY_WEIGHT = 1.0
+# Vlastnosti, v jejichž hodnotách se hledají i pojmenované barvy uprostřed zkratek
+# (border: 1px solid red); jinde se jméno barvy uzná jen jako celá hodnota
+NAMED_COLOR_PROPERTIES = set(PROPERTY_WEIGHTS) | {
+    'background-image', 'border', 'border-top', 'border-right', 'border-bottom', 'border-left',
+    'border-top-color', 'border-right-color', 'border-bottom-color', 'border-left-color',
+    'outline', 'column-rule', 'column-rule-color', 'text-decoration', 'text-decoration-color',
+    'caret-color', 'accent-color',
+}
+
+# sRGB (lineární) -> LMS a LMS' -> OKLab podle Björna Ottossona
+_RGB_TO_LMS = np.array([
+    [0.4122214708, 0.5363325363, 0.0514459929],
+    [0.2119034982, 0.6806995451, 0.1073969566],
+    [0.0883024619, 0.2817188376, 0.6299787005],
+])
+_LMS_TO_OKLAB = np.array([
+    [0.2104542553, 0.7936177850, -0.0040720468],
+    [1.9779984951, -2.4285922050, 0.4505937099],
+    [0.0259040371, 0.7827717662, -0.8086757660],
+])
+
+
+def _channel(token, scale):
+    """Převede složku rgb() (číslo nebo procenta) na 0..1"""
+    if token.endswith('%'):
+        return float(token[:-1]) / 100
+    return float(token) / scale
+
+
+def _hue(token):
+    token = token.lower()
+    if token.endswith('turn'):
+        return float(token[:-4]) * 360
+    if token.endswith('grad'):
+        return float(token[:-4]) * 0.9
+    if token.endswith('rad'):
+        return math.degrees(float(token[:-3]))
+    if token.endswith('deg'):
+        return float(token[:-3])
+    return float(token)
+
+
+def parse_color(token):
+    """Převede barevný token na (r, g, b, alfa) v rozsahu 0..1 nebo None"""
+    token = token.strip()
+    lower = token.lower()
+    try:
+        if lower.startswith('#'):
+            digits = lower[1:]
+            if len(digits) in (3, 4):
+                digits = ''.join(c * 2 for c in digits)
+            if len(digits) not in (6, 8):
+                return None
+            alpha = int(digits[6:8], 16) / 255 if len(digits) == 8 else 1.0
+            return int(digits[0:2], 16) / 255, int(digits[2:4], 16) / 255, int(digits[4:6], 16) / 255, alpha
+        if lower.startswith(('rgb', 'hsl')):
+            parts = NUMBER_PATTERN.findall(lower[lower.index('(') + 1:])
+            if len(parts) < 3:
+                return None
+            alpha = _channel(parts[3], 1) if len(parts) > 3 else 1.0
+            if lower.startswith('rgb'):
+                r, g, b = (_channel(part, 255) for part in parts[:3])
+            else:
+                hue = _hue(parts[0]) % 360 / 360
+                saturation = float(parts[1].rstrip('%')) / 100
+                lightness = float(parts[2].rstrip('%')) / 100
+                r, g, b = colorsys.hls_to_rgb(hue, lightness, saturation)
+            clamp = lambda value: min(max(value, 0.0), 1.0)
+            return clamp(r), clamp(g), clamp(b), clamp(alpha)
+        rgb = NAMED_COLORS.get(lower)
+        if rgb:
+            return rgb.red / 255, rgb.green / 255, rgb.blue / 255, 1.0
+    except ValueError:
+        return None
+    return None
+
+
+def to_hex(rgb):
+    return '#' + ''.join(f'{int(round(min(max(c, 0.0), 1.0) * 255)):02x}' for c in rgb[:3])
+
+
+def srgb_to_oklab(rgb):
+    """Převede pole N x 3 sRGB (0..1) do OKLab"""
+    rgb = np.asarray(rgb, dtype=np.float64)
+    linear = np.where(rgb <= 0.04045, rgb / 12.92, ((rgb + 0.055) / 1.055) ** 2.4)
+    lms = np.cbrt(linear @ _RGB_TO_LMS.T)
+    return lms @ _LMS_TO_OKLAB.T
+
+
+def _color_tokens(text, scan_words):
+    tokens = HEX_PATTERN.findall(text)
+    lower = text.lower() if scan_words or 'RGB' in text or 'HSL' in text else text
+    if 'rgb' in lower or 'hsl' in lower:
+        tokens += FUNCTION_PATTERN.findall(text)
+    if scan_words:
+        tokens += [word for word in WORD_PATTERN.findall(text) if word.lower() in NAMED_COLORS]
+    return tokens
+
+
+def collect_colors(css_index):
+    """Sečte váhy všech barevných tokenů v indexu CSS.
+
+    Váha vychází z vlastnosti (pozadí a barva textu víc než stíny) a u vlastních
+    vlastností z počtu jejich použití přes var(). Hex zápisy a funkce se hledají
+    regulárními výrazy nad spojeným textem skupiny, ne po jednotlivých hodnotách.
+    """
+    groups = {}
+    for prop, entries in css_index.by_property.items():
+        if prop[:2] != '--':
+            key = (PROPERTY_WEIGHTS.get(prop, 1.0), prop in NAMED_COLOR_PROPERTIES)
+            groups.setdefault(key, []).extend([value for order, value, rule in entries])
+    custom = css_index.custom_declarations
+    custom_values = [value for name, value in custom]
+    all_text = '\n'.join(['\n'.join(values) for values in groups.values()] + custom_values)
+    references = Counter(VAR_REFERENCE_PATTERN.findall(all_text.lower())) if 'var(' in all_text else {}
+    token_groups = []
+    for (weight, scan_words), values in groups.items():
+        tokens = _color_tokens(VALUE_SEPARATOR.join(values), scan_words)
+        if not scan_words:
+            tokens += [value for value in values if value.isalpha() and value.lower() in NAMED_COLORS]
+        token_groups.append((weight, tokens))
+    # Používané vlastní vlastnosti váží podle počtu odkazů, ostatní se zpracují najednou
+    custom_groups = {}
+    if references:
+        for name, value in [(name, value) for name, value in custom if name in references]:
+            custom_groups.setdefault(CUSTOM_PROPERTY_WEIGHT * (1 + references[name]), []).append(value)
+        custom_values = [value for name, value in custom if name not in references]
+    custom_groups[CUSTOM_PROPERTY_WEIGHT] = custom_values
+    for weight, values in custom_groups.items():
+        tokens = _color_tokens(VALUE_SEPARATOR.join(values), False)
+        tokens += [value for value in values if value.isalpha() and value.lower() in NAMED_COLORS]
+        token_groups.append((weight, tokens))
+    weights = {}
+    for weight, tokens in token_groups:
+        counts = Counter(tokens)
+        if not weights:
+            weights = {token: count * weight for token, count in counts.items()}
+            continue
+        for token, count in counts.items():
+            weights[token] = weights.get(token, 0) + count * weight
+    return weights
+
+
+def parse_colors(token_weights, min_alpha=0.1):
+    """Převede tokeny s vahami na pole barev N x 3 (0..1) a vah, sloučené podle výsledné barvy.
+
+    Šestimístné a osmimístné hex zápisy (naprostá většina) se převádějí najednou
+    přes bytes.fromhex, ostatní tokeny jednotlivě.
+    """
+    groups = {3: [], 4: [], 6: [], 8: []}
+    group_weights = {3: [], 4: [], 6: [], 8: []}
+    rgb_tokens = []
+    rgb_weights = []
+    other_rgba = []
+    other_weights = []
+    for token, weight in token_weights.items():
+        first = token[0]
+        if first == '#':
+            length = len(token) - 1
+            if length in groups:
+                groups[length].append(token[1:])
+                group_weights[length].append(weight)
+        elif first in 'rR' and token[:3].lower() == 'rgb':
+            rgb_tokens.append(token.replace('\n', ' '))
+            rgb_weights.append(weight)
+        elif first in 'hH' or token.lower() in NAMED_COLORS:
+            rgba = parse_color(token)
+            if rgba is not None:
+                other_rgba.append(rgba)
+                other_weights.append(weight)
+    if rgb_tokens:
+        matches = SIMPLE_RGB_LINE_PATTERN.findall('\n'.join(rgb_tokens))
+        simple = []
+        simple_weights = []
+        for (r, g, b, a, rest), token, weight in zip(matches, rgb_tokens, rgb_weights):
+            if rest or not r:
+                rgba = parse_color(token)
+                if rgba is not None:
+                    other_rgba.append(rgba)
+                    other_weights.append(weight)
+            else:
+                simple.append((r, g, b, a or '1'))
+                simple_weights.append(weight)
+        if simple:
+            values = np.array(simple, dtype=np.float64)
+            values[:, :3] = np.clip(values[:, :3] / 255.0, 0, 1)
+            values[:, 3] = np.clip(values[:, 3], 0, 1)
+            other_rgba.extend(values.tolist())
+            other_weights.extend(simple_weights)
+    rgba_parts = []
+    weight_parts = []
+    for length, digits in groups.items():
+        if not digits:
+            continue
+        if length in (3, 4):
+            digits = [''.join(c * 2 for c in d) for d in digits]
+        channels = 3 if length in (3, 6) else 4
+        values = np.frombuffer(bytes.fromhex(''.join(digits)), dtype=np.uint8).reshape(-1, channels) / 255.0
+        if channels == 3:
+            values = np.hstack([values, np.ones((len(values), 1))])
+        rgba_parts.append(values)
+        weight_parts.append(np.asarray(group_weights[length], dtype=np.float64))
+    if other_rgba:
+        rgba_parts.append(np.asarray(other_rgba, dtype=np.float64))
+        weight_parts.append(np.asarray(other_weights, dtype=np.float64))
+    if not rgba_parts:
+        return np.empty((0, 3)), np.empty(0)
+    rgba = np.vstack(rgba_parts)
+    weights = np.concatenate(weight_parts) * rgba[:, 3]
+    visible = rgba[:, 3] >= min_alpha
+    rgb8 = np.rint(rgba[visible, :3] * 255).astype(np.int64)
+    packed = (rgb8[:, 0] << 16) | (rgb8[:, 1] << 8) | rgb8[:, 2]
+    unique, inverse = np.unique(packed, return_inverse=True)
+    merged_weights = np.bincount(inverse, weights=weights[visible])
+    rgb = np.stack([(unique >> 16) & 255, (unique >> 8) & 255, unique & 255], axis=1) / 255.0
+    return rgb, merged_weights
+
+
+def kmeans(points, weights, k, iterations=25, tolerance=1e-6):
+    """Vážený k-means s deterministickou inicializací k-means++ (nejtěžší bod první)"""
+    n = len(points)
+    k = min(k, n)
+    centers = np.empty((k, points.shape[1]))
+    centers[0] = points[np.argmax(weights)]
+    distances = np.sum((points - centers[0]) ** 2, axis=1)
+    for i in range(1, k):
+        # Nejdál od dosavadních středů s ohledem na váhu bodu
+        centers[i] = points[np.argmax(distances * weights)]
+        distances = np.minimum(distances, np.sum((points - centers[i]) ** 2, axis=1))
+    labels = np.zeros(n, dtype=np.intp)
+    for _ in range(iterations):
+        distances = ((points[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+        labels = distances.argmin(axis=1)
+        totals = np.bincount(labels, weights=weights, minlength=k)
+        sums = np.stack([np.bincount(labels, weights=weights * points[:, d], minlength=k)
+                         for d in range(points.shape[1])], axis=1)
+        occupied = totals > 0
+        new_centers = centers.copy()
+        new_centers[occupied] = sums[occupied] / totals[occupied, None]
+        shift = np.max(np.abs(new_centers - centers))
+        centers = new_centers
+        if shift < tolerance:
+            break
+    return centers, labels
+
+
+def quantize(rgb, weights, bits=4):
+    """Sloučí barvy do mřížky 2^bits na kanál; vrátí vážené průměry buněk a jejich váhy"""
+    levels = (1 << bits) - 1
+    cells = np.rint(rgb * levels).astype(np.int64)
+    packed = (cells[:, 0] << (2 * bits)) | (cells[:, 1] << bits) | cells[:, 2]
+    unique, inverse = np.unique(packed, return_inverse=True)
+    cell_weights = np.bincount(inverse, weights=weights)
+    means = np.stack([np.bincount(inverse, weights=weights * rgb[:, d]) for d in range(3)], axis=1)
+    return means / cell_weights[:, None], cell_weights
+
+
+def extract_palette(css_index, k=8, min_alpha=0.1, max_points=4096):
+    """Vrátí paletu stylů seřazenou podle váhy: [{'color', 'share', 'lightness', 'chroma'}]
+
+    Barvy se shlukují v OKLab, kde vzdálenost odpovídá vnímanému rozdílu. Při
+    velkém počtu různých barev se k-means počítá nad kvantizovanou mřížkou.
+    Shluk zastupuje skutečně použitá barva nejbližší jeho středu.
+    """
+    rgb, weights = parse_colors(collect_colors(css_index), min_alpha)
+    if not len(rgb):
+        return []
+    points = srgb_to_oklab(rgb)
+    if len(rgb) > max_points:
+        cell_rgb, cell_weights = quantize(rgb, weights)
+        centers, _ = kmeans(srgb_to_oklab(cell_rgb), cell_weights, k)
+        labels = ((points[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2).argmin(axis=1)
+    else:
+        centers, labels = kmeans(points, weights, k)
+    total = weights.sum()
+    palette = []
+    for cluster in range(len(centers)):
+        members = np.flatnonzero(labels == cluster)
+        if not len(members):
+            continue
+        distances = np.sum((points[members] - centers[cluster]) ** 2, axis=1)
+        representative = members[np.argmin(distances)]
+        lightness, a, b = points[representative]
+        palette.append({
+            'color': to_hex(rgb[representative]),
+            'share': round(float(weights[members].sum() / total), 4),
+            'lightness': round(float(lightness), 3),
+            'chroma': round(float(math.hypot(a, b)), 3),
+        })
+    palette.sort(key=lambda entry: entry['share'], reverse=True)
+    return palette
+
+
+def is_neutral_extreme(entry, chroma=0.02):
+    """Téměř černá nebo téměř bílá - jako barva značky nepoužitelná"""
+    return entry['chroma'] < chroma and (entry['lightness'] < 0.1 or entry['lightness'] > 0.98)
@@ -0,0 +1,212 @@
+import re
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urljoin, urlparse
+
+IMPORT_PATTERN = re.compile(r'@import\s+(?:url\()?["\']?([^);\s]+)["\']?\s*\)?\s*;?', re.I)
+
+
+def is_stylesheet_link(link):
+    """Zjistí, zda <link> odkazuje na stylesheet (včetně preload as=style)"""
+    rel_values = link.get('rel') or []
+    if isinstance(rel_values, str):
+        rel_values = [rel_values]
+    rel_values = [r.lower() for r in rel_values]
+    as_attr = (link.get('as') or '').lower()
+    if 'stylesheet' in rel_values:
+        return True
+    return 'preload' in rel_values and as_attr == 'style'
+
+
+class FetchStage:
+    """Paralelní stahování s limitem spojení na hostitele a celkovým termínem.
+
+    Úloha dostane jako timeout čas zbývající do termínu a musí ho dodržet
+    včetně čtení těla, protože po termínu se na ni už nečeká.
+    """
+
+    def __init__(self, max_workers=8, per_host_limit=4, deadline=20):
+        self.max_workers = max_workers
+        self.per_host_limit = per_host_limit
+        self.deadline = deadline
+
+    def run(self, tasks):
+        """Spustí úlohy (url, funkce, callback); callback může vrátit další úlohy.
+
+        Vrací URL úloh, které do termínu nedoběhly.
+        """
+        pending = deque(tasks)
+        running = {}
+        host_active = Counter()
+        deadline = time.monotonic() + self.deadline
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            while pending or running:
+                deferred = deque()
+                while pending and len(running) < self.max_workers:
+                    task = pending.popleft()
+                    host = urlparse(task[0]).netloc
+                    if host_active[host] >= self.per_host_limit:
+                        deferred.append(task)
+                        continue
+                    remaining = max(deadline - time.monotonic(), 0.1)
+                    future = executor.submit(task[1], task[0], remaining)
+                    running[future] = (task, host)
+                    host_active[host] += 1
+                pending = deferred + pending
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not running:
+                    break
+                done, _ = wait(running, timeout=remaining, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task, host = running.pop(future)
+                    host_active[host] -= 1
+                    try:
+                        result = future.result()
+                    except Exception:
+                        result = None
+                    pending.extend(task[2](result) or [])
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        return [task[0] for task, host in running.values()] + [task[0] for task in pending]
+
+
+class ResourceGraph:
+    """Graf stylů jedné analýzy - každý stylesheet i @import se stáhne jen jednou"""
+
+    def __init__(self, fetch, max_import_depth=3, stage=None, fetch_image=None):
+        self.fetch = fetch
+        self.fetch_image = fetch_image
+        self.max_import_depth = max_import_depth
+        self.stage = stage or FetchStage()
+        self.resources = {}
+        self.images = {}
+        self.skipped = []
+        self.prefetched = False
+
+    def get(self, url):
+        """Vrátí stažený zdroj {'url', 'final_url', 'text'} nebo None"""
+        if url not in self.resources:
+            self.resources[url] = self.fetch(url)
+        return self.resources[url]
+
+    def image(self, url):
+        """Vrátí stažený a analyzovaný obrázek nebo None"""
+        if url not in self.images:
+            self.images[url] = self.fetch_image(url) if self.fetch_image else None
+        return self.images[url]
+
+    @staticmethod
+    def import_urls(css_content, base_url):
+        """Vrátí URL všech @importů stylu"""
+        urls = []
+        for import_target in IMPORT_PATTERN.findall(css_content):
+            import_target = import_target.strip().strip("\"'")
+            urls.append(urljoin(base_url, import_target) if base_url else import_target)
+        return urls
+
+    @staticmethod
+    def link_urls(page, base_url):
+        """Vrátí URL stylesheetů odkazovaných ze stránky v pořadí dokumentu"""
+        urls = {}
+        for link in page.links:
+            href = link.get('href')
+            if href and is_stylesheet_link(link):
+                urls.setdefault(urljoin(base_url, href))
+        return list(urls)
+
+    def add_prefetched(self, resources, images, skipped=(), stylesheets=True):
+        """Převezme stylesheety a obrázky stažené mimo graf (např. asynchronně)"""
+        if stylesheets:
+            self.prefetched = True
+        self.resources.update(resources)
+        self.images.update(images)
+        self.skipped.extend(skipped)
+
+    def _import_tasks(self, css_content, base_url, depth, scheduled):
+        tasks = []
+        if depth > self.max_import_depth or not css_content:
+            return tasks
+        for full_url in self.import_urls(css_content, base_url):
+            if full_url not in scheduled and full_url not in self.resources:
+                scheduled.add(full_url)
+                tasks.append(self._css_task(full_url, depth + 1, scheduled))
+        return tasks
+
+    def _css_task(self, url, depth, scheduled):
+        def done(resource):
+            self.resources[url] = resource
+            if resource and resource['text']:
+                return self._import_tasks(resource['text'], resource['final_url'], depth, scheduled)
+            return []
+        return (url, self.fetch, done)
+
+    def _image_task(self, url):
+        def done(image):
+            self.images[url] = image
+        return (url, self.fetch_image, done)
+
+    def prefetch(self, page, base_url, stylesheets=True, images=()):
+        """Paralelně stáhne stylesheety, jejich @importy a obrázky"""
+        images = list(images)
+        scheduled = set()
+        tasks = []
+        if stylesheets and not self.prefetched:
+            self.prefetched = True
+            for style in page.styles:
+                if style:
+                    tasks.extend(self._import_tasks(style, base_url, 0, scheduled))
+            for full_url in self.link_urls(page, base_url):
+                if full_url not in scheduled:
+                    scheduled.add(full_url)
+                    tasks.append(self._css_task(full_url, 0, scheduled))
+        if self.fetch_image:
+            tasks.extend(self._image_task(url) for url in dict.fromkeys(images) if url not in self.images)
+        if not tasks:
+            return
+        skipped = self.stage.run(tasks)
+        self.skipped.extend(skipped)
+        # Co nedoběhlo do termínu, se už v této analýze znovu nestahuje
+        for url in skipped:
+            if url in scheduled:
+                self.resources.setdefault(url, None)
+            else:
+                self.images.setdefault(url, None)
+
+    def _expand(self, css_content, base_url, origin, depth, visited):
+        """Vrací importované styly (rekurzivně) a nakonec samotný zdroj"""
+        if depth <= self.max_import_depth:
+            for full_url in self.import_urls(css_content, base_url):
+                if full_url in visited:
+                    continue
+                visited.add(full_url)
+                resource = self.get(full_url)
+                if resource and resource['text']:
+                    yield from self._expand(resource['text'], resource['final_url'], origin, depth + 1, visited)
+        yield {'content': css_content, 'base': base_url, 'origin': origin}
+
+    def iter_sources(self, page, base_url):
+        """Postupně vrací CSS zdroje stránky bez skládání do jednoho textu.
+
+        Obsah @importu předchází stylu, který ho importuje, jako by byl vložen
+        na jeho místo.
+        """
+        visited = set()
+        for style in page.styles:
+            if style:
+                yield from self._expand(style, base_url, 'inline', 0, visited)
+        seen_urls = set()
+        for link in page.links:
+            if not is_stylesheet_link(link):
+                continue
+            href = link.get('href')
+            if not href:
+                continue
+            full_url = urljoin(base_url, href)
+            if full_url in seen_urls:
+                continue
+            seen_urls.add(full_url)
+            resource = self.get(full_url)
+            if resource and resource['text']:
+                yield from self._expand(resource['text'], resource['final_url'], 'link', 0, visited)
@@ -0,0 +1,141 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import nullcontext
+from urllib.parse import urlsplit, urlunsplit
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def normalize_url(url):
+    """Normalizuje URL pro použití jako klíč cache"""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f'{host}:{parts.port}'
+    path = parts.path or '/'
+    return urlunsplit((scheme, host, path, parts.query, ''))
+
+
+class _Flight:
+    """Probíhající analýza, na jejíž výsledek čekají souběžné požadavky"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class ResultCache:
+    """Cache celých výsledků analýzy s TTL, single-flight a revalidací.
+
+    Klíčem je normalizovaná URL (požadovaná i finální po přesměrování).
+    Souběžné požadavky na stejnou URL spustí jedinou analýzu. Prošlý záznam lze
+    revalidovat: stáhne se jen HTML a styly a pokud se jejich otisk nezměnil,
+    použije se původní výsledek bez opakování extrakce.
+    """
+
+    def __init__(self, ttl=600, max_entries=256, revalidate=True):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.revalidate = revalidate
+        self._entries = OrderedDict()
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.counters = {'hit': 0, 'miss': 0, 'revalidated': 0, 'coalesced': 0}
+
+    def _store(self, keys, result, fingerprint):
+        entry = {'result': result, 'fingerprint': fingerprint, 'stored_at': time.time()}
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+                self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _count(self, status):
+        with self._lock:
+            self.counters[status] += 1
+
+    def peek(self, url, variant=None):
+        """Vrátí platný výsledek z cache bez spuštění analýzy, jinak None"""
+        key = self._key(url, variant)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.time() - entry['stored_at'] < self.ttl:
+                self._entries.move_to_end(key)
+                self.counters['hit'] += 1
+                return entry['result']
+        return None
+
+    def get_or_analyze(self, url, make_analyzer, refresh=False, variant=None, admit=None):
+        """Vrátí (výsledek, stav), kde stav je hit, miss, revalidated nebo coalesced.
+
+        variant odlišuje výsledky téže URL s jiným obsahem (např. výběr polí).
+        admit je volitelný kontextový manažer, ve kterém běží jen skutečná
+        analýza (ne zásah cache ani čekání na souběžnou analýzu).
+        """
+        key = self._key(url, variant)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and not refresh and time.time() - entry['stored_at'] < self.ttl:
+                self._entries.move_to_end(key)
+                self.counters['hit'] += 1
+                return entry['result'], 'hit'
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            flight.event.wait()
+            if flight.error:
+                raise flight.error
+            self._count('coalesced')
+            return flight.result, 'coalesced'
+        try:
+            with admit() if admit else nullcontext():
+                result, status = self._analyze(key, entry, make_analyzer, refresh, variant)
+            flight.result = result
+            return result, status
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.event.set()
+
+    @staticmethod
+    def _key(url, variant=None):
+        key = normalize_url(url)
+        return f'{key}#{variant}' if variant else key
+
+    def _analyze(self, key, entry, make_analyzer, refresh, variant=None):
+        analyzer = make_analyzer()
+        if entry and self.revalidate and not refresh:
+            fingerprint = analyzer.fingerprint()
+            if fingerprint == entry['fingerprint']:
+                self._store([key], entry['result'], fingerprint)
+                self._count('revalidated')
+                return entry['result'], 'revalidated'
+        result = analyzer.analyze()
+        self._put(key, analyzer, result, variant)
+        return result, 'miss'
+
+    def _put(self, key, analyzer, result, variant):
+        keys = {key, self._key(analyzer.base_url, variant)}
+        self._store(keys, result, analyzer.fingerprint())
+        self._count('miss')
+
+    def put(self, url, analyzer, result, variant=None):
+        """Uloží výsledek analýzy provedené mimo get_or_analyze (např. streamované)"""
+        self._put(self._key(url, variant), analyzer, result, variant)
+
+    def stats(self):
+        """Vrátí statistiky cache výsledků"""
+        with self._lock:
+            stats = dict(self.counters)
+            stats['entries'] = len(self._entries)
+            stats['in_flight'] = len(self._flights)
+        return stats
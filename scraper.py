@@ -4,65 +4,356 @@ import cssutils
 import re
 from urllib.parse import urljoin, urlparse
 import base64
-from io import BytesIO
-from PIL import Image
+import hashlib
+import threading
+import time
 import webcolors
+from resources import ResourceGraph, FetchStage
+from css_index import CssIndex
+from cascade import Cascade, parse_document
+from ingest import ByteBudget, DeadlineExceeded, read_body
+from page_meta import PageMeta
+from metrics import AnalysisMetrics
+from palette import extract_palette, is_neutral_extreme, parse_color, to_hex
+from icons import image_cache as shared_image_cache
+from host_health import FetchGuard, host_health as shared_host_health
+
+# Pole výsledku a metody, které je počítají, v pořadí analýzy
+EXTRACTORS = [
+    ('title', 'extract_title'),
+    ('description', 'extract_description'),
+    ('icons', 'extract_icons'),
+    ('splash_screen', 'extract_splash_screen'),
+    ('fonts', 'extract_fonts'),
+    ('colors', 'extract_colors'),
+    ('ui_specs', 'extract_ui_specs'),
+    ('links', 'extract_links'),
+]
+FIELDS = [field for field, method in EXTRACTORS]
+EXTRACTOR_METHODS = dict(EXTRACTORS)
+ANALYSIS_STAGES = ['page', 'assets'] + FIELDS
+# Kolik kandidátů ikon a startovacích obrázků se nejvýš stahuje
+MAX_ICON_CANDIDATES = 6
+MAX_SPLASH_CANDIDATES = 2
+# Chyby požadavku, které ukazují na potíže hostitele (a dají se zopakovat)
+TRANSIENT_ERRORS = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+# Vstupy, které musí být připravené před spuštěním extraktoru (stránka se načítá vždy).
+# Ikony a splash screen čtou CSS jen jako záložní zdroj barvy, proto si ho stáhnou až při potřebě.
+FIELD_INPUTS = {
+    'icons': ('images',),
+    'splash_screen': ('images',),
+    'fonts': ('css',),
+    'colors': ('css',),
+    'ui_specs': ('css',),
+}
+# Cena vstupů pro pořadí polí při streamování: nejdřív pole jen z HTML, pak z obrázků, nakonec ze stylů
+INPUT_COST = {'images': 1, 'css': 2}
+
+
+def parse_fields(fields):
+    """Převede seznam polí (nebo text 'title,icons') na seznam v pořadí analýzy; prázdný znamená vše"""
+    if isinstance(fields, str):
+        fields = fields.split(',')
+    requested = {field.strip() for field in fields or [] if field.strip()}
+    if not requested:
+        return list(FIELDS)
+    unknown = requested - set(FIELDS)
+    if unknown:
+        raise Exception(f"Neznámá pole: {', '.join(sorted(unknown))}")
+    return [field for field in FIELDS if field in requested]
+
 
 class WebAnalyzer:
-    def __init__(self, url):
+    def __init__(self, url, pool=None, cache=None, max_workers=8, per_host_limit=4, fetch_deadline=20,
+                 max_asset_bytes=5 * 1024 * 1024, max_total_bytes=25 * 1024 * 1024, timings=False, fields=None,
+                 image_cache=None, shared_assets=None, health=None, deadline=30, retry_budget=3):
         self.url = url
+        self.image_cache = image_cache or shared_image_cache
+        self.guard = FetchGuard(health or shared_host_health, deadline=deadline, retry_budget=retry_budget)
+        self.fields = parse_fields(fields)
+        self.cache = cache
+        self.timings = timings
+        self.metrics = AnalysisMetrics(trace_memory=timings)
+        self.budget = ByteBudget(max_asset_bytes=max_asset_bytes, max_total_bytes=max_total_bytes)
         self.base_url = url
-        self.session = requests.Session()
+        self.session = pool.session() if pool else requests.Session()
         self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+            'User-Agent': USER_AGENT
         })
-        self.soup = None
+        self.page = None
+        self.page_content = None
+        self._soup = None
+        self.page_hash = None
         self.css_rules = []
+        self.css_index = None
+        self.cascade = None
+        self._css_prefetch = None
+        stage = FetchStage(max_workers=max_workers, per_host_limit=per_host_limit, deadline=fetch_deadline)
+        fetch_css, fetch_image = self.download_css, self.download_image
+        if shared_assets is not None:
+            # Při procházení webu se styly a obrázky sdílejí mezi stránkami
+            fetch_css, fetch_image = shared_assets.wrap('css', fetch_css), shared_assets.wrap('image', fetch_image)
+        self.resources = ResourceGraph(fetch_css, stage=stage, fetch_image=fetch_image)
         
+    def admit_download(self, url):
+        """Ověří, že z rozpočtu bajtů ještě něco zbývá; jinak zdroj přeskočí výjimkou"""
+        if self.budget.exhausted():
+            self.budget.skip(url)
+            raise Exception("Vyčerpán rozpočet stažených dat analýzy")
+    
+    def settle_download(self, url, response):
+        """Zaúčtuje dokončené stažení do rozpočtu a měření"""
+        from_cache = getattr(response, 'from_cache', False)
+        if from_cache:
+            # Tělo z cache se nečetlo po částech, do rozpočtu se započítá najednou
+            size = len(response.content)
+            granted = self.budget.charge(size)
+            if granted < size:
+                response._content = response.content[:granted]
+                response.truncated = 'analysis_budget'
+        self.budget.settle(url, len(response.content), response.truncated)
+        self.metrics.record_request(len(response.content), from_cache)
+        return response
+    
+    def http_get(self, url, timeout=10, deadline=None):
+        """Provede GET požadavek v rámci rozpočtu bajtů, přes HTTP cache je-li k dispozici.
+
+        deadline (time.monotonic) omezuje celé stažení včetně opakování a čtení těla.
+        """
+        self.admit_download(url)
+        response = self._guarded_get(url, timeout, self.budget.max_asset_bytes, deadline)
+        return self.settle_download(url, response)
+    
+    def _guarded_get(self, url, timeout, limit, deadline=None):
+        """GET s adaptivním timeoutem a jističem hostitele; přechodné chyby opakuje v rámci rozpočtu analýzy"""
+        if self.cache:
+            key, entry, cached = self.cache.lookup(url, limit)
+            if cached is not None:
+                return cached
+        attempt = 0
+        while True:
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise DeadlineExceeded("Vypršel termín stahování")
+                timeout = min(timeout, remaining)
+            request_timeout = self.guard.admit(url, timeout)
+            start = time.monotonic()
+            try:
+                if self.cache:
+                    # Záznam z prvního lookup se použije k revalidaci, cache se znovu neprohledává
+                    response = self.cache.fetch(self.session, url, key, entry, timeout=request_timeout,
+                                                max_bytes=limit, deadline=deadline, budget=self.budget)
+                else:
+                    response = read_body(self.session.get(url, timeout=request_timeout, stream=True), limit,
+                                         deadline, self.budget)
+            except TRANSIENT_ERRORS as e:
+                reason = self.guard.failed(url, 'timeout' if isinstance(e, requests.Timeout) else 'connection')
+                delay = self.guard.retry_delay(url, attempt, reason)
+                if delay is None:
+                    raise
+            else:
+                # I revalidace 304 je odpověď hostitele; čerstvé záznamy cache se vrátily už výše
+                reason = self.guard.completed(url, time.monotonic() - start, response.status_code)
+                delay = self.guard.retry_delay(url, attempt, reason) if reason else None
+                if delay is None:
+                    return response
+            if deadline is not None and time.monotonic() + delay >= deadline:
+                raise DeadlineExceeded("Vypršel termín stahování")
+            time.sleep(delay)
+            attempt += 1
+    
     def fetch_page(self):
         """Načte HTML stránku"""
         try:
-            response = self.session.get(self.url, timeout=10)
-            response.raise_for_status()
-            self.soup = BeautifulSoup(response.content, 'lxml')
-            self.base_url = response.url  # Aktualizace base_url pro relativní odkazy
+            with self.metrics.stage('page'):
+                self.load_page(self.http_get(self.url, timeout=10))
             return True
         except Exception as e:
             raise Exception(f"Chyba při načítání stránky: {str(e)}")
     
+    def load_page(self, response):
+        """Zpracuje staženou odpověď stránky (i stažené mimo analyzátor)"""
+        response.raise_for_status()
+        self.page_content = response.content
+        self.page = PageMeta.parse(response.content)
+        self._soup = None
+        self.page_hash = hashlib.sha256(response.content).hexdigest()
+        self.base_url = response.url  # Aktualizace base_url pro relativní odkazy
+    
+    @property
+    def soup(self):
+        """Úplný strom dokumentu; sestavuje se až při prvním použití"""
+        if self._soup is None and self.page_content is not None:
+            self._soup = BeautifulSoup(self.page_content, 'lxml')
+        return self._soup
+    
+    def download_css(self, full_url, timeout=10):
+        """Stáhne CSS soubor a vrátí jeho text spolu s finální URL; timeout omezuje celé stažení"""
+        try:
+            return self.css_resource(full_url, self.http_get(full_url, timeout=min(timeout, 10),
+                                                             deadline=time.monotonic() + timeout))
+        except:
+            return None
+    
+    @staticmethod
+    def css_resource(url, response):
+        return {'url': url, 'final_url': response.url, 'text': response.text}
+    
     def fetch_css(self, css_url):
-        """Načte CSS soubor"""
+        """Načte CSS soubor (v rámci analýzy každou URL stahuje jen jednou)"""
+        resource = self.resources.get(urljoin(self.base_url, css_url))
+        return resource['text'] if resource else None
+    
+    def download_image(self, url, timeout=10):
+        """Stáhne obrázek a vrátí stav, finální URL a jeho analýzu; timeout omezuje celé stažení"""
         try:
-            full_url = urljoin(self.base_url, css_url)
-            response = self.session.get(full_url, timeout=10)
-            return response.text
+            response = self.http_get(url, timeout=min(timeout, 10), deadline=time.monotonic() + timeout)
         except:
             return None
+        return self.image_resource(url, response)
+    
+    def image_resource(self, url, response):
+        """Analyzuje stažený obrázek"""
+        image = None
+        if response.status_code == 200 and not response.truncated and response.content:
+            image = self.image_cache.analyze(response.content)
+        return {'url': url, 'final_url': response.url, 'status': response.status_code,
+                'bytes': len(response.content), 'image': image}
+    
+    def icon_candidates(self):
+        """Vrátí deklarované ikony jako (priorita, URL, rel) seřazené od nejvhodnější"""
+        candidates = []
+        for link in self.page.find_links(r'icon|apple-touch-icon|shortcut'):
+            href = link.get('href')
+            if href:
+                rel = link.get('rel', [])
+                sizes = link.get('sizes', '')
+                if any('apple-touch-icon' in r.lower() for r in rel):
+                    priority = 3
+                elif sizes and sizes != 'any':
+                    priority = 2
+                else:
+                    priority = 1
+                size_match = re.search(r'(\d+)x(\d+)', sizes)
+                area = int(size_match.group(1)) * int(size_match.group(2)) if size_match else 0
+                candidates.append((priority, area, urljoin(self.base_url, href), rel))
+        # V rámci priority napřed větší deklarované rozměry
+        candidates.sort(key=lambda x: (x[0], x[1]), reverse=True)
+        return [(priority, url, rel) for priority, area, url, rel in candidates]
+    
+    def splash_candidates(self):
+        """Vrátí startovací obrázky jako (plocha podle media, URL) seřazené od největšího"""
+        candidates = []
+        for img in self.page.find_links(r'apple-touch-startup-image'):
+            href = img.get('href')
+            if href:
+                size_match = re.search(r'(\d+)x(\d+)', img.get('media', ''))
+                area = int(size_match.group(1)) * int(size_match.group(2)) if size_match else 0
+                candidates.append((area, urljoin(self.base_url, href)))
+        candidates.sort(key=lambda x: x[0], reverse=True)
+        return candidates
+    
+    def favicon_url(self):
+        """Vrátí /favicon.ico, pokud stránka nedeklaruje žádnou ikonu, jinak None"""
+        for priority, url, rel in self.icon_candidates():
+            if any('icon' in r.lower() for r in rel):
+                return None
+        return urljoin(self.base_url, '/favicon.ico')
+    
+    def image_urls(self):
+        """Vrátí obrázky, které potřebují vybraná pole: kandidáty ikon, favicon a startovací obrázky"""
+        urls = []
+        if 'icons' in self.fields or 'splash_screen' in self.fields:
+            urls.extend(url for priority, url, rel in self.icon_candidates()[:MAX_ICON_CANDIDATES])
+        if 'icons' in self.fields and self.favicon_url():
+            urls.append(self.favicon_url())
+        if 'splash_screen' in self.fields:
+            urls.extend(url for area, url in self.splash_candidates()[:MAX_SPLASH_CANDIDATES])
+        return urls
+    
+    def image_info(self, url):
+        """Vrátí analýzu staženého obrázku nebo None"""
+        download = self.resources.image(url)
+        return download['image'] if download else None
+    
+    def prefetch_assets(self, stylesheets=True, images=True):
+        """Paralelně stáhne stylesheety, jejich @importy a obrázky ikon"""
+        self.resources.prefetch(self.page, self.base_url, stylesheets=stylesheets,
+                                images=self.image_urls() if images else ())
+    
+    def required_inputs(self):
+        """Vrátí vstupy (css, images), které potřebují vybraná pole"""
+        return {name for field in self.fields for name in FIELD_INPUTS.get(field, ())}
+    
+    def fetch_inputs(self):
+        """Jedním paralelním během stáhne jen to, co vybraná pole potřebují"""
+        inputs = self.required_inputs()
+        if inputs:
+            self.prefetch_assets(stylesheets='css' in inputs, images='images' in inputs)
+        return inputs
+    
+    def iter_css_sources(self):
+        """Postupně vrací CSS zdroje stránky sdílené všemi extraktory"""
+        if self._css_prefetch is not None:
+            # Styly se ještě stahují na pozadí (stream)
+            self._css_prefetch.join()
+        self.prefetch_assets(images=False)
+        return self.resources.iter_sources(self.page, self.base_url)
+    
+    def get_css_sources(self):
+        """Vrátí seznam CSS zdrojů stránky"""
+        return list(self.iter_css_sources())
+    
+    def get_css_index(self):
+        """Vrátí index CSS sestavený jedním průchodem přes všechny zdroje"""
+        if self.css_index is None:
+            self.css_index = CssIndex.from_sources(self.iter_css_sources())
+        return self.css_index
+    
+    def get_cascade(self):
+        """Vrátí kaskádu stylů nad stromem stránky pro výpočet stylů klíčových prvků"""
+        if self.cascade is None:
+            self.cascade = Cascade(self.get_css_index(), parse_document(self.page_content))
+        return self.cascade
+    
+    def fingerprint(self):
+        """Vrátí otisk HTML stránky a stylů, ze kterých vybraná pole vycházejí"""
+        if self.page is None:
+            self.fetch_page()
+        self.fetch_inputs()
+        digest = hashlib.sha256(self.page_hash.encode('ascii'))
+        for url in sorted(self.resources.resources):
+            resource = self.resources.resources[url]
+            digest.update(url.encode('utf-8'))
+            digest.update((resource['text'] if resource else '').encode('utf-8'))
+        for url in sorted(self.resources.images):
+            image = self.image_info(url)
+            digest.update(url.encode('utf-8'))
+            digest.update((image['sha256'] if image else '').encode('ascii'))
+        return digest.hexdigest()
     
     def extract_title(self):
         """Extrahuje název webu"""
         title = None
-        meta_title = self.soup.find('meta', property='og:title')
+        meta_title = self.page.find_meta(property='og:title')
         if meta_title and meta_title.get('content'):
             title = meta_title.get('content')
         if not title:
-            title_tag = self.soup.find('title')
-            if title_tag:
-                title = title_tag.get_text(strip=True)
+            title = self.page.title
         if not title:
-            h1 = self.soup.find('h1')
-            if h1:
-                title = h1.get_text(strip=True)
+            title = self.page.h1
         return title or "Neznámý název"
     
     def extract_description(self):
         """Extrahuje popis webu"""
         description = None
-        meta_desc = self.soup.find('meta', attrs={'name': 'description'})
+        meta_desc = self.page.find_meta(name='description')
         if meta_desc and meta_desc.get('content'):
             description = meta_desc.get('content')
         if not description:
-            og_desc = self.soup.find('meta', property='og:description')
+            og_desc = self.page.find_meta(property='og:description')
             if og_desc and og_desc.get('content'):
                 description = og_desc.get('content')
         return description or ""
@@ -74,23 +365,20 @@ class WebAnalyzer:
             'background_icon': None,
             'background_color': None
         }
-        icon_links = self.soup.find_all('link', rel=re.compile(r'icon|apple-touch-icon|shortcut', re.I))
-        sorted_icons = []
-        for link in icon_links:
-            href = link.get('href')
-            if href:
-                full_url = urljoin(self.base_url, href)
-                rel = link.get('rel', [])
-                sizes = link.get('sizes', '')
-                priority = 0
-                if any('apple-touch-icon' in r.lower() for r in rel):
-                    priority = 3
-                elif sizes and sizes != 'any':
-                    priority = 2
-                else:
-                    priority = 1
-                sorted_icons.append((priority, full_url, rel))
-        sorted_icons.sort(key=lambda x: x[0], reverse=True)
+        sorted_icons = self.icon_candidates()
+        decoded = []
+        for priority, full_url, rel in sorted_icons[:MAX_ICON_CANDIDATES]:
+            info = self.image_info(full_url)
+            if info and info.get('width'):
+                is_apple = any('apple-touch-icon' in r.lower() for r in rel)
+                decoded.append((is_apple, info['width'] * info['height'], full_url, info))
+        if decoded:
+            # Podle skutečných rozměrů: apple-touch-icon má přednost, jinak největší ikona
+            decoded.sort(key=lambda x: (x[0], x[1]), reverse=True)
+            icons['front_icon'] = decoded[0][2]
+            plain_icons = [entry for entry in decoded if not entry[0]]
+            if plain_icons:
+                icons['background_icon'] = max(plain_icons, key=lambda x: x[1])[2]
         for priority, full_url, rel in sorted_icons:
             if any('apple-touch-icon' in r.lower() for r in rel):
                 if not icons['front_icon']:
@@ -100,74 +388,79 @@ class WebAnalyzer:
                     icons['front_icon'] = full_url
                 if not icons['background_icon']:
                     icons['background_icon'] = full_url
-        if not icons['front_icon']:
-            favicon_url = urljoin(self.base_url, '/favicon.ico')
-            try:
-                response = self.session.head(favicon_url, timeout=5)
-                if response.status_code == 200:
-                    icons['front_icon'] = favicon_url
-                    icons['background_icon'] = favicon_url
-            except:
-                pass
+        favicon_url = self.favicon_url()
+        if not icons['front_icon'] and favicon_url:
+            download = self.resources.image(favicon_url)
+            if download and download['status'] == 200:
+                icons['front_icon'] = favicon_url
+                icons['background_icon'] = favicon_url
+                if download['image'] and download['image'].get('width'):
+                    decoded.append((False, 0, favicon_url, download['image']))
+        icons['images'] = [self._image_summary(url, info) for is_apple, area, url, info in decoded]
         background_color = None
-        theme_color = self.soup.find('meta', attrs={'name': 'theme-color'})
+        theme_color = self.page.find_meta(name='theme-color')
         if theme_color and theme_color.get('content'):
             background_color = self.normalize_color(theme_color.get('content'))
         if not background_color:
-            ms_tile = self.soup.find('meta', attrs={'name': 'msapplication-TileColor'})
+            ms_tile = self.page.find_meta(name='msapplication-TileColor')
             if ms_tile and ms_tile.get('content'):
                 background_color = self.normalize_color(ms_tile.get('content'))
+        if not background_color and icons['front_icon']:
+            # Neprůhledné pozadí samotné ikony
+            info = self.image_info(icons['front_icon'])
+            if info and info.get('background_color'):
+                background_color = info['background_color']
         if not background_color:
-            css_text = self.get_all_css()
-            bg_matches = re.findall(r'(?:body|html)[^{]*\{[^}]*background(?:-color)?:\s*([^;]+)', css_text, re.I)
-            if bg_matches:
-                for match in bg_matches:
-                    color = self.normalize_color(match.strip())
-                    if color and color.startswith('#'):
-                        background_color = color
-                        break
+            css_index = self.get_css_index()
+            for value in css_index.selector_values(('body', 'html'), ('background', 'background-color')):
+                color = self.normalize_color(value)
+                if color and color.startswith('#'):
+                    background_color = color
+                    break
         if not background_color:
-            body = self.soup.find('body')
-            if body and body.get('style'):
-                style = body.get('style')
+            if self.page.body_style:
+                style = self.page.body_style
                 bg_match = re.search(r'background(?:-color)?:\s*([^;]+)', style, re.I)
                 if bg_match:
                     background_color = self.normalize_color(bg_match.group(1).strip())
         icons['background_color'] = background_color
         return icons
     
+    def _image_summary(self, url, info):
+        summary = {'url': url}
+        summary.update((key, info.get(key)) for key in
+                       ('format', 'width', 'height', 'dominant_color', 'background_color', 'transparent', 'sha256'))
+        return summary
+    
     def extract_splash_screen(self):
         """Extrahuje informace o splash screen"""
         splash = {
             'icon': None,
             'color': None
         }
-        startup_images = self.soup.find_all('link', rel=re.compile(r'apple-touch-startup-image', re.I))
-        sorted_images = []
-        for img in startup_images:
-            href = img.get('href')
-            if href:
-                full_url = urljoin(self.base_url, href)
-                media = img.get('media', '')
-                size_match = re.search(r'(\d+)x(\d+)', media)
-                if size_match:
-                    width, height = map(int, size_match.groups())
-                    sorted_images.append((width * height, full_url))
-                else:
-                    sorted_images.append((0, full_url))
-        if sorted_images:
-            sorted_images.sort(key=lambda x: x[0], reverse=True)
+        sorted_images = self.splash_candidates()
+        decoded = [(info['width'] * info['height'], full_url) for area, full_url in sorted_images[:MAX_SPLASH_CANDIDATES]
+                   for info in [self.image_info(full_url)] if info and info.get('width')]
+        if decoded:
+            splash['icon'] = max(decoded)[1]
+        elif sorted_images:
             splash['icon'] = sorted_images[0][1]
         if not splash['icon']:
-            apple_icons = self.soup.find_all('link', rel=re.compile(r'apple-touch-icon', re.I))
+            apple_icons = self.page.find_links(r'apple-touch-icon')
             largest_icon = None
             largest_size = 0
             for icon in apple_icons:
                 href = icon.get('href')
                 if href:
+                    info = self.image_info(urljoin(self.base_url, href))
                     sizes = icon.get('sizes', '')
                     size_match = re.search(r'(\d+)x(\d+)', sizes)
-                    if size_match:
+                    if info and info.get('width'):
+                        # Skutečné rozměry staženého obrázku mají přednost před atributem sizes
+                        if info['width'] * info['height'] > largest_size:
+                            largest_size = info['width'] * info['height']
+                            largest_icon = urljoin(self.base_url, href)
+                    elif size_match:
                         width, height = map(int, size_match.groups())
                         if width * height > largest_size:
                             largest_size = width * height
@@ -177,32 +470,33 @@ class WebAnalyzer:
             if largest_icon:
                 splash['icon'] = largest_icon
         splash_color = None
-        theme_color = self.soup.find('meta', attrs={'name': 'theme-color'})
+        theme_color = self.page.find_meta(name='theme-color')
         if theme_color and theme_color.get('content'):
             splash_color = self.normalize_color(theme_color.get('content'))
         if not splash_color:
-            status_bar = self.soup.find('meta', attrs={'name': 'apple-mobile-web-app-status-bar-style'})
+            status_bar = self.page.find_meta(name='apple-mobile-web-app-status-bar-style')
             if status_bar:
                 content = status_bar.get('content', '').lower()
                 if 'black' in content:
                     splash_color = '#000000'
                 elif 'default' in content:
-                    css_text = self.get_all_css()
-                    bg_matches = re.findall(r'background(?:-color)?:\s*([^;]+)', css_text, re.I)
-                    if bg_matches:
-                        for match in bg_matches[:5]:
-                            color = self.normalize_color(match.strip())
-                            if color and color.startswith('#'):
-                                splash_color = color
-                                break
+                    css_index = self.get_css_index()
+                    for value in css_index.values('background', 'background-color')[:5]:
+                        color = self.normalize_color(value)
+                        if color and color.startswith('#'):
+                            splash_color = color
+                            break
+        if not splash_color and splash['icon']:
+            info = self.image_info(splash['icon'])
+            if info and info.get('background_color'):
+                splash_color = info['background_color']
         if not splash_color:
-            css_text = self.get_all_css()
+            css_index = self.get_css_index()
             main_selectors = ['body', 'html', '#app', '#root', '.app', '.main', '.container']
             for selector in main_selectors:
-                pattern = rf'{re.escape(selector)}[^{{]*\{{[^}}]*background(?:-color)?:\s*([^;]+)'
-                matches = re.findall(pattern, css_text, re.I)
+                matches = css_index.selector_values((selector,), ('background', 'background-color'))
                 if matches:
-                    color = self.normalize_color(matches[0].strip())
+                    color = self.normalize_color(matches[0])
                     if color and color.startswith('#'):
                         splash_color = color
                         break
@@ -216,7 +510,6 @@ class WebAnalyzer:
         font_styles = []
         style_map = {}
         font_urls = {}
-        visited_imports = set()
         
         def normalize_font_name(font_name):
             if not font_name:
@@ -245,23 +538,8 @@ class WebAnalyzer:
                 return f"url('{resolved}')"
             return re.sub(r'url\(([^)]+)\)', replace, css_block)
         
-        def inline_imports(css_content, base_url, depth=0):
-            if depth > 3 or not css_content:
-                return css_content or ''
-            
-            def replace(match):
-                import_target = match.group(1).strip().strip("\"'")
-                full_url = urljoin(base_url, import_target) if base_url else import_target
-                if full_url in visited_imports:
-                    return ''
-                visited_imports.add(full_url)
-                imported_css = self.fetch_css(full_url)
-                if not imported_css:
-                    return ''
-                return inline_imports(imported_css, full_url, depth + 1)
-            return re.sub(r'@import\s+(?:url\()?["\']?([^);\s]+)["\']?\s*\)?\s*;?', replace, css_content, flags=re.I)
-        
-        google_fonts = self.soup.find_all('link', href=re.compile(r'fonts\.googleapis\.com|fonts\.gstatic\.com'))
+        google_fonts = [link for link in self.page.links
+                        if re.search(r'fonts\.googleapis\.com|fonts\.gstatic\.com', link.get('href', ''))]
         for link in google_fonts:
             href = link.get('href', '')
             match = re.search(r'family=([^&:]+)', href)
@@ -269,85 +547,48 @@ class WebAnalyzer:
                 font_name = match.group(1).replace('+', ' ').split(':')[0]
                 add_font(font_name)
         
-        css_sources = []
-        style_tags = self.soup.find_all('style')
-        for style in style_tags:
-            if style.string:
-                inlined = inline_imports(style.string, self.base_url)
-                css_sources.append({'content': inlined, 'base': self.base_url})
-        
-        def is_stylesheet_link(link):
-            rel_values = link.get('rel') or []
-            if isinstance(rel_values, str):
-                rel_values = [rel_values]
-            rel_values = [r.lower() for r in rel_values]
-            as_attr = (link.get('as') or '').lower()
-            if 'stylesheet' in rel_values:
-                return True
-            return 'preload' in rel_values and as_attr == 'style'
-        
-        fetched_css_urls = set()
-        css_links = self.soup.find_all('link')
-        for link in css_links:
-            if not is_stylesheet_link(link):
+        css_index = self.get_css_index()
+        for font_face in css_index.font_faces:
+            family = None
+            for name, value, important in font_face['declarations']:
+                if name == 'font-family':
+                    family = value
+            family_name = normalize_font_name(family)
+            if not family_name:
                 continue
-            href = link.get('href')
-            if not href:
-                continue
-            full_url = urljoin(self.base_url, href)
-            if full_url in fetched_css_urls:
-                continue
-            css_content = self.fetch_css(full_url)
-            if css_content:
-                inlined = inline_imports(css_content, full_url)
-                css_sources.append({'content': inlined, 'base': full_url})
-                fetched_css_urls.add(full_url)
-        
-        css_text = "\n".join(source['content'] for source in css_sources)
-        font_face_pattern = re.compile(r'@font-face\s*\{[^}]+\}', re.I | re.S)
-        for source in css_sources:
-            content = source['content']
-            base = source['base']
-            for match in font_face_pattern.finditer(content):
-                block = match.group(0)
-                family_match = re.search(r'font-family:\s*["\']?([^;"\']+)["\']?', block, re.I)
-                if not family_match:
-                    continue
-                family_name = normalize_font_name(family_match.group(1))
-                if not family_name:
-                    continue
-                add_font(family_name)
-                absolutized_block = absolutize_font_urls(block, base)
-                # Collect first downloadable font URL for this family
-                found_urls = re.findall(r"url\(['\"]?([^'\"\)]+)['\"]?\)", absolutized_block)
-                preferred_url = None
-                for candidate in found_urls:
-                    if candidate.startswith('http://') or candidate.startswith('https://'):
-                        preferred_url = candidate
-                        break
-                    if not preferred_url and candidate.startswith('data:'):
-                        preferred_url = candidate
-                if preferred_url:
-                    font_urls.setdefault(family_name, preferred_url)
-                if family_name not in style_map:
-                    font_styles.append({'name': family_name, 'css': absolutized_block})
-                    style_map[family_name] = True
+            add_font(family_name)
+            absolutized_block = absolutize_font_urls(font_face['css'], font_face['base'])
+            # Collect first downloadable font URL for this family
+            found_urls = re.findall(r"url\(['\"]?([^'\"\)]+)['\"]?\)", absolutized_block)
+            preferred_url = None
+            for candidate in found_urls:
+                if candidate.startswith('http://') or candidate.startswith('https://'):
+                    preferred_url = candidate
+                    break
+                if not preferred_url and candidate.startswith('data:'):
+                    preferred_url = candidate
+            if preferred_url:
+                font_urls.setdefault(family_name, preferred_url)
+            if family_name not in style_map:
+                font_styles.append({'name': family_name, 'css': absolutized_block})
+                style_map[family_name] = True
         
-        priority_selectors = ['body', 'html', 'h1', 'h2', 'h3', '.heading', '.title', '.text', 'p']
-        for selector in priority_selectors:
-            pattern = rf'{re.escape(selector)}[^{{]*\{{[^}}]*font-family:\s*["\']?([^;"\']+)["\']?'
-            matches = re.findall(pattern, css_text, re.I)
-            for match in matches:
-                add_font(match)
+        # Vypočtené písmo těla a nadpisů (včetně dědičnosti a zkratky font), pak třídy nadpisů a textu
+        cascade = self.get_cascade()
+        for role in ('body', 'h1', 'h2', 'h3'):
+            for style in cascade.role_styles(role)[:1]:
+                add_font(style.get('font-family'))
+        for selector in ('.heading', '.title', '.text'):
+            for value in css_index.selector_values((selector,), ('font-family',)):
+                add_font(self.resolve_css_value(value))
+        for style in cascade.role_styles('paragraph')[:1]:
+            add_font(style.get('font-family'))
         
-        for style in style_tags:
-            font_matches = re.findall(r'font-family:\s*["\']?([^;"\']+)["\']?', style.string or '', re.I)
-            for match in font_matches:
-                add_font(match)
+        for value in css_index.source_values('font-family', 'inline'):
+            add_font(self.resolve_css_value(value))
         
-        elements_with_style = self.soup.find_all(attrs={'style': re.compile(r'font-family', re.I)})
-        for element in elements_with_style[:10]:
-            style = element.get('style', '')
+        styles_with_font = [style for tag, style in self.page.inline_styles if re.search(r'font-family', style, re.I)]
+        for style in styles_with_font[:10]:
             font_match = re.search(r'font-family:\s*["\']?([^;"\']+)["\']?', style, re.I)
             if font_match:
                 add_font(font_match.group(1))
@@ -368,19 +609,7 @@ class WebAnalyzer:
     
     def get_all_css(self):
         """Získá veškerý CSS kód ze stránky"""
-        css_text = ""
-        style_tags = self.soup.find_all('style')
-        for style in style_tags:
-            if style.string:
-                css_text += style.string + "\n"
-        css_links = self.soup.find_all('link', rel='stylesheet')
-        for link in css_links:
-            href = link.get('href')
-            if href:
-                css_content = self.fetch_css(href)
-                if css_content:
-                    css_text += css_content + "\n"
-        return css_text
+        return "\n".join(source['content'] for source in self.iter_css_sources())
     
     def extract_colors(self):
         """Extrahuje barvy z CSS a HTML"""
@@ -389,13 +618,12 @@ class WebAnalyzer:
             'secondary': None,
             'tertiary': None
         }
-        css_text = self.get_all_css()
+        css_index = self.get_css_index()
         css_vars = {}
-        var_matches = re.findall(r'--([^:]+):\s*([^;]+)', css_text)
-        for var_name, var_value in var_matches:
-            var_name_lower = var_name.lower().strip()
-            var_value_clean = var_value.strip().strip('"\'')
-            css_vars[var_name_lower] = var_value_clean
+        # Hodnoty proměnných s dosazenými řetězci var(--a) -> var(--b) -> barva
+        for var_name, var_value in css_index.variables().resolved().items():
+            if var_value:
+                css_vars[var_name] = var_value.strip().strip('"\'')
         primary_keys = [k for k in css_vars.keys() if 'primary' in k and ('color' in k or 'main' in k or k == 'primary')]
         secondary_keys = [k for k in css_vars.keys() if 'secondary' in k and ('color' in k or 'main' in k or k == 'secondary')]
         tertiary_keys = [k for k in css_vars.keys() if 'tertiary' in k and ('color' in k or 'main' in k or k == 'tertiary')]
@@ -405,47 +633,60 @@ class WebAnalyzer:
             colors['secondary'] = self.normalize_color(css_vars[secondary_keys[0]])
         if tertiary_keys:
             colors['tertiary'] = self.normalize_color(css_vars[tertiary_keys[0]])
+        background_props = ('background', 'background-color')
         if not colors['primary']:
-            primary_selectors = [r'\.primary[^{}]*\{[^}]*color:\s*([^;]+)', r'\.btn-primary[^{}]*\{[^}]*background(?:-color)?:\s*([^;]+)', r'\.primary-color[^{}]*\{[^}]*color:\s*([^;]+)']
-            for pattern in primary_selectors:
-                matches = re.findall(pattern, css_text, re.I)
+            primary_selectors = [('.primary', ('color',)), ('.btn-primary', background_props), ('.primary-color', ('color',))]
+            for token, props in primary_selectors:
+                matches = css_index.selector_values((token,), props)
                 if matches:
-                    colors['primary'] = self.normalize_color(matches[0].strip())
+                    colors['primary'] = self.normalize_color(matches[0])
                     break
         if not colors['secondary']:
-            secondary_selectors = [r'\.secondary[^{}]*\{[^}]*color:\s*([^;]+)', r'\.btn-secondary[^{}]*\{[^}]*background(?:-color)?:\s*([^;]+)', r'\.secondary-color[^{}]*\{[^}]*color:\s*([^;]+)']
-            for pattern in secondary_selectors:
-                matches = re.findall(pattern, css_text, re.I)
+            secondary_selectors = [('.secondary', ('color',)), ('.btn-secondary', background_props), ('.secondary-color', ('color',))]
+            for token, props in secondary_selectors:
+                matches = css_index.selector_values((token,), props)
                 if matches:
-                    colors['secondary'] = self.normalize_color(matches[0].strip())
+                    colors['secondary'] = self.normalize_color(matches[0])
                     break
         if not colors['tertiary']:
-            tertiary_selectors = [r'\.tertiary[^{}]*\{[^}]*color:\s*([^;]+)', r'\.btn-tertiary[^{}]*\{[^}]*background(?:-color)?:\s*([^;]+)']
-            for pattern in tertiary_selectors:
-                matches = re.findall(pattern, css_text, re.I)
+            tertiary_selectors = [('.tertiary', ('color',)), ('.btn-tertiary', background_props)]
+            for token, props in tertiary_selectors:
+                matches = css_index.selector_values((token,), props)
                 if matches:
-                    colors['tertiary'] = self.normalize_color(matches[0].strip())
+                    colors['tertiary'] = self.normalize_color(matches[0])
                     break
         if not colors['primary']:
-            ui_patterns = [r'button[^{}]*\{[^}]*background(?:-color)?:\s*([^;]+)', r'\.btn[^{}]*\{[^}]*background(?:-color)?:\s*([^;]+)', r'a[^{}]*\{[^}]*color:\s*([^;]+)']
-            for pattern in ui_patterns:
-                matches = re.findall(pattern, css_text, re.I)
-                if matches:
-                    color = self.normalize_color(matches[0].strip())
+            # Vypočtené styly skutečných tlačítek a odkazů na stránce
+            cascade = self.get_cascade()
+            for role, prop in (('button', 'background-color'), ('link', 'color')):
+                for style in cascade.role_styles(role):
+                    color = self.normalize_color(style.get(prop) or '')
                     if color and color.startswith('#') and color != '#000000' and color != '#ffffff':
                         colors['primary'] = color
                         break
+                if colors['primary']:
+                    break
+        palette = extract_palette(css_index)
         if not all(colors.values()):
-            common_colors = self.find_common_colors(css_text)
-            if not colors['primary'] and len(common_colors) > 0:
-                colors['primary'] = common_colors[0]
-            if not colors['secondary'] and len(common_colors) > 1:
-                colors['secondary'] = common_colors[1]
-            if not colors['tertiary'] and len(common_colors) > 2:
-                colors['tertiary'] = common_colors[2]
+            # Barvy palety v pořadí váhy doplní chybějící role; už přiřazené se přeskočí
+            common_colors = [color for color in self.find_common_colors(css_index, palette)
+                             if color not in colors.values()]
+            for role in ('primary', 'secondary', 'tertiary'):
+                if not colors[role] and common_colors:
+                    colors[role] = common_colors.pop(0)
+        colors['palette'] = palette
         return colors
     
+    def resolve_css_value(self, value):
+        """Dosadí do hodnoty z CSS odkazy var() podle vlastních vlastností stránky"""
+        if value and 'var(' in value.lower():
+            return self.get_css_index().variables().resolve_value(value)
+        return value
+    
     def normalize_color(self, color_value):
+        color_value = self.resolve_css_value(color_value)
+        if not color_value:
+            return None
         color_value = color_value.strip().strip('"\'')
         if re.match(r'^#?[0-9A-Fa-f]{3,6}$', color_value):
             return '#' + color_value.lstrip('#')
@@ -453,6 +694,10 @@ class WebAnalyzer:
         if rgb_match:
             r, g, b = rgb_match.groups()
             return f"#{int(r):02x}{int(g):02x}{int(b):02x}"
+        if color_value[:3].lower() in ('rgb', 'hsl'):
+            rgba = parse_color(color_value)
+            if rgba:
+                return to_hex(rgba)
         try:
             rgb = webcolors.name_to_rgb(color_value)
             return f"#{rgb.red:02x}{rgb.green:02x}{rgb.blue:02x}"
@@ -460,19 +705,11 @@ class WebAnalyzer:
             pass
         return color_value
     
-    def find_common_colors(self, css_text):
-        color_pattern = r'(?:#(?:[0-9a-fA-F]{3}){1,2}|rgb\([^)]+\)|rgba\([^)]+\)|hsl\([^)]+\)|hsla\([^)]+\)|[a-zA-Z]+)'
-        colors = re.findall(color_pattern, css_text)
-        exclude_words = {'transparent', 'inherit', 'initial', 'unset', 'none', 'auto', 'currentcolor', 'current-color'}
-        colors = [c for c in colors if c.lower() not in exclude_words]
-        normalized = {}
-        for color in colors[:100]:
-            normalized_color = self.normalize_color(color)
-            if normalized_color and normalized_color.startswith('#'):
-                if normalized_color.lower() not in ['#000000', '#000', '#ffffff', '#fff', '#fff', '#ffffff']:
-                    normalized[normalized_color] = normalized.get(normalized_color, 0) + 1
-        sorted_colors = sorted(normalized.items(), key=lambda x: x[1], reverse=True)
-        return [color for color, count in sorted_colors[:5]]
+    def find_common_colors(self, css_index, palette=None):
+        """Vrátí nejvýraznější barvy palety stylů bez téměř černé a bílé"""
+        if palette is None:
+            palette = extract_palette(css_index)
+        return [entry['color'] for entry in palette if not is_neutral_extreme(entry)][:5]
     
     def extract_ui_specs(self):
         specs = {
@@ -488,10 +725,13 @@ class WebAnalyzer:
             'corner_radius': None,
             'item_spacing': None
         }
-        css_text = self.get_all_css()
-        shadow_matches = re.findall(r'box-shadow:\s*([^;]+)', css_text, re.I)
-        if shadow_matches:
-            shadow_value = shadow_matches[0]
+        css_index = self.get_css_index()
+        # Vypočtené styly karet a tlačítek mají přednost před první deklarací v dokumentu
+        cascade = self.get_cascade()
+        components = ('card', 'button')
+        shadow_value = cascade.role_value(components, 'box-shadow') or \
+            self.resolve_css_value(css_index.first('box-shadow'))
+        if shadow_value:
             shadow_parts = shadow_value.split()
             if len(shadow_parts) >= 4:
                 for part in reversed(shadow_parts):
@@ -506,35 +746,35 @@ class WebAnalyzer:
                         specs['shadow']['angle'] = f"{angle:.1f}°"
                     except:
                         pass
-        border_matches = re.findall(r'border(?:-width)?:\s*([^;]+)', css_text, re.I)
-        if border_matches:
-            border_value = border_matches[0]
+        border_value = cascade.role_value(components, 'border', 'border-width') or \
+            self.resolve_css_value(css_index.first('border', 'border-width'))
+        if border_value:
             border_parts = border_value.split()
             for part in border_parts:
                 if part.replace('.', '').replace('px', '').isdigit():
                     specs['border']['thickness'] = part
                 elif '#' in part or 'rgb' in part or part in webcolors.CSS3_NAMES_TO_HEX:
                     specs['border']['color'] = self.normalize_color(part)
-        border_color_matches = re.findall(r'border-color:\s*([^;]+)', css_text, re.I)
-        if border_color_matches and not specs['border']['color']:
-            specs['border']['color'] = self.normalize_color(border_color_matches[0])
-        radius_matches = re.findall(r'border-radius:\s*([^;]+)', css_text, re.I)
-        if radius_matches:
-            specs['corner_radius'] = radius_matches[0].strip()
-        gap_matches = re.findall(r'gap:\s*([^;]+)', css_text, re.I)
-        if gap_matches:
-            specs['item_spacing'] = gap_matches[0].strip()
+        border_color = cascade.role_value(components, 'border-color') or css_index.first('border-color')
+        if border_color and not specs['border']['color']:
+            specs['border']['color'] = self.normalize_color(border_color)
+        radius = cascade.role_value(components, 'border-radius') or \
+            self.resolve_css_value(css_index.first('border-radius'))
+        if radius:
+            specs['corner_radius'] = radius
+        gap = self.resolve_css_value(css_index.first('gap', 'grid-gap', 'row-gap', 'column-gap'))
+        if gap:
+            specs['item_spacing'] = gap
         else:
-            margin_matches = re.findall(r'margin:\s*([^;]+)', css_text, re.I)
-            if margin_matches:
-                specs['item_spacing'] = margin_matches[0].strip()
+            margin = self.resolve_css_value(css_index.first('margin'))
+            if margin:
+                specs['item_spacing'] = margin
         return specs
     
     def extract_links(self):
         links = []
         seen_urls = set()
-        anchor_tags = self.soup.find_all('a', href=True)
-        for anchor in anchor_tags:
+        for anchor in self.page.anchors:
             href = anchor.get('href', '').strip()
             if not href:
                 continue
@@ -545,7 +785,7 @@ class WebAnalyzer:
                 parsed_url = urlparse(full_url)
                 if not parsed_url.netloc:
                     continue
-                link_text = anchor.get_text(strip=True)
+                link_text = anchor['text']
                 if not link_text:
                     link_text = anchor.get('title', '') or anchor.get('alt', '') or href
                 title = anchor.get('title', '')
@@ -569,18 +809,69 @@ class WebAnalyzer:
         links.sort(key=lambda x: (not x['is_internal'], x['url']))
         return links
     
-    def analyze(self):
-        self.fetch_page()
-        result = {
-            'url': self.url,
-            'title': self.extract_title(),
-            'description': self.extract_description(),
-            'icons': self.extract_icons(),
-            'splash_screen': self.extract_splash_screen(),
-            'fonts': self.extract_fonts(),
-            'colors': self.extract_colors(),
-            'ui_specs': self.extract_ui_specs(),
-            'links': self.extract_links()
-        }
-        return result
+    @staticmethod
+    def field_cost(field):
+        return max((INPUT_COST[name] for name in FIELD_INPUTS.get(field, ())), default=0)
+    
+    def stream(self):
+        """Počítá vybraná pole od nejlevnějšího a vrací je postupně jako (pole, hodnota).
 
+        Nejdřív vrátí ('page', finální URL), pak pole, která potřebují jen HTML,
+        potom pole z obrázků a nakonec pole ze stylů. Styly se stahují na pozadí
+        hned po načtení stránky, takže celková doba je stejná jako u analyze().
+        """
+        try:
+            if self.page is None:
+                self.fetch_page()
+            yield 'page', self.base_url
+            if 'css' in self.required_inputs():
+                self._css_prefetch = threading.Thread(target=self.prefetch_assets, kwargs={'images': False},
+                                                      daemon=True)
+                self._css_prefetch.start()
+            images_ready = False
+            for field in sorted(self.fields, key=self.field_cost):
+                cost = self.field_cost(field)
+                if cost >= INPUT_COST['images'] and not images_ready:
+                    with self.metrics.stage('assets'):
+                        self.prefetch_assets(stylesheets=False)
+                    images_ready = True
+                if cost >= INPUT_COST['css'] and self.css_index is None:
+                    with self.metrics.stage('assets'):
+                        self.get_css_index()
+                with self.metrics.stage(field):
+                    value = getattr(self, EXTRACTOR_METHODS[field])()
+                yield field, value
+        except Exception:
+            self.metrics.finish('error')
+            raise
+        self.metrics.finish()
+    
+    def analyze(self, progress=None):
+        """Provede analýzu vybraných polí; progress(stage) se volá po každé dokončené fázi"""
+        def report(stage):
+            if progress:
+                progress(stage)
+        try:
+            if self.page is None:
+                self.fetch_page()
+            report('page')
+            with self.metrics.stage('assets'):
+                if 'css' in self.fetch_inputs():
+                    self.get_css_index()
+            report('assets')
+            result = {'url': self.url}
+            for field, method in EXTRACTORS:
+                if field not in self.fields:
+                    continue
+                with self.metrics.stage(field):
+                    result[field] = getattr(self, method)()
+                report(field)
+        except Exception:
+            self.metrics.finish('error')
+            raise
+        self.metrics.finish()
+        result['truncated'] = self.budget.truncated
+        result['fetch'] = self.guard.report()
+        if self.timings:
+            result['timings'] = self.metrics.report()
+        return result
@@ -0,0 +1,422 @@
+import io
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import datetime
+from urllib.parse import urlsplit
+import numpy as np
+from palette import parse_color, to_hex, srgb_to_oklab
+
+# Role barev ukládané do indexu (paleta se ukládá po jednotlivých barvách)
+COLOR_ROLES = ('primary', 'secondary', 'tertiary')
+# Relativní čas pro dotazy "od minulého týdne": 7d, 12h, 30m
+RELATIVE_TIME_PATTERN = re.compile(r'^(\d+(?:\.\d+)?)\s*([dhm])$')
+RELATIVE_UNITS = {'d': 86400, 'h': 3600, 'm': 60}
+# Kolik přidaných a odebraných položek seznamu se vrací v rozdílu
+MAX_LIST_CHANGES = 20
+
+log = logging.getLogger(__name__)
+
+SCHEMA = [
+    'CREATE TABLE IF NOT EXISTS analyses ('
+    'id INTEGER PRIMARY KEY, url TEXT NOT NULL, domain TEXT, analyzed_at REAL NOT NULL, '
+    'is_latest INTEGER NOT NULL DEFAULT 1, title TEXT, result BLOB)',
+    'CREATE INDEX IF NOT EXISTS analyses_url ON analyses (url, analyzed_at)',
+    'CREATE INDEX IF NOT EXISTS analyses_domain ON analyses (domain, analyzed_at)',
+    'CREATE INDEX IF NOT EXISTS analyses_latest ON analyses (url) WHERE is_latest = 1',
+    'CREATE TABLE IF NOT EXISTS fonts (analysis_id INTEGER NOT NULL, name TEXT, key TEXT)',
+    'CREATE INDEX IF NOT EXISTS fonts_key ON fonts (key)',
+    'CREATE TABLE IF NOT EXISTS colors ('
+    'analysis_id INTEGER NOT NULL, role TEXT, color TEXT, l REAL, a REAL, b REAL, share REAL)',
+    'CREATE INDEX IF NOT EXISTS colors_color ON colors (color)',
+    'CREATE INDEX IF NOT EXISTS colors_lab ON colors (l, a, b)',
+    'CREATE TABLE IF NOT EXISTS icons (analysis_id INTEGER NOT NULL, url TEXT, sha256 TEXT)',
+    'CREATE INDEX IF NOT EXISTS icons_sha256 ON icons (sha256)',
+]
+
+
+def normalize_hex(color):
+    """Barva jako #rrggbb (malými písmeny) nebo None"""
+    if not color or not isinstance(color, str):
+        return None
+    rgba = parse_color(color)
+    return to_hex(rgba) if rgba else None
+
+
+def domain_of(url):
+    host = (urlsplit(url).hostname or '').lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+def parse_time(value, now=None):
+    """Převede čas z dotazu (unixový čas, ISO datum nebo relativní 7d/12h/30m) na unixový čas"""
+    if value is None or value == '':
+        return None
+    value = str(value).strip()
+    match = RELATIVE_TIME_PATTERN.match(value)
+    if match:
+        return (now or time.time()) - float(match.group(1)) * RELATIVE_UNITS[match.group(2)]
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise Exception(f"Neplatný čas: {value}")
+
+
+def _encode_result(result):
+    return zlib.compress(json.dumps(result, ensure_ascii=False, separators=(',', ':')).encode('utf-8'), 6)
+
+
+def _decode_result(blob):
+    return json.loads(zlib.decompress(blob).decode('utf-8')) if blob else None
+
+
+def diff_results(old, new, path=''):
+    """Rozdíl dvou výsledků jako seznam změn {path, old, new} nebo {path, added, removed}.
+
+    Porovnávají se jen sekce přítomné v obou výsledcích (výsledky s výběrem
+    polí). Seznamy se porovnávají jako množiny položek.
+    """
+    changes = []
+    if isinstance(old, dict) and isinstance(new, dict):
+        keys = [key for key in new if key in old] if not path else list(dict.fromkeys(list(old) + list(new)))
+        for key in keys:
+            if key in ('cache', 'timings', 'truncated', 'fetch') and not path:
+                continue
+            changes += diff_results(old.get(key), new.get(key), f'{path}.{key}' if path else key)
+        return changes
+    if isinstance(old, list) and isinstance(new, list):
+        old_items = {json.dumps(item, sort_keys=True): item for item in old}
+        new_items = {json.dumps(item, sort_keys=True): item for item in new}
+        added = [item for key, item in new_items.items() if key not in old_items]
+        removed = [item for key, item in old_items.items() if key not in new_items]
+        if added or removed:
+            changes.append({'path': path, 'added': added[:MAX_LIST_CHANGES], 'removed': removed[:MAX_LIST_CHANGES],
+                            'added_count': len(added), 'removed_count': len(removed)})
+        return changes
+    if old != new:
+        changes.append({'path': path, 'old': old, 'new': new})
+    return changes
+
+
+class ResultStore:
+    """Trvalé úložiště všech analýz v SQLite s indexy pro dotazy napříč weby.
+
+    Každá analýza se uloží jako snímek s časem (výsledek komprimovaný zlib) a
+    do indexových tabulek se rozepíšou fonty, normalizované barvy (i v OKLab
+    pro hledání podobných barev), doména a hashe ikon. Zápis je dávkový:
+    add() jen zařadí záznam a vlákno na pozadí zapisuje dávky v jedné
+    transakci, takže úložiště stíhá propustnost dávkové analýzy.
+    """
+
+    def __init__(self, path, batch_size=200, flush_interval=1.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        for statement in SCHEMA:
+            self._conn.execute(statement)
+        self._conn.commit()
+        self._pending = []
+        self._condition = threading.Condition()
+        self._writer = None
+        self._closed = False
+        self.counters = {'written': 0, 'batches': 0, 'failed': 0}
+
+    # --- zápis -----------------------------------------------------------
+
+    def add(self, url, result, analyzed_at=None):
+        """Zařadí výsledek analýzy k zápisu"""
+        self.add_many([(url, result, analyzed_at)])
+
+    def add_many(self, records):
+        """Zařadí více výsledků (url, result, analyzed_at) najednou"""
+        now = time.time()
+        with self._condition:
+            self._pending.extend((url, result, analyzed_at or now) for url, result, analyzed_at in records)
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name='result-store', daemon=True)
+                self._writer.start()
+            if len(self._pending) >= self.batch_size:
+                self._condition.notify()
+
+    def _write_loop(self):
+        while True:
+            with self._condition:
+                if not self._pending and not self._closed:
+                    self._condition.wait(self.flush_interval)
+                if len(self._pending) < self.batch_size and not self._closed:
+                    # Krátce počkat, až se dávka naplní
+                    self._condition.wait(self.flush_interval)
+                batch, self._pending = self._pending, []
+                closed = self._closed
+            if batch:
+                self._write_safely(batch)
+            if closed:
+                return
+
+    def _write_safely(self, batch):
+        """Zapíše dávku; když selže, zkusí záznamy po jednom a nezapsatelné jen započítá.
+
+        Chyba zápisu nesmí ukončit vlákno zapisovače, jinak by se fronta
+        plnila bez konce.
+        """
+        try:
+            self._write(batch)
+            return
+        except Exception:
+            log.exception('Zápis dávky %d analýz do úložiště selhal', len(batch))
+        if len(batch) == 1:
+            self.counters['failed'] += 1
+            return
+        for record in batch:
+            try:
+                self._write([record])
+            except Exception:
+                log.exception('Zápis analýzy %s do úložiště selhal', record[0])
+                self.counters['failed'] += 1
+
+    def flush(self):
+        """Zapíše všechny zařazené záznamy hned"""
+        with self._condition:
+            batch, self._pending = self._pending, []
+        if batch:
+            self._write(batch)
+
+    def close(self):
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        if self._writer is not None:
+            self._writer.join()
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+    def _write(self, batch):
+        font_rows = []
+        color_rows = []
+        icon_rows = []
+        with self._lock:
+            cursor = self._conn.cursor()
+            cursor.execute('BEGIN')
+            try:
+                cursor.executemany('UPDATE analyses SET is_latest = 0 WHERE url = ? AND is_latest = 1',
+                                   [(url,) for url in dict.fromkeys(url for url, result, at in batch)])
+                latest = {}
+                for url, result, analyzed_at in batch:
+                    latest[url] = max(latest.get(url, 0), analyzed_at)
+                for url, result, analyzed_at in batch:
+                    cursor.execute(
+                        'INSERT INTO analyses (url, domain, analyzed_at, is_latest, title, result) '
+                        'VALUES (?, ?, ?, ?, ?, ?)',
+                        (url, domain_of(url), analyzed_at, int(latest[url] == analyzed_at),
+                         result.get('title'), _encode_result(result)))
+                    analysis_id = cursor.lastrowid
+                    font_rows += [(analysis_id, name, name.lower()) for name in
+                                  dict.fromkeys((result.get('fonts') or {}).get('names') or [])]
+                    color_rows += self._color_rows(analysis_id, result)
+                    icon_rows += [(analysis_id, image.get('url'), image['sha256']) for image in
+                                  (result.get('icons') or {}).get('images') or [] if image.get('sha256')]
+                cursor.executemany('INSERT INTO fonts VALUES (?, ?, ?)', font_rows)
+                cursor.executemany('INSERT INTO colors VALUES (?, ?, ?, ?, ?, ?, ?)', color_rows)
+                cursor.executemany('INSERT INTO icons VALUES (?, ?, ?)', icon_rows)
+                cursor.execute('COMMIT')
+            except Exception:
+                cursor.execute('ROLLBACK')
+                raise
+        self.counters['written'] += len(batch)
+        self.counters['batches'] += 1
+
+    @staticmethod
+    def _color_rows(analysis_id, result):
+        colors = result.get('colors') or {}
+        entries = [(role, colors.get(role), None) for role in COLOR_ROLES]
+        entries += [('palette', entry.get('color'), entry.get('share')) for entry in colors.get('palette') or []]
+        icons = result.get('icons') or {}
+        entries.append(('background', icons.get('background_color'), None))
+        rows = []
+        hexes = [(role, normalize_hex(color), share) for role, color, share in entries]
+        hexes = [entry for entry in hexes if entry[1]]
+        if not hexes:
+            return rows
+        rgb = np.array([[int(color[i:i + 2], 16) / 255 for i in (1, 3, 5)] for role, color, share in hexes])
+        lab = srgb_to_oklab(rgb)
+        for (role, color, share), (l, a, b) in zip(hexes, lab.tolist()):
+            rows.append((analysis_id, role, color, l, a, b, share))
+        return rows
+
+    # --- dotazy ----------------------------------------------------------
+
+    def _rows(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    @staticmethod
+    def _latest_clause(latest):
+        return ' AND analyses.is_latest = 1' if latest else ''
+
+    def _sites(self, sql, params, latest, limit):
+        rows = self._rows(f'SELECT DISTINCT analyses.id, analyses.url, analyses.domain, analyses.analyzed_at, '
+                          f'analyses.title {sql}{self._latest_clause(latest)} '
+                          f'ORDER BY analyses.analyzed_at DESC LIMIT ?', (*params, limit))
+        return [{'id': row[0], 'url': row[1], 'domain': row[2], 'analyzed_at': row[3], 'title': row[4]}
+                for row in rows]
+
+    def find_by_font(self, name, latest=True, limit=100):
+        """Analýzy, které používají font (bez ohledu na velikost písmen)"""
+        return self._sites('FROM fonts JOIN analyses ON analyses.id = fonts.analysis_id WHERE fonts.key = ?',
+                           (name.strip().lower(),), latest, limit)
+
+    def find_by_domain(self, domain, latest=True, limit=100):
+        return self._sites('FROM analyses WHERE analyses.domain = ?', (domain_of(f'//{domain.strip()}'),),
+                           latest, limit)
+
+    def find_by_icon(self, sha256, latest=True, limit=100):
+        """Analýzy, které mají ikonu se stejným obsahem"""
+        return self._sites('FROM icons JOIN analyses ON analyses.id = icons.analysis_id WHERE icons.sha256 = ?',
+                           (sha256.strip().lower(),), latest, limit)
+
+    def find_by_color(self, color, max_distance=0.05, role=None, latest=True, limit=100):
+        """Analýzy s barvou blízkou zadané (vzdálenost v OKLab), nejbližší první"""
+        hex_color = normalize_hex(color)
+        if not hex_color:
+            raise Exception(f"Neplatná barva: {color}")
+        l, a, b = srgb_to_oklab([[int(hex_color[i:i + 2], 16) / 255 for i in (1, 3, 5)]])[0].tolist()
+        sql = ('SELECT analyses.id, analyses.url, analyses.domain, analyses.analyzed_at, analyses.title, '
+               'colors.role, colors.color, colors.l, colors.a, colors.b FROM colors '
+               'JOIN analyses ON analyses.id = colors.analysis_id '
+               'WHERE colors.l BETWEEN ? AND ? AND colors.a BETWEEN ? AND ? AND colors.b BETWEEN ? AND ?')
+        params = [l - max_distance, l + max_distance, a - max_distance, a + max_distance,
+                  b - max_distance, b + max_distance]
+        if role:
+            sql += ' AND colors.role = ?'
+            params.append(role)
+        best = {}
+        for row in self._rows(sql + self._latest_clause(latest), params):
+            distance = ((row[7] - l) ** 2 + (row[8] - a) ** 2 + (row[9] - b) ** 2) ** 0.5
+            if distance <= max_distance and (row[0] not in best or distance < best[row[0]]['distance']):
+                best[row[0]] = {'id': row[0], 'url': row[1], 'domain': row[2], 'analyzed_at': row[3],
+                                'title': row[4], 'role': row[5], 'color': row[6], 'distance': round(distance, 4)}
+        return sorted(best.values(), key=lambda item: item['distance'])[:limit]
+
+    def history(self, url):
+        """Snímky analýz jedné URL od nejstaršího"""
+        rows = self._rows('SELECT id, analyzed_at FROM analyses WHERE url = ? ORDER BY analyzed_at', (url,))
+        return [{'id': row[0], 'analyzed_at': row[1]} for row in rows]
+
+    def get(self, analysis_id):
+        rows = self._rows('SELECT id, url, analyzed_at, result FROM analyses WHERE id = ?', (analysis_id,))
+        if not rows:
+            return None
+        row = rows[0]
+        return {'id': row[0], 'url': row[1], 'analyzed_at': row[2], 'result': _decode_result(row[3])}
+
+    def _snapshot_before(self, url, timestamp):
+        rows = self._rows('SELECT id FROM analyses WHERE url = ? AND analyzed_at <= ? '
+                          'ORDER BY analyzed_at DESC LIMIT 1', (url, timestamp))
+        return rows[0][0] if rows else None
+
+    def _latest_snapshot(self, url):
+        rows = self._rows('SELECT id FROM analyses WHERE url = ? AND is_latest = 1', (url,))
+        return rows[0][0] if rows else None
+
+    def diff(self, old_id, new_id):
+        """Rozdíl dvou snímků"""
+        old, new = self.get(old_id), self.get(new_id)
+        if not old or not new:
+            raise Exception("Snímek nenalezen")
+        return {'url': new['url'], 'old': {'id': old['id'], 'analyzed_at': old['analyzed_at']},
+                'new': {'id': new['id'], 'analyzed_at': new['analyzed_at']},
+                'changes': diff_results(old['result'], new['result'])}
+
+    def diff_since(self, url, since):
+        """Co se u URL změnilo od času since (poslední snímek před ním proti nejnovějšímu)"""
+        old_id = self._snapshot_before(url, since)
+        new_id = self._latest_snapshot(url)
+        if old_id is None or new_id is None:
+            return None
+        return self.diff(old_id, new_id)
+
+    def changes_since(self, since, limit=100):
+        """Weby analyzované po čase since, které mají i starší snímek, a jejich změny"""
+        rows = self._rows('SELECT url FROM analyses WHERE is_latest = 1 AND analyzed_at > ? '
+                          'ORDER BY analyzed_at DESC', (since,))
+        changes = []
+        for (url,) in rows:
+            diff = self.diff_since(url, since)
+            if diff and diff['changes']:
+                changes.append(diff)
+                if len(changes) >= limit:
+                    break
+        return changes
+
+    def stats(self):
+        rows = self._rows('SELECT COUNT(*), COUNT(DISTINCT url), SUM(is_latest) FROM analyses')
+        with self._condition:
+            pending = len(self._pending)
+        return dict(self.counters, analyses=rows[0][0], urls=rows[0][1], pending=pending)
+
+    # --- sloupcový export --------------------------------------------------
+
+    def export_columns(self, target, latest=True):
+        """Uloží nejnovější analýzy jako komprimovaný sloupcový NumPy archiv (.npz).
+
+        Textové sloupce s opakováním (doména, fonty) jsou slovníkově kódované
+        (*_values + int32 kódy), barvy jsou celá čísla 0xRRGGBB (-1 = žádná) a
+        seznam fontů analýzy je ve tvaru CSR: fonts_codes[fonts_offsets[i]:fonts_offsets[i + 1]].
+        """
+        where = ' WHERE is_latest = 1' if latest else ''
+        analyses = self._rows(f'SELECT id, url, domain, analyzed_at, title FROM analyses{where} ORDER BY id')
+        ids = [row[0] for row in analyses]
+        position = {analysis_id: index for index, analysis_id in enumerate(ids)}
+        roles = {role: np.full(len(ids), -1, dtype=np.int64) for role in COLOR_ROLES + ('background',)}
+        for analysis_id, role, color in self._rows(f'SELECT analysis_id, role, color FROM colors WHERE role != ?',
+                                                   ('palette',)):
+            if analysis_id in position and role in roles:
+                roles[role][position[analysis_id]] = int(color[1:], 16)
+        fonts = [[] for _ in ids]
+        font_values = {}
+        for analysis_id, name in self._rows('SELECT analysis_id, name FROM fonts ORDER BY rowid'):
+            if analysis_id in position:
+                fonts[position[analysis_id]].append(font_values.setdefault(name, len(font_values)))
+        domain_values = {}
+        domain_codes = [domain_values.setdefault(row[2] or '', len(domain_values)) for row in analyses]
+        offsets = np.zeros(len(ids) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(codes) for codes in fonts]) if ids else []
+        arrays = {
+            'id': np.array(ids, dtype=np.int64),
+            'url': np.array([row[1] for row in analyses], dtype=str),
+            'title': np.array([row[4] or '' for row in analyses], dtype=str),
+            'analyzed_at': np.array([row[3] for row in analyses], dtype=np.float64),
+            'domain_codes': np.array(domain_codes, dtype=np.int32),
+            'domain_values': np.array(list(domain_values), dtype=str),
+            'fonts_codes': np.array([code for codes in fonts for code in codes], dtype=np.int32),
+            'fonts_offsets': offsets,
+            'fonts_values': np.array(list(font_values), dtype=str),
+        }
+        arrays.update((f'color_{role}', values) for role, values in roles.items())
+        np.savez_compressed(target, **arrays)
+        return len(ids)
+
+    def export_bytes(self, latest=True):
+        buffer = io.BytesIO()
+        self.export_columns(buffer, latest)
+        return buffer.getvalue()
+
+
+def create_result_store(path):
+    """Vytvoří úložiště výsledků, pokud je zadána cesta (prázdná nebo 'off' úložiště vypne)"""
+    if not path or path.lower() in ('off', 'none', '0'):
+        return None
+    return ResultStore(path)
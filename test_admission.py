@@ -0,0 +1,159 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from admission import AdmissionController, Overloaded, client_key
+
+
+def controller(**kwargs):
+    options = dict(max_concurrent=1, max_queue=4, queue_timeout=1, max_per_client=2, name='test')
+    options.update(kwargs)
+    return AdmissionController(**options)
+
+
+def test_admits_immediately_below_limit():
+    admission = controller(max_concurrent=2)
+    first = admission.wait(admission.enter('a'))
+    second = admission.wait(admission.enter('b'))
+    assert admission.stats()['in_flight'] == 2
+    admission.leave(first)
+    admission.leave(second)
+    assert admission.stats()['in_flight'] == 0
+
+
+def test_rejects_when_queue_is_full():
+    admission = controller(max_queue=1)
+    running = admission.wait(admission.enter('a'))
+    admission.enter('b')
+    with pytest.raises(Overloaded) as error:
+        admission.enter('c')
+    assert error.value.reason == 'queue_full'
+    assert error.value.retry_after >= 1
+    admission.leave(running)
+
+
+def test_limits_queued_requests_per_client():
+    admission = controller(max_per_client=1)
+    admission.wait(admission.enter('a'))
+    admission.enter('b')
+    with pytest.raises(Overloaded) as error:
+        admission.enter('b')
+    assert error.value.reason == 'client_limit'
+
+
+def test_released_slot_goes_round_robin_across_clients():
+    admission = controller(max_per_client=3)
+    running = admission.wait(admission.enter('x'))
+    a1, a2 = admission.enter('a'), admission.enter('a')
+    b1 = admission.enter('b')
+    admission.leave(running)
+    assert a1.future.done() and not b1.future.done()
+    admission.leave(a1)
+    # Klient b přijde na řadu dřív než druhý požadavek klienta a
+    assert b1.future.done() and not a2.future.done()
+
+
+def test_queue_timeout_rejects_and_leaves_queue():
+    admission = controller(queue_timeout=0.05)
+    running = admission.wait(admission.enter('a'))
+    waiting = admission.enter('b')
+    with pytest.raises(Overloaded) as error:
+        admission.wait(waiting)
+    assert error.value.reason == 'queue_timeout'
+    assert admission.stats()['queued'] == 0
+    admission.leave(running)
+    assert admission.stats()['in_flight'] == 0
+    assert waiting.future.cancelled()
+
+
+def test_slot_reports_wait_time_when_woken_by_another_thread():
+    admission = controller(queue_timeout=5)
+    running = admission.wait(admission.enter('a'))
+    waits = []
+
+    def worker():
+        with admission.slot('b') as waited:
+            waits.append(waited)
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    time.sleep(0.05)
+    admission.leave(running)
+    thread.join(5)
+    assert len(waits) == 1 and waits[0] >= 0.04
+    assert admission.stats()['in_flight'] == 0
+
+
+def test_slot_is_safe_under_concurrent_handoff():
+    admission = controller(max_concurrent=2, max_queue=100, max_per_client=100, queue_timeout=10)
+    errors = []
+
+    def worker(client):
+        try:
+            for _ in range(20):
+                with admission.slot(client) as waited:
+                    assert waited >= 0
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(f'c{i}',)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+    assert errors == []
+    assert admission.stats()['in_flight'] == 0
+    assert admission.stats()['admitted'] == 160
+
+
+def test_wait_async_gets_handed_slot():
+    admission = controller(queue_timeout=5)
+
+    async def scenario():
+        running = await admission.wait_async(admission.enter('a'))
+        waiting = asyncio.ensure_future(admission.wait_async(admission.enter('b')))
+        await asyncio.sleep(0.01)
+        admission.leave(running)
+        ticket = await waiting
+        admission.leave(ticket)
+
+    asyncio.run(scenario())
+    assert admission.stats()['in_flight'] == 0
+
+
+def test_cancelled_async_waiter_passes_slot_on():
+    admission = controller(queue_timeout=5)
+
+    async def scenario():
+        running = await admission.wait_async(admission.enter('a'))
+        cancelled = asyncio.ensure_future(admission.wait_async(admission.enter('b')))
+        third = admission.enter('c')
+        await asyncio.sleep(0.01)
+        cancelled.cancel()
+        await asyncio.sleep(0.01)
+        admission.leave(running)
+        assert third.future.done()
+        admission.leave(third)
+
+    asyncio.run(scenario())
+    assert admission.stats()['in_flight'] == 0
+
+
+def test_client_key_prefers_forwarded_address():
+    assert client_key('10.0.0.1') == '10.0.0.1'
+    assert client_key('10.0.0.1', '203.0.113.5, 10.0.0.1') == '203.0.113.5'
+    assert client_key(None) == 'unknown'
+
+
+def test_try_enter_takes_only_a_free_slot_without_queueing():
+    admission = controller(max_concurrent=1)
+    ticket = admission.try_enter('a')
+    assert ticket is not None and admission.try_enter('b') is None
+    waiting = admission.enter('b')
+    admission.leave(ticket)
+    assert waiting.future.done()
+    assert admission.try_enter('c') is None
+    admission.leave(waiting)
+    assert admission.stats()['queued'] == 0 and admission.stats()['rejected'] == {}
@@ -0,0 +1,181 @@
+import json
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import app as app_module
+from admission import AdmissionController
+from jobs import JobQueue, MemoryJobStore
+from result_cache import ResultCache
+from scraper import FIELDS, parse_fields
+
+
+class FakeAnalyzer:
+    """Zastoupí WebAnalyzer: zaznamená vybraná pole a vrátí jen je"""
+
+    created = []
+    streamed = []
+
+    def __init__(self, url, fields=None, **kwargs):
+        self.url = self.base_url = url
+        self.fields = parse_fields(fields)
+        self.budget = SimpleNamespace(truncated=[])
+        self.guard = SimpleNamespace(report=lambda: {'retries': 0})
+        FakeAnalyzer.created.append(self.fields)
+
+    def fingerprint(self):
+        return 'same'
+
+    @staticmethod
+    def value(field):
+        if field == 'links':
+            return [{'url': f'https://example.com/{i}', 'text': f'Odkaz {i}', 'title': '', 'is_internal': i < 2}
+                    for i in range(3)]
+        return f'{field} value'
+
+    def analyze(self):
+        return dict({'url': self.url}, **{field: self.value(field) for field in self.fields})
+
+    def stream(self):
+        try:
+            yield 'page', self.url
+            for field in self.fields:
+                yield field, self.value(field)
+                FakeAnalyzer.streamed.append(field)
+        finally:
+            FakeAnalyzer.streamed.append('closed')
+
+
+@pytest.fixture
+def client(monkeypatch):
+    FakeAnalyzer.created = []
+    FakeAnalyzer.streamed = []
+    monkeypatch.setattr(app_module, 'WebAnalyzer', FakeAnalyzer)
+    monkeypatch.setattr(app_module, 'result_cache', ResultCache())
+    monkeypatch.setattr(app_module, 'admission', AdmissionController(name='test'))
+    return app_module.app.test_client()
+
+
+def test_unknown_field_returns_400(client):
+    response = client.post('/analyze', json={'url': 'https://example.com/', 'fields': 'title,bogus'})
+    assert response.status_code == 400
+    assert 'bogus' in response.get_json()['error']
+    assert client.get('/analyze/stream?url=https://example.com/&fields=bogus').status_code == 400
+    assert FakeAnalyzer.created == []
+
+
+def test_results_are_cached_per_field_set(client):
+    url = 'https://example.com/'
+    first = client.post('/analyze', json={'url': url, 'fields': 'title'})
+    assert first.headers['X-Cache'] == 'miss'
+    assert set(first.get_json()) == {'url', 'title', 'cache'}
+    assert client.post('/analyze?fields=title', json={'url': url}).headers['X-Cache'] == 'hit'
+    full = client.post('/analyze', json={'url': url})
+    assert full.headers['X-Cache'] == 'miss'
+    assert set(FIELDS) <= set(full.get_json())
+    assert client.post('/analyze', json={'url': url, 'fields': 'links,title'}).headers['X-Cache'] == 'miss'
+    assert FakeAnalyzer.created == [['title'], FIELDS, ['title', 'links']]
+
+
+def read_events(text):
+    events = []
+    for block in text.strip().split('\n\n'):
+        event, data = block.split('\n')
+        events.append((event[len('event: '):], json.loads(data[len('data: '):])))
+    return events
+
+
+def test_stream_sends_page_sections_and_done_in_order(client):
+    response = client.get('/analyze/stream?url=example.com&fields=title,links&compact=1')
+    assert response.mimetype == 'text/event-stream'
+    events = read_events(response.get_data(as_text=True))
+    assert [event for event, _ in events] == ['page', 'section', 'section', 'done']
+    assert events[0][1] == {'url': 'https://example.com'}
+    assert events[1][1] == {'field': 'title', 'value': 'title value'}
+    links = events[2][1]
+    assert links['field'] == 'links' and links['value']['total'] == 3 and links['value']['internal'] == 2
+    assert links['value']['items'][0]['url'] == 'https://example.com/0' and 'next_cursor' in links['value']
+    assert events[3][1] == {'cache': 'miss', 'truncated': [], 'fetch': {'retries': 0}}
+    # Místo se uvolní až zavřením odpovědi, jako když ji server dopošle
+    assert app_module.admission.stats()['in_flight'] == 1
+    response.close()
+    assert app_module.admission.stats()['in_flight'] == 0
+
+    cached = read_events(client.get('/analyze/stream?url=example.com&fields=title,links').get_data(as_text=True))
+    assert cached[-1][1]['cache'] == 'hit'
+    assert cached[2][1]['value'] == FakeAnalyzer.value('links')
+
+
+def test_stream_releases_admission_when_client_disconnects(client):
+    response = client.get('/analyze/stream?url=example.com&refresh=1', buffered=False)
+    chunks = iter(response.response)
+    assert next(chunks).startswith(b'event: page')
+    next(chunks)
+    assert app_module.admission.stats()['in_flight'] == 1
+    response.close()
+    assert app_module.admission.stats()['in_flight'] == 0
+    assert FakeAnalyzer.streamed[-1] == 'closed' and len(FakeAnalyzer.streamed) < len(FIELDS)
+
+
+def test_rejected_stream_is_delivered_as_sse_event(monkeypatch):
+    monkeypatch.setattr(app_module, 'admission', AdmissionController(max_concurrent=0, max_queue=0, name='test'))
+    response = app_module.app.test_client().get('/analyze/stream?url=https://example.com/&refresh=1')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    assert response.headers['Retry-After']
+    event, data = response.get_data(as_text=True).strip().split('\n')
+    assert event == 'event: analysis-error'
+    payload = json.loads(data[len('data: '):])
+    assert payload['reason'] == 'queue_full' and payload['retry_after'] >= 1
+
+
+class FakeCrawler:
+    """Zastoupí SiteCrawler: zaznamená parametry a vrátí zprávu bez stahování"""
+
+    created = []
+
+    def __init__(self, url, max_pages=20, timeout=None, **kwargs):
+        self.url = url
+        self.max_pages = max_pages
+        self.timeout = timeout
+        FakeCrawler.created.append(self)
+
+    def run(self, progress=None):
+        if progress:
+            progress(self.url)
+        return {'url': self.url, 'partial': False, 'pages': [{'url': self.url, 'status': 'ok'}]}
+
+
+@pytest.fixture
+def crawl_client(monkeypatch):
+    FakeCrawler.created = []
+    monkeypatch.setattr(app_module, 'SiteCrawler', FakeCrawler)
+    monkeypatch.setattr(app_module, 'job_queue', JobQueue(MemoryJobStore(), FakeAnalyzer, workers=1))
+    return app_module.app.test_client()
+
+
+def test_short_crawl_runs_inline_with_deadline(crawl_client):
+    response = crawl_client.post('/crawl', json={'url': 'example.com', 'max_pages': 3})
+    assert response.status_code == 200
+    assert response.get_json()['url'] == 'https://example.com'
+    assert FakeCrawler.created[0].timeout == app_module.CRAWL_TIMEOUT
+
+
+@pytest.mark.parametrize('body', [{'async': True}, {'max_pages': app_module.CRAWL_SYNC_MAX_PAGES + 1}])
+def test_long_crawl_runs_as_job(crawl_client, body):
+    response = crawl_client.post('/crawl', json=dict(body, url='https://example.com/'))
+    assert response.status_code == 202
+    assert FakeCrawler.created[0].timeout == app_module.CRAWL_JOB_TIMEOUT
+    status_url = response.get_json()['status_url']
+    deadline = time.time() + 5
+    while crawl_client.get(status_url).get_json()['status'] != 'done' and time.time() < deadline:
+        time.sleep(0.01)
+    job = crawl_client.get(status_url).get_json()
+    assert job['kind'] == 'crawl' and job['stages'] == ['https://example.com/']
+    assert crawl_client.get(status_url + '/result').get_json()['pages'][0]['status'] == 'ok'
+
+
+def test_asgi_mode_shares_the_admission_controller():
+    import asgi
+    assert asgi.application.analyzer.admission is app_module.admission
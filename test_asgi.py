@@ -0,0 +1,152 @@
+import asyncio
+from collections import Counter
+from urllib.parse import urlsplit
+
+import httpx
+import pytest
+
+from app import app as wsgi_app
+from asgi import AsgiApp, AsyncAnalyzer
+from host_health import FetchGuard, HostHealth
+
+
+class MockSite:
+    """Obslouží požadavky analyzátoru z připraveného slovníku a zaznamená souběh na hostitele"""
+
+    def __init__(self, site, delay=0.0):
+        self.site = site
+        self.delay = delay
+        self.requested = Counter()
+        self.active = Counter()
+        self.peak = Counter()
+
+    async def handler(self, request):
+        url = str(request.url)
+        host = urlsplit(url).netloc
+        self.requested[url] += 1
+        self.active[host] += 1
+        self.peak[host] = max(self.peak[host], self.active[host])
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active[host] -= 1
+        if url not in self.site:
+            return httpx.Response(404)
+        content_type, body = self.site[url]
+        return httpx.Response(200, headers={'Content-Type': content_type}, content=body)
+
+
+def mock_analyzer(site, **kwargs):
+    analyzer = AsyncAnalyzer(**kwargs)
+    analyzer.client = httpx.AsyncClient(transport=httpx.MockTransport(site.handler), follow_redirects=True)
+    return analyzer
+
+
+def stylesheet_site(host, count, other_host=None):
+    urls = [f'https://{other_host if other_host and i % 2 else host}/s{i}.css' for i in range(count)]
+    links = ''.join(f'<link rel="stylesheet" href="{url}">' for url in urls)
+    site = {f'https://{host}/': ('text/html', f'<html><head><title>Mock</title>{links}</head></html>'.encode())}
+    for i, url in enumerate(urls):
+        site[url] = ('text/css', f'@font-face {{ font-family: Font{i}; src: url(f{i}.woff2) }}'.encode())
+    return site, urls
+
+
+def test_pool_timeout_is_not_a_host_failure():
+    health = HostHealth(failure_threshold=1)
+    guard = FetchGuard(health, retry_budget=3)
+    analyzer = AsyncAnalyzer()
+    calls = []
+
+    async def exhausted_pool(*args, **kwargs):
+        calls.append(kwargs)
+        raise httpx.PoolTimeout('no free connection')
+
+    analyzer._request = exhausted_pool
+
+    async def scenario():
+        with pytest.raises(httpx.PoolTimeout):
+            await analyzer._fetch(guard, 'https://a.com/', 10, 1024)
+        await analyzer.close()
+
+    asyncio.run(scenario())
+    assert len(calls) == 1
+    assert health.allow('a.com') == 'closed'
+    assert guard.report()['retries'] == 0
+
+
+def test_host_timeout_still_counts_as_failure():
+    health = HostHealth(failure_threshold=1)
+    guard = FetchGuard(health, retry_budget=0)
+    analyzer = AsyncAnalyzer()
+
+    async def slow_host(*args, **kwargs):
+        raise httpx.ReadTimeout('slow')
+
+    analyzer._request = slow_host
+
+    async def scenario():
+        with pytest.raises(httpx.ReadTimeout):
+            await analyzer._fetch(guard, 'https://a.com/', 10, 1024)
+        await analyzer.close()
+
+    asyncio.run(scenario())
+    assert health.is_open('a.com')
+
+
+def test_analyze_through_asgi_app_without_blocking():
+    site = MockSite(stylesheet_site('ok.asgi.test', 2)[0], delay=0.05)
+    analyzer = mock_analyzer(site)
+    application = AsgiApp(analyzer, wsgi_app)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=application),
+                                     base_url='http://testserver') as client:
+            # Během analýzy musí smyčka dál obsluhovat ostatní požadavky
+            analysis = asyncio.ensure_future(client.post('/analyze', json={'url': 'https://ok.asgi.test/',
+                                                                           'fields': 'title,fonts'}))
+            while not analyzer.counters['in_flight'] and not analysis.done():
+                await asyncio.sleep(0.001)
+            stats = (await client.get('/stats/async')).json()
+            assert stats['in_flight'] == 1 and not analysis.done()
+            response = await analysis
+        await analyzer.close()
+        return response
+
+    response = asyncio.run(scenario())
+    assert response.status_code == 200
+    assert response.headers['X-Cache'] == 'miss'
+    result = response.json()
+    assert result['title'] == 'Mock'
+    assert set(result['fonts']['names']) == {'Font0', 'Font1'}
+    assert set(site.requested.values()) == {1} and len(site.requested) == 3
+
+
+def test_concurrent_requests_share_one_analysis():
+    site = MockSite(stylesheet_site('flight.asgi.test', 1)[0], delay=0.05)
+    analyzer = mock_analyzer(site)
+
+    async def scenario():
+        outcomes = await asyncio.gather(*(analyzer.analyze('https://flight.asgi.test/', 'title') for _ in range(3)))
+        await analyzer.close()
+        return outcomes
+
+    outcomes = asyncio.run(scenario())
+    assert sorted(status for _, status in outcomes) == ['coalesced', 'coalesced', 'miss']
+    assert all(result == outcomes[0][0] for result, _ in outcomes)
+    assert site.requested['https://flight.asgi.test/'] == 1
+    assert analyzer.counters['coalesced'] == 2 and analyzer.counters['completed'] == 1
+    assert analyzer._flights == {}
+
+
+def test_downloads_are_limited_per_host():
+    site = MockSite(stylesheet_site('a.asgi.test', 8, other_host='b.asgi.test')[0], delay=0.03)
+    analyzer = mock_analyzer(site, per_host_limit=2)
+
+    async def scenario():
+        result, status = await analyzer.analyze('https://a.asgi.test/', 'fonts')
+        await analyzer.close()
+        return result
+
+    result = asyncio.run(scenario())
+    assert sorted(result['fonts']['names']) == sorted(f'Font{i}' for i in range(8))
+    assert site.peak == {'a.asgi.test': 2, 'b.asgi.test': 2}
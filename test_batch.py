@@ -0,0 +1,228 @@
+import pickle
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+import requests
+
+import batch
+from admission import AdmissionController
+from batch import AnalysisFailed, BatchRunner, is_transient, normalize_input_url, read_urls
+
+
+@pytest.fixture
+def runner(monkeypatch):
+    instance = BatchRunner(workers=4, per_domain=1, retries=1, backoff=0.01)
+    # Vlákna místo procesů, aby šla analýza v testu nahradit
+    instance._executor = ThreadPoolExecutor(max_workers=8)
+    yield instance
+    instance.close()
+
+
+def track_concurrency(monkeypatch, duration=0.05, fail=None):
+    lock = threading.Lock()
+    active = {}
+    peak = {}
+
+    def fake_analyze(url):
+        domain = batch.urlparse(url).netloc
+        with lock:
+            active[domain] = active.get(domain, 0) + 1
+            peak[domain] = max(peak.get(domain, 0), active[domain])
+        time.sleep(duration)
+        with lock:
+            active[domain] -= 1
+        if url in (fail or {}):
+            raise fail[url]
+        return {'url': url}, duration
+
+    monkeypatch.setattr(batch, 'analyze_in_worker', fake_analyze)
+    return peak
+
+
+def test_runs_every_url_and_normalizes_scheme(runner, monkeypatch):
+    track_concurrency(monkeypatch, duration=0)
+    records = list(runner.run(['a.com/1', 'https://b.com/2', '']))
+    assert sorted(record['url'] for record in records) == ['https://a.com/1', 'https://b.com/2']
+    assert all(record['status'] == 'ok' for record in records)
+
+
+def test_per_domain_limit_holds_within_one_run(runner, monkeypatch):
+    peak = track_concurrency(monkeypatch)
+    list(runner.run([f'https://a.com/{i}' for i in range(4)] + [f'https://b.com/{i}' for i in range(4)]))
+    assert peak == {'a.com': 1, 'b.com': 1}
+
+
+def test_per_domain_limit_is_shared_by_concurrent_runs(runner, monkeypatch):
+    peak = track_concurrency(monkeypatch)
+    results = []
+
+    def run_batch():
+        results.extend(runner.run([f'https://a.com/{i}' for i in range(3)]))
+
+    threads = [threading.Thread(target=run_batch) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+    assert len(results) == 9
+    assert peak == {'a.com': 1}
+    assert runner._active == 0 and not runner._domain_active
+
+
+def test_delay_spaces_starts_on_a_domain(runner, monkeypatch):
+    track_concurrency(monkeypatch, duration=0)
+    runner.delay = 0.1
+    started = time.monotonic()
+    list(runner.run(['https://a.com/1', 'https://a.com/2', 'https://a.com/3']))
+    assert time.monotonic() - started >= 0.2
+
+
+def test_only_transient_failures_are_retried(runner, monkeypatch):
+    track_concurrency(monkeypatch, duration=0, fail={
+        'https://a.com/down': AnalysisFailed('Chyba při načítání stránky: 503', True),
+        'https://a.com/missing': AnalysisFailed('Chyba při načítání stránky: 404', False),
+        'https://a.com/bug': RuntimeError('boom'),
+    })
+    urls = ['https://a.com/down', 'https://a.com/missing', 'https://a.com/bug', 'https://a.com/ok']
+    records = {record['url']: record for record in runner.run(urls)}
+    assert {url: (record['status'], record['attempts']) for url, record in records.items()} == {
+        'https://a.com/down': ('error', 2),
+        'https://a.com/missing': ('error', 1),
+        'https://a.com/bug': ('error', 1),
+        'https://a.com/ok': ('ok', 1),
+    }
+    assert records['https://a.com/missing']['error'] == 'Chyba při načítání stránky: 404'
+
+
+def http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(f'{status} Error', response=response)
+
+
+@pytest.mark.parametrize('error, transient', [
+    (requests.ConnectTimeout('slow'), True),
+    (requests.ConnectionError('refused'), True),
+    (http_error(503), True),
+    (http_error(429), True),
+    (http_error(404), False),
+    (http_error(400), False),
+    (requests.exceptions.InvalidURL('bad url'), False),
+    (ValueError('parse'), False),
+    (BrokenProcessPool('worker died'), True),
+])
+def test_is_transient(error, transient):
+    assert is_transient(error) is transient
+
+
+def test_wrapped_errors_are_classified_by_cause():
+    def wrapped(error):
+        try:
+            try:
+                raise error
+            except Exception as e:
+                raise Exception(f'Chyba při načítání stránky: {e}')
+        except Exception as outer:
+            return outer
+
+    assert is_transient(wrapped(requests.ReadTimeout('slow')))
+    assert not is_transient(wrapped(http_error(404)))
+    failed = pickle.loads(pickle.dumps(AnalysisFailed('404 Client Error', False)))
+    assert str(failed) == '404 Client Error' and failed.transient is False
+
+
+class BrokenExecutor:
+    """Pool se spadlým procesem: rozpracované úlohy selžou a další nejdou zadat"""
+
+    def __init__(self):
+        self.broken = False
+        self.shut_down = False
+
+    def submit(self, function, *args):
+        if self.broken:
+            raise BrokenProcessPool('pool is broken')
+        self.broken = True
+        future = Future()
+        future.set_exception(BrokenProcessPool('worker died'))
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+def test_broken_pool_is_replaced_and_work_retried(monkeypatch):
+    track_concurrency(monkeypatch, duration=0)
+    broken = BrokenExecutor()
+    created = []
+
+    def new_executor():
+        created.append(ThreadPoolExecutor(max_workers=4))
+        return created[-1]
+
+    runner = BatchRunner(workers=4, per_domain=4, retries=1, backoff=0.01)
+    runner._executor = broken
+    monkeypatch.setattr(runner, '_new_executor', new_executor)
+    records = list(runner.run(['https://a.com/1', 'https://a.com/2', 'https://a.com/3']))
+    assert sorted((record['url'], record['status']) for record in records) == [
+        ('https://a.com/1', 'ok'), ('https://a.com/2', 'ok'), ('https://a.com/3', 'ok')]
+    assert broken.shut_down and len(created) == 1
+    assert list(runner.run(['https://b.com/']))[0]['status'] == 'ok'
+    runner.close()
+
+
+def test_abandoned_run_releases_its_slots(runner, monkeypatch):
+    track_concurrency(monkeypatch)
+    records = runner.run([f'https://a.com/{i}' for i in range(3)])
+    next(records)
+    records.close()
+    deadline = time.monotonic() + 5
+    while runner._active and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert runner._active == 0
+
+
+def test_each_entry_takes_an_admission_slot(runner, monkeypatch):
+    lock = threading.Lock()
+    active = []
+    peak = []
+
+    def fake_analyze(url):
+        with lock:
+            active.append(url)
+            peak.append(len(active))
+        time.sleep(0.03)
+        with lock:
+            active.remove(url)
+        return {'url': url}, 0.03
+
+    monkeypatch.setattr(batch, 'analyze_in_worker', fake_analyze)
+    admission = AdmissionController(max_concurrent=2, max_queue=4, queue_timeout=5, name='test')
+    records = list(runner.run([f'https://d{i}.com/' for i in range(6)], admission=admission, client='c'))
+    assert [record['status'] for record in records] == ['ok'] * 6
+    assert max(peak) == 2
+    stats = admission.stats()
+    assert stats['in_flight'] == 0 and stats['admitted'] == 6
+
+
+def test_rejected_batch_reports_remaining_urls(runner, monkeypatch):
+    track_concurrency(monkeypatch, duration=0)
+    admission = AdmissionController(max_concurrent=0, max_queue=0, name='test')
+    records = list(runner.run(['https://a.com/1', 'https://b.com/2'], admission=admission))
+    assert sorted(record['url'] for record in records) == ['https://a.com/1', 'https://b.com/2']
+    assert {(record['status'], record['reason'], record['attempts']) for record in records} == {
+        ('rejected', 'queue_full', 0)}
+
+
+def test_unparsable_url_is_reported_without_stopping_the_batch(runner, monkeypatch):
+    track_concurrency(monkeypatch, duration=0)
+    records = {record['url']: record for record in runner.run(['http://[::1', 'https://a.com/'])}
+    assert records['http://[::1']['status'] == 'error' and records['http://[::1']['attempts'] == 0
+    assert records['https://a.com/']['status'] == 'ok'
+
+
+def test_read_urls_skips_blank_lines_and_comments():
+    assert list(read_urls(['# list', ' a.com ', '', 'b.com'])) == ['a.com', 'b.com']
+    assert normalize_input_url(' example.com ') == 'https://example.com'
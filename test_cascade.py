@@ -0,0 +1,88 @@
+from cascade import Cascade, bucket_key, media_matches, parse_document, parse_selector, split_selector_list
+from css_index import CssIndex
+
+PAGE = b'''<html><body class="page">
+<div id="main" class="content"><h1 class="title hero">Hello</h1><p class="lead" style="color: olive">Text</p>
+<a href="/x" class="btn primary">Go</a><span>First</span><span class="last">Second</span></div>
+</body></html>'''
+
+
+def cascade(css, content=PAGE):
+    index = CssIndex()
+    index.add_source(css)
+    return Cascade(index, parse_document(content))
+
+
+def style(instance, xpath):
+    return instance.computed_style(instance.document.xpath(xpath)[0])
+
+
+def test_specificity():
+    assert parse_selector('#main .title h1').specificity == (1, 1, 1)
+    assert parse_selector('a.btn.primary:first-child').specificity == (0, 3, 1)
+    assert parse_selector('div > [href]').specificity == (0, 1, 1)
+    assert parse_selector(':is(#a, .b) p').specificity == (1, 0, 1)
+    assert parse_selector(':where(#a) p').specificity == (0, 0, 1)
+    assert parse_selector('p::before') is None
+    assert parse_selector('a >> b') is None
+
+
+def test_higher_specificity_wins_over_later_rule():
+    instance = cascade('#main h1 { color: red } .content .title { color: blue } h1.title { color: green }')
+    assert style(instance, '//h1')['color'] == 'red'
+
+
+def test_equal_specificity_later_rule_wins():
+    instance = cascade('.title { color: red } .hero { color: blue }')
+    assert style(instance, '//h1')['color'] == 'blue'
+
+
+def test_important_beats_specificity_and_inline():
+    instance = cascade('#main .lead { color: red } p { color: blue !important }')
+    assert style(instance, '//p')['color'] == 'blue'
+    assert style(cascade('#main .lead { color: red }'), '//p')['color'] == 'olive'
+
+
+def test_most_specific_selector_of_a_list_counts():
+    instance = cascade('#main h1, h1 { color: red } .title { color: blue }')
+    assert style(instance, '//h1')['color'] == 'red'
+
+
+def test_combinators():
+    instance = cascade('div > h1 { margin: 1px } h1 + p { margin: 2px } h1 ~ span { margin: 3px } '
+                       'body span.last { margin: 4px }')
+    assert style(instance, '//h1')['margin'] == '1px'
+    assert style(instance, '//p')['margin'] == '2px'
+    assert style(instance, '//span[1]')['margin'] == '3px'
+    assert style(instance, '//span[2]')['margin'] == '4px'
+
+
+def test_inheritance_and_custom_properties():
+    instance = cascade('body { color: #111; --accent: teal; padding: 4px } a { background: var(--accent) } '
+                       '.content { --accent: navy }')
+    link = style(instance, '//a')
+    assert link['color'] == '#111'
+    assert 'padding' not in link
+    assert link['background'] == 'navy'
+
+
+def test_state_rules_and_narrow_media_do_not_apply():
+    instance = cascade('a:hover { color: red } @media (max-width: 600px) { a { color: blue } } a { color: green }')
+    assert style(instance, '//a')['color'] == 'green'
+    assert bucket_key('a:hover') is None
+    assert bucket_key('.card > a.btn') == ('class', 'btn')
+    assert media_matches('@media screen and (min-width: 1024px)')
+    assert not media_matches('@media print')
+    assert not media_matches('@media (prefers-color-scheme: dark)')
+
+
+def test_split_selector_list_respects_parentheses():
+    assert split_selector_list('a, :is(b, c), d[x="1,2"]') == ['a', ':is(b, c)', 'd[x="1,2"]']
+
+
+def test_missing_roles_get_probe_elements():
+    instance = cascade('.card { border-radius: 8px } button { color: red }')
+    roles = instance.key_elements()
+    assert roles['h1'][0].get('class') == 'title hero'
+    assert instance.role_value(['card'], 'border-radius') == '8px'
+    assert instance.role_value(['button'], 'color') is None
@@ -0,0 +1,113 @@
+import base64
+import gzip
+
+import pytest
+
+import compact
+from compact import (AssetStore, LinkPages, choose_encoding, compact_fonts, compress, decode_cursor,
+                     decode_data_uri, encode_cursor)
+
+
+def links(count):
+    return [{'url': f'https://example.com/{i}', 'text': f'Link {i}', 'title': '', 'is_internal': i % 2 == 0}
+            for i in range(count)]
+
+
+@pytest.fixture
+def without_brotli(monkeypatch):
+    monkeypatch.setattr(compact, 'brotli', None)
+
+
+@pytest.fixture
+def with_brotli(monkeypatch):
+    monkeypatch.setattr(compact, 'brotli', object())
+
+
+def test_cursor_roundtrip_and_invalid_cursor():
+    assert decode_cursor(encode_cursor(250)) == 250
+    assert decode_cursor(None) == 0
+    with pytest.raises(ValueError):
+        decode_cursor('!!!')
+
+
+def test_pages_cover_filtered_list_exactly_once():
+    items = links(25)
+    seen, cursor = [], None
+    while True:
+        page = LinkPages.page(items, kind='internal', cursor=cursor, limit=5)
+        seen.extend(link['url'] for link in page['items'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert page['total'] == 13
+    assert seen == [link['url'] for link in items if link['is_internal']]
+
+
+def test_page_search_and_unknown_kind():
+    assert LinkPages.page(links(25), query='LINK 2')['total'] == 6
+    with pytest.raises(ValueError):
+        LinkPages.page(links(1), kind='other')
+
+
+def test_summary_stores_list_under_content_id():
+    pages = LinkPages()
+    summary = pages.summary(links(150), limit=100)
+    assert (summary['total'], summary['internal'], summary['external']) == (150, 75, 75)
+    assert len(summary['items']) == 100 and summary['next_cursor']
+    assert pages.get(summary['id']) == links(150)
+    assert pages.add(links(150)) == summary['id']
+
+
+def test_asset_store_deduplicates_and_evicts():
+    assets = AssetStore(max_bytes=10)
+    first = assets.put(b'123456', 'font/woff2')
+    assert assets.put(b'123456', 'font/woff2') == first
+    assets.put(b'abcdef', 'font/woff2')
+    assert assets.get(first) is None
+    assert assets.stats()['deduplicated'] == 1
+
+
+def test_compact_fonts_replaces_only_large_base64_uris():
+    font = bytes(range(256)) * 2
+    uri = 'data:font/woff2;base64,' + base64.b64encode(font).decode('ascii')
+    small = 'data:font/woff2;base64,' + base64.b64encode(b'tiny').decode('ascii')
+    svg = 'data:image/svg+xml,%3Csvg%3E%3C/svg%3E'
+    assets = AssetStore()
+    fonts = {'urls': {'Inter': uri, 'Tiny': small}, 'styles': [f'src: url("{uri}"), url("{svg}")']}
+    result = compact_fonts(fonts, assets)
+    path = result['urls']['Inter']
+    assert path.startswith('/assets/') and result['urls']['Tiny'] == small
+    assert result['styles'] == [f'src: url("{path}"), url("{svg}")']
+    assert assets.get(path[len('/assets/'):]) == (font, 'font/woff2')
+
+
+def test_decode_data_uri_handles_percent_encoding():
+    assert decode_data_uri('data:,a%20b') == (b'a b', 'text/plain')
+    assert decode_data_uri('https://example.com/') is None
+
+
+def test_choose_encoding_honors_quality(with_brotli):
+    assert choose_encoding('br;q=0.1, gzip') == 'gzip'
+    assert choose_encoding('gzip, br') == 'br'
+    assert choose_encoding('gzip;q=0.5, br;q=0') == 'gzip'
+    assert choose_encoding('gzip;q=0, br;q=0') is None
+    assert choose_encoding('identity') is None
+    assert choose_encoding(None) is None
+
+
+def test_choose_encoding_wildcard(with_brotli):
+    assert choose_encoding('*') == 'br'
+    assert choose_encoding('br;q=0, *;q=0.5') == 'gzip'
+    assert choose_encoding('*;q=0') is None
+
+
+def test_choose_encoding_without_brotli(without_brotli):
+    assert choose_encoding('br') is None
+    assert choose_encoding('br, gzip;q=0.2') == 'gzip'
+
+
+def test_gzip_roundtrip():
+    body = b'{"a": 1}' * 200
+    assert gzip.decompress(compress(body, 'gzip')) == body
+    assert compact.compressible('application/json', len(body))
+    assert not compact.compressible('image/png', len(body))
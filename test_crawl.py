@@ -0,0 +1,156 @@
+import threading
+import time
+
+import pytest
+
+from admission import AdmissionController
+from crawl import BloomFilter, RobotsPolicy, SiteCrawler, canonical_url, merge_reports, site_host
+
+
+class FakeResponse:
+    def __init__(self, status_code, text=''):
+        self.status_code = status_code
+        self.text = text
+
+
+class FakeSession:
+    """Vrací připravené odpovědi na robots.txt a zaznamenává vlákna, ze kterých se volá"""
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.threads = []
+
+    def get(self, url, timeout=None):
+        self.threads.append(threading.current_thread().name)
+        response = self.responses.get(url)
+        if isinstance(response, Exception):
+            raise response
+        return response or FakeResponse(404)
+
+
+class FakeAnalyzer:
+    def __init__(self, url, site, delay=0.0):
+        self.url = url
+        self.site = site
+        self.delay = delay
+
+    def analyze(self):
+        time.sleep(self.delay)
+        links = [{'url': link} for link in self.site.get(self.url, [])]
+        return {'url': self.url, 'title': self.url, 'links': links}
+
+
+def crawler(url, site, robots=None, page_delay=0.0, **kwargs):
+    instance = SiteCrawler(url, delay=0, make_analyzer=lambda page_url: FakeAnalyzer(page_url, site, page_delay),
+                           respect_robots=robots is not None, **kwargs)
+    if robots is not None:
+        instance.robots = RobotsPolicy(FakeSession(robots))
+    return instance
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    urls = [f'https://example.com/{i}' for i in range(1000)]
+    assert all(bloom.add(url) for url in urls)
+    assert all(url in bloom for url in urls)
+    assert not bloom.add(urls[0])
+    assert bloom.count == 1000
+    false_positives = sum(f'https://other.com/{i}' in bloom for i in range(10000))
+    assert false_positives < 300
+
+
+def test_canonical_url_drops_tracking_and_sorts_query():
+    assert canonical_url('HTTPS://Example.com/a?b=2&utm_source=x&a=1#top') == 'https://example.com/a?a=1&b=2'
+    assert canonical_url('https://example.com:443') == 'https://example.com/'
+    assert site_host('https://www.example.com/') == 'example.com'
+
+
+@pytest.mark.parametrize('response, allowed', [
+    (FakeResponse(200, 'User-agent: *\nDisallow: /private'), False),
+    (FakeResponse(404), True),
+    (FakeResponse(503), False),
+    (OSError('refused'), False),
+])
+def test_robots_status_handling(response, allowed):
+    robots = RobotsPolicy(FakeSession({'https://a.com/robots.txt': response}))
+    assert robots.allowed('https://a.com/private/page') is allowed
+
+
+def test_robots_crawl_delay_and_single_fetch():
+    session = FakeSession({'https://a.com/robots.txt': FakeResponse(200, 'User-agent: *\nCrawl-delay: 3')})
+    robots = RobotsPolicy(session)
+    assert robots.crawl_delay('https://a.com/') == 3
+    assert robots.allowed('https://a.com/x')
+    assert len(session.threads) == 1
+
+
+def test_robots_crawl_delay_is_capped():
+    robots = {'https://a.com/robots.txt': FakeResponse(200, 'User-agent: *\nCrawl-delay: 86400'),
+              'https://b.com/robots.txt': FakeResponse(200, 'User-agent: *\nRequest-rate: 1/3600')}
+    policy = RobotsPolicy(FakeSession(robots))
+    assert policy.crawl_delay('https://a.com/') == policy.crawl_delay('https://b.com/') == 10
+    assert RobotsPolicy(FakeSession(robots), max_delay=2).crawl_delay('https://a.com/') == 2
+
+
+def test_crawl_deadline_returns_partial_report():
+    site = {'https://a.com/': [f'https://a.com/{i}' for i in range(20)]}
+    done = []
+    instance = crawler('https://a.com/', site, page_delay=0.1, max_pages=20, workers=2, timeout=0.25)
+    start = time.monotonic()
+    report = instance.run(progress=done.append)
+    assert time.monotonic() - start < 0.5
+    assert report['partial'] and report['stats']['deadline_exceeded'] == 1
+    statuses = [page['status'] for page in report['pages']]
+    assert 'ok' in statuses and statuses.count('timeout') == 2
+    assert done == [page['url'] for page in report['pages'] if page['status'] == 'ok']
+    assert report['stats']['frontier_left'] > 0
+    assert not crawler('https://a.com/', {}, timeout=5).run()['partial']
+
+
+def test_crawl_pages_take_admission_slots():
+    site = {'https://a.com/': [f'https://a.com/{i}' for i in range(6)]}
+    admission = AdmissionController(max_concurrent=1, max_queue=8, queue_timeout=5, name='test')
+    pages, results = crawler('https://a.com/', site, page_delay=0.01, workers=4, per_host=4,
+                             admit=lambda: admission.slot('c')).crawl()
+    assert len(results) == 7
+    assert admission.stats()['admitted'] == 7 and admission.stats()['in_flight'] == 0
+
+    closed = AdmissionController(max_concurrent=0, max_queue=0, name='test')
+    pages, results = crawler('https://a.com/', site, admit=lambda: closed.slot('c')).crawl()
+    assert results == [] and pages[0]['status'] == 'error'
+
+
+def test_crawl_follows_same_site_links_within_budget():
+    site = {
+        'https://example.com/': ['https://example.com/a', 'https://example.com/b?utm_source=x',
+                                 'https://other.com/', 'https://example.com/file.pdf'],
+        'https://example.com/a': ['https://example.com/b', 'https://example.com/c'],
+    }
+    pages, results = crawler('https://example.com/', site, max_pages=3).crawl()
+    assert sorted(page['url'] for page in pages) == ['https://example.com/', 'https://example.com/a',
+                                                     'https://example.com/b']
+    assert len(results) == 3
+
+
+def test_crawl_respects_depth_limit():
+    site = {'https://example.com/': ['https://example.com/a'], 'https://example.com/a': ['https://example.com/b']}
+    pages, _ = crawler('https://example.com/', site, max_depth=1).crawl()
+    assert [page['depth'] for page in pages] == [0, 1]
+
+
+def test_robots_skips_links_but_not_entry_url_and_loads_off_scheduler():
+    robots = {'https://example.com/robots.txt': FakeResponse(200, 'User-agent: *\nDisallow: /')}
+    site = {'https://example.com/': ['https://example.com/a']}
+    instance = crawler('https://example.com/?utm_source=newsletter', site, robots=robots)
+    pages, _ = instance.crawl()
+    assert [page['url'] for page in pages] == ['https://example.com/']
+    assert instance.stats['robots_skipped'] == 1
+    assert all(name.startswith('robots') for name in instance.robots.session.threads)
+
+
+def test_merge_reports_counts_pages_per_value():
+    results = [{'fonts': {'names': ['Inter']}, 'colors': {'primary': '#111111'}},
+               {'fonts': {'names': ['Inter', 'Lora']}, 'colors': {'primary': '#111111'}}]
+    report = merge_reports(results)
+    assert report['fonts']['frequencies'][0] == {'name': 'Inter', 'pages': 2, 'weight': 1.0}
+    assert report['colors']['primary'] == '#111111'
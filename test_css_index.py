@@ -0,0 +1,113 @@
+from css_index import CssIndex
+
+
+def index(*sources):
+    instance = CssIndex()
+    for source in sources:
+        if isinstance(source, tuple):
+            instance.add_source(*source)
+        else:
+            instance.add_source(source)
+    return instance
+
+
+def declarations(instance):
+    return [(rule.selector, rule.declarations) for rule in instance.rules]
+
+
+def test_simple_rules_and_property_map():
+    instance = index('a { color: red; margin: 0 } .btn, #main > p { COLOR: Blue }')
+    assert declarations(instance) == [
+        ('a', [('color', 'red', False), ('margin', '0', False)]),
+        ('.btn, #main > p', [('color', 'Blue', False)]),
+    ]
+    assert instance.values('color') == ['red', 'Blue']
+    assert instance.first('padding', 'color') == 'red'
+
+
+def test_strings_with_semicolons_and_braces():
+    instance = index('a::before { content: "a;b}c"; color: red } b { content: \'{x;}\' }')
+    assert declarations(instance) == [
+        ('a::before', [('content', '"a;b}c"', False), ('color', 'red', False)]),
+        ('b', [('content', "'{x;}'", False)]),
+    ]
+
+
+def test_url_with_semicolon():
+    svg = 'url(data:image/svg+xml;charset=utf-8,%3Csvg%3E)'
+    instance = index(f'.icon {{ background: {svg} no-repeat; color: red }}',
+                     f'.other {{ color: blue; background-image: URL(x.png;v=1) }}')
+    assert instance.values('background') == [f'{svg} no-repeat']
+    assert instance.values('color') == ['red', 'blue']
+    assert instance.values('background-image') == ['URL(x.png;v=1)']
+
+
+def test_comments_are_ignored():
+    instance = index('/* a { color: red } */ b { color: /* ; } */ blue } /* unclosed')
+    assert declarations(instance) == [('b', [('color', 'blue', False)])]
+
+
+def test_important():
+    instance = index('a { color: red !important; margin: 0 ! IMPORTANT; padding: 1px } '
+                     'b { background: url(a.png) no-repeat!important }')
+    assert instance.rules[0].declarations == [('color', 'red', True), ('margin', '0', True),
+                                              ('padding', '1px', False)]
+    assert instance.rules[1].declarations == [('background', 'url(a.png) no-repeat', True)]
+
+
+def test_unclosed_rules_at_end_are_kept():
+    instance = index('@media screen { a { color: red; margin: 1px')
+    assert declarations(instance) == [('a', [('color', 'red', False), ('margin', '1px', False)])]
+    assert instance.rules[0].media == '@media screen'
+
+
+def test_nested_media_keeps_innermost_prelude():
+    instance = index('@media screen { @supports (display: grid) { .grid { display: grid } } p { margin: 0 } }')
+    assert [(rule.selector, rule.media) for rule in instance.rules] == [
+        ('.grid', '@supports (display: grid)'),
+        ('p', '@media screen'),
+    ]
+
+
+def test_font_face_and_unknown_at_rules():
+    css = ('@font-face { font-family: "Inter"; src: url(inter.woff2) format("woff2") } '
+           '@keyframes spin { from { color: red } to { color: blue } } a { color: green }')
+    instance = index((css, 'https://a.com/css/'))
+    [face] = instance.font_faces
+    assert face['declarations'][0] == ('font-family', '"Inter"', False)
+    assert face['css'].startswith('@font-face') and face['css'].endswith('}')
+    assert face['base'] == 'https://a.com/css/'
+    assert instance.values('color') == ['green']
+
+
+def test_imports():
+    instance = index(('@import url("base.css"); @import \'print.css\' print; @IMPORT url(x.css);\na { color: red }',
+                      'https://a.com/'))
+    assert instance.imports == [('base.css', 'https://a.com/'), ('print.css', 'https://a.com/'),
+                                ('x.css', 'https://a.com/')]
+    assert instance.values('color') == ['red']
+
+
+def test_custom_properties():
+    instance = index(':root { --Brand: #f00; --space: 4px } .dark { --brand: #0f0 }')
+    assert instance.custom_properties == {'brand': '#0f0', 'space': '4px'}
+    assert instance.custom_declarations == [('brand', '#f00'), ('space', '4px'), ('brand', '#0f0')]
+    assert instance.variables().get('brand') == '#f00'
+
+
+def test_selector_values_and_source_values():
+    instance = index(('.btn { background: red } a.btn:hover { background: blue } .card { background: white }', None,
+                      'link'),
+                     ('.btn { border-radius: 4px; background: green }', None, 'inline'))
+    assert instance.selector_values(['.btn'], {'background'}) == ['red', 'blue', 'green']
+    assert instance.selector_values(['.card', '.btn'], {'background', 'border-radius'}) == \
+        ['red', 'blue', 'white', '4px', 'green']
+    assert instance.source_values('background', 'inline') == ['green']
+    assert instance.source_values('background', 'link') == ['red', 'blue', 'white']
+
+
+def test_from_sources_keeps_document_order():
+    instance = CssIndex.from_sources([{'content': 'a { color: red }'},
+                                      {'content': 'b { color: blue }', 'origin': 'inline'}])
+    assert instance.values('color') == ['red', 'blue']
+    assert [rule.source for rule in instance.rules] == [0, 1]
@@ -0,0 +1,57 @@
+from css_index import CssIndex
+from css_vars import CssVariables, scope_of, substitute
+
+
+def variables(css):
+    index = CssIndex()
+    index.add_source(css)
+    return CssVariables(index)
+
+
+def test_substitute_uses_nested_fallbacks():
+    values = {'a': 'red'}
+    assert substitute('1px solid var(--a)', values.get) == '1px solid red'
+    assert substitute('var(--x, var(--a))', values.get) == 'red'
+    assert substitute('var(--x, rgb(0, 0, 0))', values.get) == 'rgb(0, 0, 0)'
+    assert substitute('var(--x)', values.get) is None
+
+
+def test_scope_of():
+    assert scope_of(':root') is None
+    assert scope_of('.Card  .title') == '.card .title'
+    assert scope_of(':root', '(prefers-color-scheme: dark)') == '(prefers-color-scheme: dark)'
+
+
+def test_resolves_chains():
+    css_vars = variables(':root { --base: #336699; --brand: var(--base); --border: 1px solid var(--brand) }')
+    assert css_vars.get('--border') == '1px solid #336699'
+    assert css_vars.resolve_value('var(--brand)') == '#336699'
+
+
+def test_cycle_invalidates_all_members_but_fallback_applies():
+    css_vars = variables(':root { --a: var(--b); --b: var(--c, red); --c: var(--a); --d: var(--a, blue) }')
+    assert css_vars.get('a') is None
+    assert css_vars.get('b') is None
+    assert css_vars.get('c') is None
+    assert css_vars.get('d') == 'blue'
+    assert css_vars.resolve_value('var(--b, green)') == 'green'
+
+
+def test_self_reference_is_a_cycle():
+    assert variables(':root { --a: var(--a, red) }').get('a') is None
+
+
+def test_scoped_value_overrides_root_and_resolves_in_its_scope():
+    css_vars = variables(':root { --fg: black; --text: var(--fg) } '
+                         '@media (prefers-color-scheme: dark) { :root { --fg: white; --text: var(--fg) } }')
+    [dark] = css_vars.themes()
+    assert 'prefers-color-scheme: dark' in dark
+    assert css_vars.get('text') == 'black'
+    assert css_vars.get('text', dark) == 'white'
+
+
+def test_long_chain_stays_within_depth_limit():
+    chain = ' '.join(f'--v{i}: var(--v{i + 1});' for i in range(100))
+    css_vars = variables(f':root {{ {chain} --v100: red }}')
+    assert css_vars.get('v90') == 'red'
+    assert css_vars.get('v0') is None
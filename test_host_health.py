@@ -0,0 +1,99 @@
+import pytest
+
+import host_health as host_health_module
+from host_health import FetchGuard, HostHealth
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(host_health_module.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_timeout_follows_p95_latency_and_halves_per_failure():
+    health = HostHealth(min_samples=5, min_timeout=0.5, timeout_factor=4)
+    assert health.timeout('a.com', 10) == 10
+    for _ in range(10):
+        health.success('a.com', 0.2)
+    assert health.timeout('a.com', 10) == pytest.approx(0.8)
+    health.failure('a.com')
+    assert health.timeout('a.com', 10) == pytest.approx(0.5)
+
+
+def test_breaker_opens_after_consecutive_failures_and_rejects(clock):
+    health = HostHealth(failure_threshold=3, open_seconds=30)
+    assert not health.failure('a.com')
+    assert not health.failure('a.com')
+    assert health.failure('a.com')
+    assert health.is_open('a.com')
+    assert health.allow('a.com') is None
+    assert health.stats()['rejected'] == 1
+
+
+def test_half_open_probe_closes_on_success(clock):
+    health = HostHealth(failure_threshold=1, open_seconds=30)
+    health.failure('a.com')
+    clock[0] += 31
+    assert health.allow('a.com') == 'half_open'
+    # Jen jeden zkušební požadavek najednou
+    assert health.allow('a.com') is None
+    health.success('a.com', 0.1)
+    assert health.allow('a.com') == 'closed'
+
+
+def test_failed_probe_reopens_for_double_time(clock):
+    health = HostHealth(failure_threshold=1, open_seconds=30)
+    health.failure('a.com')
+    clock[0] += 31
+    assert health.allow('a.com') == 'half_open'
+    assert health.failure('a.com')
+    clock[0] += 31
+    assert health.is_open('a.com')
+    clock[0] += 30
+    assert health.allow('a.com') == 'half_open'
+
+
+def test_released_probe_lets_next_request_probe(clock):
+    health = HostHealth(failure_threshold=1, open_seconds=30)
+    health.failure('a.com')
+    clock[0] += 31
+    assert health.allow('a.com') == 'half_open'
+    health.release('a.com')
+    assert health.allow('a.com') == 'half_open'
+
+
+def test_error_rate_opens_breaker():
+    health = HostHealth(min_samples=2, failure_threshold=100, max_error_rate=0.5)
+    opened = False
+    for _ in range(4):
+        health.success('a.com', 0.1)
+        opened = health.failure('a.com') or opened
+    assert opened
+
+
+def test_guard_retries_transient_errors_within_budget():
+    guard = FetchGuard(HostHealth(failure_threshold=100), deadline=30, retry_budget=2)
+    url = 'https://a.com/style.css'
+    assert guard.retry_delay(url, 0, guard.failed(url, 'timeout')) == pytest.approx(0.25)
+    assert guard.retry_delay(url, 1, guard.completed(url, 0.1, 503)) == pytest.approx(0.5)
+    assert guard.retry_delay(url, 2, 'timeout') is None
+    assert guard.report()['decisions'][-1]['retry'] == 'budget_exhausted'
+    assert guard.retry_delay(url, 0, guard.completed(url, 0.1, 404)) is None
+
+
+def test_guard_rejects_after_deadline(clock):
+    guard = FetchGuard(HostHealth(), deadline=5)
+    clock[0] += 6
+    with pytest.raises(Exception):
+        guard.admit('https://a.com/', 10)
+
+
+def test_abandoned_request_does_not_touch_host_health():
+    health = HostHealth(failure_threshold=1)
+    guard = FetchGuard(health, retry_budget=3)
+    guard.abandoned('https://a.com/', 'pool_timeout')
+    assert health.allow('a.com') == 'closed'
+    assert health.timeout('a.com', 10) == 10
+    assert guard.report()['retries'] == 0
+    assert guard.report()['decisions'] == [{'url': 'https://a.com/', 'decision': 'failed', 'reason': 'pool_timeout'}]
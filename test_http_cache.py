@@ -0,0 +1,103 @@
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from http_cache import HttpCache, freshness_lifetime, parse_cache_control
+
+
+def make_response(status=200, body=b'body', headers=None, url='https://a.com/style.css'):
+    response = requests.Response()
+    response.status_code = status
+    response.headers = CaseInsensitiveDict(headers or {})
+    response.url = url
+    response._content = body
+    response._content_consumed = True
+    return response
+
+
+class FakeSession:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url, timeout=None, headers=None, stream=False):
+        self.requests.append(dict(headers or {}))
+        return self.responses.pop(0)
+
+
+def test_parse_cache_control():
+    assert parse_cache_control('public, max-age=60, no-transform') == {
+        'public': True, 'max-age': '60', 'no-transform': True}
+
+
+def test_freshness_lifetime():
+    assert freshness_lifetime(CaseInsensitiveDict({'cache-control': 'max-age=60'})) == 60
+    assert freshness_lifetime(CaseInsensitiveDict({'cache-control': 'max-age=60, s-maxage=5'})) == 5
+    assert freshness_lifetime(CaseInsensitiveDict({'cache-control': 'no-store'})) is None
+    assert freshness_lifetime(CaseInsensitiveDict({'cache-control': 'private, max-age=60'})) is None
+    assert freshness_lifetime(CaseInsensitiveDict({'cache-control': 'no-cache'})) == 0
+    assert freshness_lifetime(CaseInsensitiveDict({'cache-control': 'max-age=60', 'vary': 'Cookie'})) is None
+    assert freshness_lifetime(CaseInsensitiveDict({'expires': 'Thu, 01 Jan 1970 00:00:00 GMT'})) == 0
+
+
+def test_fresh_entry_is_served_without_request():
+    cache = HttpCache()
+    session = FakeSession(make_response(headers={'cache-control': 'max-age=60'}))
+    first = cache.get(session, 'https://a.com/style.css', max_bytes=100)
+    second = cache.get(session, 'https://a.com/style.css', max_bytes=100)
+    assert not first.from_cache and second.from_cache
+    assert second.content == b'body'
+    assert len(session.requests) == 1
+    assert cache.stats()['hits'] == 1
+
+
+def test_stale_entry_is_revalidated_with_validators():
+    cache = HttpCache()
+    session = FakeSession(
+        make_response(headers={'cache-control': 'max-age=0', 'etag': '"v1"', 'last-modified': 'Mon, 01 Jan 2024'}),
+        make_response(status=304, body=b'', headers={'cache-control': 'max-age=60'}),
+    )
+    cache.get(session, 'https://a.com/style.css')
+    revalidated = cache.get(session, 'https://a.com/style.css')
+    assert session.requests[1] == {'If-None-Match': '"v1"', 'If-Modified-Since': 'Mon, 01 Jan 2024'}
+    assert revalidated.from_cache and revalidated.content == b'body'
+    assert cache.stats()['revalidations'] == 1
+    # Po revalidaci je záznam zase čerstvý
+    key, entry, cached = cache.lookup('https://a.com/style.css')
+    assert cached is not None
+
+
+def test_refresh_does_not_mutate_shared_entry():
+    cache = HttpCache()
+    cache.get(FakeSession(make_response(headers={'cache-control': 'max-age=0', 'etag': '"v1"'})),
+              'https://a.com/style.css')
+    key, entry, cached = cache.lookup('https://a.com/style.css')
+    snapshot = dict(entry, headers=dict(entry['headers']))
+    cache.not_modified(key, entry, make_response(status=304, headers={'cache-control': 'max-age=60', 'etag': '"v2"'}))
+    assert entry == snapshot
+    assert cache.lookup('https://a.com/style.css')[1]['headers']['etag'] == '"v2"'
+
+
+def test_uncacheable_and_truncated_responses_are_not_stored():
+    cache = HttpCache()
+    session = FakeSession(make_response(headers={'cache-control': 'no-store'}),
+                          make_response(body=b'x' * 50, headers={'cache-control': 'max-age=60'}, url='https://a.com/b'))
+    cache.get(session, 'https://a.com/style.css')
+    truncated = cache.get(session, 'https://a.com/b', max_bytes=10)
+    assert truncated.truncated and len(truncated.content) == 10
+    assert cache.stats()['entries'] == 0
+
+
+def test_lru_eviction_by_entry_count():
+    cache = HttpCache(max_entries=2)
+    for name in ('a', 'b', 'c'):
+        cache.get(FakeSession(make_response(headers={'cache-control': 'max-age=60'})), f'https://a.com/{name}')
+    assert cache.stats()['entries'] == 2 and cache.stats()['evictions'] == 1
+    assert cache.lookup('https://a.com/a')[1] is None
+
+
+def test_disk_layer_survives_restart(tmp_path):
+    cache = HttpCache(directory=str(tmp_path))
+    cache.get(FakeSession(make_response(headers={'cache-control': 'max-age=60'})), 'https://a.com/style.css')
+    reopened = HttpCache(directory=str(tmp_path))
+    key, entry, cached = reopened.lookup('https://a.com/style.css')
+    assert cached is not None and cached.content == b'body'
@@ -0,0 +1,30 @@
+from http_pool import ConnectionPool
+
+
+def test_host_adapter_matches_only_exact_host():
+    pool = ConnectionPool(host_pool_sizes={'cdn.example.com': 4})
+    session = pool.session()
+    host_adapter = pool.host_adapters['cdn.example.com']
+    assert session.get_adapter('https://cdn.example.com/lib.css') is host_adapter
+    assert session.get_adapter('https://cdn.example.com.evil.com/lib.css') is pool.default_adapter
+    assert session.get_adapter('https://example.com/') is pool.default_adapter
+
+
+def test_sessions_share_adapters():
+    pool = ConnectionPool()
+    assert pool.session().get_adapter('https://a.com/') is pool.session().get_adapter('https://b.com/')
+
+
+def test_stats_keep_counts_of_evicted_pools():
+    pool = ConnectionPool(pool_connections=1)
+    manager = pool.default_adapter.poolmanager
+    first = manager.connection_from_url('https://a.com/')
+    first.num_requests, first.num_connections = 5, 2
+    # Pool druhého hostitele vytlačí první (pool_connections=1)
+    second = manager.connection_from_url('https://b.com/')
+    second.num_requests, second.num_connections = 1, 1
+    stats = pool.stats()
+    assert stats['hosts']['a.com'] == {'requests': 5, 'connections': 2, 'misses': 2, 'hits': 3}
+    assert stats['requests'] == 6
+    pool.close()
+    assert pool.stats()['requests'] == 6
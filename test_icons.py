@@ -0,0 +1,105 @@
+from io import BytesIO
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+import icons
+from icons import ImageCache, analyze_image, pixel_stats
+
+
+def encode(image, format, **kwargs):
+    output = BytesIO()
+    image.save(output, format, **kwargs)
+    return output.getvalue()
+
+
+def logo(size=32, background=(255, 255, 255, 255), color=(220, 20, 60, 255)):
+    """Čtverec s barevným kruhem uprostřed"""
+    image = Image.new('RGBA', (size, size), background)
+    ImageDraw.Draw(image).ellipse((size // 4, size // 4, size * 3 // 4, size * 3 // 4), fill=color)
+    return image
+
+
+def test_png_with_background_and_motif():
+    info = analyze_image(encode(logo(), 'PNG'))
+    assert (info['format'], info['width'], info['height']) == ('png', 32, 32)
+    assert info['background_color'] == '#ffffff'
+    assert info['dominant_color'] == '#dc143c'
+    assert not info['transparent']
+
+
+def test_transparent_png_has_no_background():
+    info = analyze_image(encode(logo(background=(0, 0, 0, 0)), 'PNG'))
+    assert info['transparent'] and info['transparent_ratio'] > 0.5
+    assert info['background_color'] is None
+    assert info['dominant_color'] == '#dc143c'
+
+
+def test_ico_reports_contained_sizes():
+    info = analyze_image(encode(logo(64), 'ICO', sizes=[(16, 16), (32, 32), (64, 64)]))
+    assert info['format'] == 'ico'
+    assert info['sizes'] == ['16x16', '32x32', '64x64']
+    assert info['width'] == 64
+    assert info['dominant_color'] == '#dc143c'
+
+
+def test_large_jpeg_is_decoded_downscaled():
+    image = Image.new('RGB', (1024, 768), (10, 120, 200))
+    info = analyze_image(encode(image, 'JPEG', quality=95))
+    assert (info['format'], info['width'], info['height']) == ('jpeg', 1024, 768)
+    red, green, blue = (int(info['background_color'][i:i + 2], 16) for i in (1, 3, 5))
+    assert abs(red - 10) <= 3 and abs(green - 120) <= 3 and abs(blue - 200) <= 3
+
+
+@pytest.mark.parametrize('content', [
+    b'<svg xmlns="http://www.w3.org/2000/svg"></svg>',
+    b'  <?xml version="1.0"?>\n<svg xmlns="http://www.w3.org/2000/svg"/>',
+])
+def test_svg_returns_format_only(content):
+    assert analyze_image(content) == {'format': 'svg', 'width': None, 'height': None}
+
+
+@pytest.mark.parametrize('content', [b'', b'<html>not an image</html>', b'\x89PNG\r\n\x1a\n truncated'])
+def test_invalid_content_returns_none(content):
+    assert analyze_image(content) is None
+
+
+def test_pixel_stats_on_array():
+    rgba = np.zeros((4, 4, 4), dtype=np.uint8)
+    rgba[..., 3] = 255
+    rgba[1:3, 1:3, :3] = (0, 0, 255)
+    stats = pixel_stats(rgba)
+    assert stats['background_color'] == '#000000'
+    assert stats['dominant_color'] == '#0000ff'
+    assert stats['transparent_ratio'] == 0
+
+
+def test_cache_returns_same_result_without_decoding_again(monkeypatch):
+    calls = []
+    real_analyze = icons.analyze_image
+
+    def counting(content):
+        calls.append(len(content))
+        return real_analyze(content)
+
+    monkeypatch.setattr(icons, 'analyze_image', counting)
+    cache = ImageCache()
+    content = encode(logo(), 'PNG')
+    first = cache.analyze(content)
+    second = cache.analyze(content)
+    assert first == second and first['sha256'] and len(calls) == 1
+    second['format'] = 'changed'
+    assert cache.analyze(content)['format'] == 'png'
+    assert cache.stats() == {'hits': 2, 'misses': 1, 'entries': 1}
+
+
+def test_cache_skips_invalid_images_and_evicts_oldest():
+    cache = ImageCache(max_entries=1)
+    assert cache.analyze(b'junk') is None
+    first, second = encode(logo(color=(0, 128, 0, 255)), 'PNG'), encode(logo(), 'PNG')
+    cache.analyze(first)
+    cache.analyze(second)
+    assert cache.stats()['entries'] == 1
+    cache.analyze(first)
+    assert cache.stats()['misses'] == 4
@@ -0,0 +1,125 @@
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import pytest
+
+from jobs import JobQueue, MemoryJobStore, QueueFull, SqliteJobStore, create_job_store
+from scraper import ANALYSIS_STAGES
+
+
+class FakeAnalyzer:
+    def __init__(self, url, gate=None):
+        self.url = url
+        self.gate = gate
+
+    def analyze(self, progress=None):
+        if self.gate is not None:
+            self.gate.wait(5)
+        if 'fail' in self.url:
+            raise RuntimeError('unreachable')
+        for stage in ANALYSIS_STAGES[:2]:
+            progress(stage)
+        return {'url': self.url}
+
+
+def wait_for(queue, job_id, status):
+    deadline = time.time() + 5
+    while queue.get(job_id)['status'] != status and time.time() < deadline:
+        time.sleep(0.01)
+    return queue.get(job_id)
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def store(request, tmp_path):
+    return MemoryJobStore() if request.param == 'memory' else SqliteJobStore(str(tmp_path / 'jobs.db'))
+
+
+def test_job_runs_to_done_with_progress(store):
+    results = []
+    queue = JobQueue(store, FakeAnalyzer, workers=1, on_result=lambda url, result: results.append(url))
+    job = wait_for(queue, queue.submit('https://a.com/'), 'done')
+    assert job['result'] == {'url': 'https://a.com/'}
+    assert job['stages'] == ANALYSIS_STAGES[:2]
+    assert job['progress'] == round(2 / len(ANALYSIS_STAGES), 2)
+    assert results == ['https://a.com/']
+
+
+def test_failed_job_records_error(store):
+    queue = JobQueue(store, FakeAnalyzer, workers=1)
+    job = wait_for(queue, queue.submit('https://fail.com/'), 'error')
+    assert job['error'] == 'unreachable' and job['result'] is None
+
+
+def test_queue_rejects_beyond_max_pending():
+    gate = threading.Event()
+    queue = JobQueue(MemoryJobStore(), lambda url: FakeAnalyzer(url, gate), workers=1, max_pending=2)
+    first = queue.submit('https://a.com/')
+    queue.submit('https://b.com/')
+    with pytest.raises(QueueFull):
+        queue.submit('https://c.com/')
+    gate.set()
+    wait_for(queue, first, 'done')
+    deadline = time.time() + 5
+    while queue._pending and time.time() < deadline:
+        time.sleep(0.01)
+    queue.submit('https://c.com/')
+
+
+def test_memory_store_forgets_oldest_finished_jobs_only():
+    store = MemoryJobStore(max_jobs=2)
+    store.create({'id': 'running', 'status': 'running'})
+    store.create({'id': 'done', 'status': 'done'})
+    store.create({'id': 'new', 'status': 'queued'})
+    assert store.get('done') is None
+    assert store.get('running') is not None and store.get('new') is not None
+
+
+def test_unknown_job_and_store_spec(tmp_path):
+    assert JobQueue(MemoryJobStore(), FakeAnalyzer).get('missing') is None
+    assert isinstance(create_job_store(None), MemoryJobStore)
+    assert isinstance(create_job_store(f'sqlite:///{tmp_path}/jobs.db'), SqliteJobStore)
+
+
+def test_custom_task_reports_progress_against_total(store):
+    results = []
+    queue = JobQueue(store, FakeAnalyzer, workers=1, on_result=lambda url, result: results.append(url))
+
+    def crawl(progress):
+        for page in ('https://a.com/', 'https://a.com/b'):
+            progress(page)
+        return {'pages': 2}
+
+    job = wait_for(queue, queue.submit('https://a.com/', crawl, kind='crawl', total=4), 'done')
+    assert job['kind'] == 'crawl' and job['result'] == {'pages': 2}
+    assert job['progress'] == 0.5 and 'all_stages' not in job
+    assert results == []
+
+
+def test_sqlite_store_adds_columns_to_old_database(tmp_path):
+    path = str(tmp_path / 'jobs.db')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE jobs (id TEXT PRIMARY KEY, url TEXT, status TEXT, stages TEXT, result TEXT, '
+                 'error TEXT, created_at REAL, updated_at REAL)')
+    conn.execute("INSERT INTO jobs VALUES ('old', 'https://a.com/', 'done', '[]', 'null', NULL, 0, 0)")
+    conn.commit()
+    conn.close()
+    queue = JobQueue(SqliteJobStore(path), FakeAnalyzer)
+    assert queue.get('old')['kind'] == 'analysis'
+    job = wait_for(queue, queue.submit('https://a.com/'), 'done')
+    assert job['kind'] == 'analysis' and job['all_stages'] == ANALYSIS_STAGES
+
+
+def test_analysis_jobs_run_inside_admission(store):
+    clients = []
+
+    @contextmanager
+    def admit(client):
+        clients.append(client)
+        yield
+
+    queue = JobQueue(store, FakeAnalyzer, workers=1, admit=admit)
+    wait_for(queue, queue.submit('https://a.com/', client='1.2.3.4'), 'done')
+    wait_for(queue, queue.submit('https://a.com/', lambda progress: {}, kind='crawl'), 'done')
+    assert clients == ['1.2.3.4']
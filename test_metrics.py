@@ -0,0 +1,80 @@
+import time
+
+import app as app_module
+from metrics import ANALYSIS_SECONDS, AnalysisMetrics, Registry
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    histogram = registry.histogram('latency_seconds', 'Latence', ['route'], buckets=(0.1, 1))
+    for value in (0.05, 0.5, 0.5, 3):
+        histogram.observe(value, route='/a')
+    assert registry.render().splitlines() == [
+        '# HELP latency_seconds Latence',
+        '# TYPE latency_seconds histogram',
+        'latency_seconds_bucket{route="/a",le="0.1"} 1.0',
+        'latency_seconds_bucket{route="/a",le="1.0"} 3.0',
+        'latency_seconds_bucket{route="/a",le="+Inf"} 4.0',
+        'latency_seconds_sum{route="/a"} 4.05',
+        'latency_seconds_count{route="/a"} 4.0',
+    ]
+
+
+def test_render_counters_gauges_and_label_escaping():
+    registry = Registry()
+    counter = registry.counter('requests', 'Požadavky', ['stage', 'cache'])
+    gauge = registry.gauge('in_flight', 'Rozpracované')
+    counter.inc(stage='css', cache='hit')
+    counter.inc(2, stage='css', cache='hit')
+    counter.inc(stage='a"b\\c\nd')
+    gauge.set(7)
+    lines = registry.render().splitlines()
+    assert lines[:2] == ['# HELP requests Požadavky', '# TYPE requests counter']
+    assert 'requests_total{stage="css",cache="hit"} 3.0' in lines
+    assert 'requests_total{stage="a\\"b\\\\c\\nd",cache=""} 1.0' in lines
+    assert lines[-3:] == ['# HELP in_flight Rozpracované', '# TYPE in_flight gauge', 'in_flight 7.0']
+    assert registry.render().endswith('\n')
+
+
+def test_stage_measures_time_and_attributes_requests():
+    metrics = AnalysisMetrics()
+    with metrics.stage('page'):
+        time.sleep(0.02)
+        metrics.record_request(100)
+        with metrics.stage('css'):
+            metrics.record_request(50, from_cache=True)
+        metrics.record_request(10)
+    metrics.record_request(5)
+    with metrics.stage('page'):
+        time.sleep(0.01)
+    metrics.finish()
+    report = metrics.report()
+    assert set(report['stages']) == {'page', 'css', 'other'}
+    page = report['stages']['page']
+    assert page['wall_ms'] >= 30 and page['requests'] == 2 and page['bytes'] == 110
+    assert report['stages']['css']['cache_hits'] == 1
+    assert (report['requests'], report['bytes'], report['cache_hits']) == (4, 165, 1)
+    assert report['total_ms'] >= page['wall_ms']
+    assert 'peak_memory' not in page
+
+
+def test_trace_memory_reports_peak_per_stage():
+    metrics = AnalysisMetrics(trace_memory=True)
+    with metrics.stage('alloc'):
+        data = bytearray(1024 * 1024)
+        del data
+    metrics.finish()
+    assert metrics.report()['stages']['alloc']['peak_memory'] >= 1024 * 1024
+
+
+def test_finish_feeds_global_histogram_and_metrics_endpoint():
+    before = ANALYSIS_SECONDS._values.get(('error',), [None, 0.0, 0])[2]
+    AnalysisMetrics().finish('error')
+    assert ANALYSIS_SECONDS._values[('error',)][2] == before + 1
+    response = app_module.app.test_client().get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    assert 'version=0.0.4' in response.headers['Content-Type']
+    body = response.get_data(as_text=True)
+    assert '# TYPE webanalyzer_analysis_seconds histogram' in body
+    assert f'webanalyzer_analysis_seconds_count{{status="error"}} {float(before + 1)}' in body
@@ -0,0 +1,61 @@
+from page_meta import PageMeta
+
+
+def parse(html, encoding='utf-8'):
+    return PageMeta.parse(html.encode(encoding))
+
+
+def test_title_and_h1_text_include_nested_tags_and_tails():
+    page = parse('<html><head><title> Shop <b>Best</b> prices </title></head>'
+                 '<body><h1><a href="/">Home</a> <em>of</em> design</h1><h1>Second</h1></body></html>')
+    # Stejně jako get_text(strip=True): části textu se oříznou a spojí
+    assert page.title == 'ShopBestprices'
+    assert page.h1 == 'Homeofdesign'
+
+
+def test_meta_link_and_style_in_head_and_body():
+    page = parse('<html><head><meta name="description" content="About"><link rel="Stylesheet" href="/a.css">'
+                 '<style>a { color: red }</style></head><body><link rel="icon apple-touch-icon" href="/i.png">'
+                 '<style>b { color: blue }</style></body></html>')
+    assert page.find_meta(name='description')['content'] == 'About'
+    assert [link['href'] for link in page.links] == ['/a.css', '/i.png']
+    assert page.links[1]['rel'] == ['icon', 'apple-touch-icon']
+    assert [link['href'] for link in page.find_links('stylesheet')] == ['/a.css']
+    assert [link['href'] for link in page.find_links('apple-touch-icon')] == ['/i.png']
+    assert page.styles == ['a { color: red }', 'b { color: blue }']
+
+
+def test_inline_styles_and_body_style():
+    page = parse('<html><body style="margin: 0"><div style="color: red"><p style="font-family: Inter">x</p></div>'
+                 '</body></html>')
+    assert page.inline_styles == [('p', 'font-family: Inter'), ('div', 'color: red'), ('body', 'margin: 0')]
+    assert page.body_style == 'margin: 0'
+
+
+def test_anchors_survive_clearing_of_processed_subtrees():
+    sections = ''.join(f'<section><div><p>Intro {i} <a href="/p{i}" class="x y">Link <b>{i}</b></a> tail</p>'
+                       f'</div></section>' for i in range(50))
+    page = parse(f'<html><body>{sections}<nav><a href="/last"><span>Last</span> page</a><a>no href</a></nav>'
+                 '</body></html>')
+    assert len(page.anchors) == 51
+    assert page.anchors[7] == {'href': '/p7', 'class': ['x', 'y'], 'text': 'Link7'}
+    assert page.anchors[-1] == {'href': '/last', 'text': 'Lastpage'}
+
+
+def test_non_utf8_document():
+    html = '<html><head><meta charset="windows-1250"><title>Žluťoučký kůň</title></head><body></body></html>'
+    assert parse(html, 'windows-1250').title == 'Žluťoučký kůň'
+
+
+def test_malformed_markup_is_recovered():
+    page = parse('<html><head><title>Broken</head><body><div><h1>Head<p>para</div></span>'
+                 '<a href="/x">X<a href="/y">Y</body>')
+    assert page.title == 'Broken'
+    assert page.h1.startswith('Head')
+    assert [anchor['href'] for anchor in page.anchors] == ['/x', '/y']
+
+
+def test_empty_and_binary_content():
+    assert PageMeta.parse(b'').title is None
+    page = PageMeta.parse(b'\x00\xff\xfe garbage <<<')
+    assert page.anchors == [] and page.h1 is None
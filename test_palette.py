@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from css_index import CssIndex
+from palette import collect_colors, extract_palette, parse_color, parse_colors, to_hex
+
+
+def index(css):
+    instance = CssIndex()
+    instance.add_source(css)
+    return instance
+
+
+def test_parse_color_formats():
+    assert parse_color('#fff') == pytest.approx((1, 1, 1, 1))
+    assert parse_color('#ff000080') == pytest.approx((1, 0, 0, 128 / 255))
+    assert parse_color('rgb(0 128 255 / 50%)') == pytest.approx((0, 128 / 255, 1, 0.5))
+    assert parse_color('hsl(120, 100%, 50%)') == pytest.approx((0, 1, 0, 1))
+    assert parse_color('navy') == pytest.approx((0, 0, 128 / 255, 1))
+    assert parse_color('rgb(') is None
+
+
+def test_unclosed_function_does_not_swallow_following_values():
+    weights = collect_colors(index('a { color: rgb(1, 2 } b { color: #123456 } c { color: rgb(10, 20, 30) }'))
+    assert weights['#123456'] == 3.0
+    assert weights['rgb(10, 20, 30)'] == 3.0
+    assert not any(token.startswith('rgb(1,') for token in weights)
+
+
+def test_multiline_function_is_one_token():
+    weights = collect_colors(index('a { color: rgba(10,\n20, 30, 1) }'))
+    rgb, _ = parse_colors(weights)
+    assert [to_hex(color) for color in rgb] == ['#0a141e']
+
+
+def test_property_and_reference_weights():
+    weights = collect_colors(index(':root { --brand: #ff0000 } a { color: var(--brand); box-shadow: 0 0 1px #000 }'))
+    assert weights['#000'] == 0.5
+    assert weights['#ff0000'] > weights['#000']
+
+
+def test_parse_colors_merges_equal_colors_and_drops_transparent():
+    rgb, weights = parse_colors({'#ff0000': 1, 'rgb(255, 0, 0)': 2, 'red': 1, '#00ff0000': 5})
+    assert [to_hex(color) for color in rgb] == ['#ff0000']
+    assert weights.tolist() == [4]
+
+
+def test_extract_palette_orders_by_share():
+    palette = extract_palette(index('a { color: #3366ff } b { color: #3366ff } i { border-color: #ff9900 }'), k=2)
+    assert [entry['color'] for entry in palette] == ['#3366ff', '#ff9900']
+    assert sum(entry['share'] for entry in palette) == pytest.approx(1)
+    assert np.isclose(palette[0]['share'], 6 / 7.5, atol=1e-3)
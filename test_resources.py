@@ -0,0 +1,118 @@
+import threading
+import time
+
+import pytest
+
+from ingest import ByteBudget, DeadlineExceeded, read_body
+from resources import FetchStage, ResourceGraph
+
+
+class FakePage:
+    def __init__(self, styles=(), links=()):
+        self.styles = list(styles)
+        self.links = list(links)
+
+
+class FakeResponse:
+    def __init__(self, chunks, delay=0.0):
+        self.chunks = chunks
+        self.delay = delay
+        self.closed = False
+
+    def iter_content(self, size):
+        for chunk in self.chunks:
+            time.sleep(self.delay)
+            yield chunk
+
+    def close(self):
+        self.closed = True
+
+
+def test_fetch_stage_limits_connections_per_host():
+    lock = threading.Lock()
+    active = {'count': 0, 'peak': 0}
+
+    def fetch(url, timeout):
+        with lock:
+            active['count'] += 1
+            active['peak'] = max(active['peak'], active['count'])
+        time.sleep(0.02)
+        with lock:
+            active['count'] -= 1
+        return url
+
+    done = []
+    stage = FetchStage(max_workers=8, per_host_limit=2, deadline=5)
+    skipped = stage.run([(f'https://a.com/{i}', fetch, done.append) for i in range(6)])
+    assert skipped == [] and len(done) == 6
+    assert active['peak'] == 2
+
+
+def test_fetch_stage_passes_remaining_time_and_reports_late_tasks():
+    timeouts = []
+
+    def fetch(url, timeout):
+        timeouts.append(timeout)
+        time.sleep(timeout + 0.3 if url.endswith('slow') else 0)
+        return url
+
+    stage = FetchStage(deadline=0.2)
+    started = time.monotonic()
+    skipped = stage.run([('https://a.com/slow', fetch, lambda result: None),
+                         ('https://b.com/fast', fetch, lambda result: None)])
+    assert time.monotonic() - started < 1
+    assert skipped == ['https://a.com/slow']
+    assert all(timeout <= 0.2 for timeout in timeouts)
+
+
+def test_read_body_stops_at_deadline():
+    response = FakeResponse([b'x' * 10] * 10, delay=0.05)
+    with pytest.raises(DeadlineExceeded):
+        read_body(response, 1000, deadline=time.monotonic() + 0.12)
+    assert response.closed
+
+
+def test_read_body_truncates_at_limit():
+    response = read_body(FakeResponse([b'a' * 6, b'b' * 6]), 8)
+    assert response._content == b'a' * 6 + b'bb'
+    assert response.truncated == 'asset_limit' and response.closed
+
+
+def test_read_body_charges_budget_per_chunk():
+    budget = ByteBudget(max_asset_bytes=100, max_total_bytes=10)
+    response = read_body(FakeResponse([b'a' * 6, b'b' * 6]), 100, budget=budget)
+    assert response._content == b'a' * 6 + b'bbbb'
+    assert response.truncated == 'analysis_budget' and response.closed
+    assert budget.used == 10 and budget.exhausted()
+
+
+def test_byte_budget_charges_only_what_fits():
+    budget = ByteBudget(max_asset_bytes=10, max_total_bytes=15)
+    assert budget.charge(10) == 10
+    assert budget.charge(10) == 5
+    assert budget.charge(1) == 0
+    budget.settle('https://a.com/1', 5, 'analysis_budget')
+    budget.settle('https://a.com/2', 3, False)
+    assert budget.used == 15
+    assert budget.truncated == [{'url': 'https://a.com/1', 'bytes': 5, 'reason': 'analysis_budget'}]
+
+
+def test_graph_prefetches_links_and_imports_once():
+    fetched = []
+    sheets = {
+        'https://a.com/main.css': '@import "base.css"; body { color: red }',
+        'https://a.com/base.css': '@import url(base.css); html { margin: 0 }',
+    }
+
+    def fetch(url, timeout=10):
+        fetched.append(url)
+        return {'url': url, 'final_url': url, 'text': sheets.get(url, '')}
+
+    graph = ResourceGraph(fetch, stage=FetchStage(deadline=5))
+    page = FakePage(links=[{'rel': ['stylesheet'], 'href': '/main.css'}])
+    graph.prefetch(page, 'https://a.com/')
+    assert sorted(fetched) == ['https://a.com/base.css', 'https://a.com/main.css']
+    sources = [source['content'] for source in graph.iter_sources(page, 'https://a.com/')]
+    # Importovaný styl předchází stylu, který ho importuje
+    assert sources == [sheets['https://a.com/base.css'], sheets['https://a.com/main.css']]
+    assert len(fetched) == 2
@@ -0,0 +1,132 @@
+import threading
+import time
+
+import pytest
+
+import result_cache as result_cache_module
+from result_cache import ResultCache, normalize_url
+
+
+class FakeAnalyzer:
+    """Analýza, která počítá svá spuštění a vrací otisk zadaný testem"""
+
+    def __init__(self, url, calls, fingerprint='v1', delay=0, error=None):
+        self.base_url = url
+        self.calls = calls
+        self._fingerprint = fingerprint
+        self.delay = delay
+        self.error = error
+
+    def fingerprint(self):
+        return self._fingerprint
+
+    def analyze(self):
+        self.calls.append(self.base_url)
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return {'url': self.base_url, 'run': len(self.calls)}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(result_cache_module.time, 'time', lambda: now[0])
+    return now
+
+
+def test_normalize_url():
+    assert normalize_url('HTTPS://Example.COM:443') == 'https://example.com/'
+    assert normalize_url('http://example.com:8080/a?b#c') == 'http://example.com:8080/a?b'
+
+
+def test_hit_within_ttl_and_miss_after(clock):
+    cache = ResultCache(ttl=60, revalidate=False)
+    calls = []
+    make = lambda: FakeAnalyzer('https://a.com/', calls)
+    assert cache.get_or_analyze('https://a.com', make)[1] == 'miss'
+    assert cache.get_or_analyze('https://A.com/', make)[1] == 'hit'
+    clock[0] += 61
+    assert cache.get_or_analyze('https://a.com/', make)[1] == 'miss'
+    assert len(calls) == 2
+
+
+def test_expired_entry_is_revalidated_by_fingerprint(clock):
+    cache = ResultCache(ttl=60)
+    calls = []
+    first, _ = cache.get_or_analyze('https://a.com/', lambda: FakeAnalyzer('https://a.com/', calls))
+    clock[0] += 61
+    result, status = cache.get_or_analyze('https://a.com/', lambda: FakeAnalyzer('https://a.com/', calls))
+    assert status == 'revalidated' and result is first and len(calls) == 1
+    clock[0] += 61
+    changed = lambda: FakeAnalyzer('https://a.com/', calls, fingerprint='v2')
+    assert cache.get_or_analyze('https://a.com/', changed)[1] == 'miss'
+
+
+def test_refresh_and_variants_bypass_entry():
+    cache = ResultCache()
+    calls = []
+    make = lambda: FakeAnalyzer('https://a.com/', calls)
+    cache.get_or_analyze('https://a.com/', make)
+    assert cache.get_or_analyze('https://a.com/', make, refresh=True)[1] == 'miss'
+    assert cache.get_or_analyze('https://a.com/', make, variant='title')[1] == 'miss'
+    assert cache.peek('https://a.com/', 'title') is not None
+    assert len(calls) == 3
+
+
+def test_final_url_after_redirect_is_cached_too():
+    cache = ResultCache()
+    cache.get_or_analyze('http://a.com/', lambda: FakeAnalyzer('https://www.a.com/', []))
+    assert cache.peek('https://www.a.com/') is not None
+
+
+def test_concurrent_requests_share_one_analysis():
+    cache = ResultCache()
+    calls = []
+    statuses = []
+
+    def request():
+        statuses.append(cache.get_or_analyze('https://a.com/', lambda: FakeAnalyzer('https://a.com/', calls,
+                                                                                     delay=0.1))[1])
+
+    threads = [threading.Thread(target=request) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert len(calls) == 1
+    assert sorted(statuses) == ['coalesced'] * 4 + ['miss']
+    assert cache.stats()['in_flight'] == 0
+
+
+def test_error_reaches_waiters_and_is_not_cached():
+    cache = ResultCache()
+    make = lambda: FakeAnalyzer('https://a.com/', [], error=RuntimeError('boom'))
+    with pytest.raises(RuntimeError):
+        cache.get_or_analyze('https://a.com/', make)
+    assert cache.peek('https://a.com/') is None
+
+
+def test_admit_wraps_only_real_analysis():
+    cache = ResultCache()
+    admitted = []
+
+    class Slot:
+        def __enter__(self):
+            admitted.append(True)
+
+        def __exit__(self, *exc):
+            return False
+
+    make = lambda: FakeAnalyzer('https://a.com/', [])
+    cache.get_or_analyze('https://a.com/', make, admit=Slot)
+    cache.get_or_analyze('https://a.com/', make, admit=Slot)
+    assert admitted == [True]
+
+
+def test_lru_limit():
+    cache = ResultCache(max_entries=2)
+    for host in ('a', 'b', 'c'):
+        cache.get_or_analyze(f'https://{host}.com/', lambda: FakeAnalyzer(f'https://{host}.com/', []))
+    assert cache.peek('https://a.com/') is None
+    assert cache.stats()['entries'] == 2
@@ -0,0 +1,166 @@
+import io
+import threading
+import time
+
+import pytest
+import requests
+from PIL import Image
+from requests.structures import CaseInsensitiveDict
+
+from host_health import HostHealth
+from scraper import FIELDS, WebAnalyzer, parse_fields
+
+
+class SlowBody(io.BytesIO):
+    """Tělo odpovědi, jehož čtení chvíli trvá, aby se stahování překrývala"""
+
+    def __init__(self, data, delay):
+        super().__init__(data)
+        self.delay = delay
+
+    def read(self, *args, **kwargs):
+        time.sleep(self.delay)
+        return super().read(*args, **kwargs)
+
+
+class FakeSession:
+    """Odpovídá z připraveného slovníku URL -> (typ, tělo) a zaznamenává požadavky a souběh"""
+
+    def __init__(self, site, delay=0.0):
+        self.site = site
+        self.delay = delay
+        self.headers = {}
+        self.requested = []
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def get(self, url, timeout=None, headers=None, stream=False):
+        with self._lock:
+            self.requested.append(url)
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            time.sleep(self.delay)
+        finally:
+            with self._lock:
+                self.active -= 1
+        response = requests.Response()
+        response.url = url
+        content_type, body = self.site.get(url, ('text/plain', b''))
+        response.status_code = 200 if url in self.site else 404
+        response.headers = CaseInsensitiveDict({'Content-Type': content_type})
+        response.raw = SlowBody(body, self.delay)
+        response.encoding = 'utf-8'
+        return response
+
+
+def page(head='', body=''):
+    return 'text/html', f'<html><head><title>Test</title>{head}</head><body>{body}</body></html>'.encode()
+
+
+def stylesheet_site(count, size=100):
+    hosts = ['a.test', 'b.test', 'c.test', 'd.test']
+    urls = [f'https://{hosts[i % len(hosts)]}/s{i}.css' for i in range(count)]
+    links = ''.join(f'<link rel="stylesheet" href="{url}">' for url in urls)
+    site = {'https://example.test/': page(head=links)}
+    for i, url in enumerate(urls):
+        css = f'.s{i} {{ color: #{i:06x} }}'
+        site[url] = ('text/css', (css + ' ' * (size - len(css))).encode())
+    return site, urls
+
+
+def analyzer(site, delay=0.0, **kwargs):
+    instance = WebAnalyzer('https://example.test/', health=HostHealth(), **kwargs)
+    instance.session = FakeSession(site, delay)
+    return instance
+
+
+def test_concurrent_stylesheets_share_budget_by_bytes_read():
+    site, urls = stylesheet_site(10)
+    instance = analyzer(site, delay=0.05)
+    instance.fetch_page()
+    instance.fetch_inputs()
+    assert instance.session.peak > 5
+    assert len(instance.get_css_sources()) == 10
+    assert instance.budget.truncated == []
+    assert instance.budget.used == len(site['https://example.test/'][1]) + 10 * 100
+
+
+def test_exhausted_total_budget_truncates_and_skips():
+    site, urls = stylesheet_site(6)
+    page_size = len(site['https://example.test/'][1])
+    instance = analyzer(site, max_total_bytes=page_size + 250, fields='fonts')
+    instance.resources.stage.max_workers = 1
+    instance.fetch_page()
+    instance.fetch_inputs()
+    truncated = instance.budget.truncated
+    assert instance.budget.used == page_size + 250
+    assert {entry['reason'] for entry in truncated} == {'analysis_budget'}
+    assert sorted(entry['bytes'] for entry in truncated) == [0, 0, 0, 50]
+    assert {entry['url'] for entry in truncated} == set(urls[2:])
+
+
+def test_asset_limit_is_reported_as_asset_limit():
+    site, urls = stylesheet_site(1, size=300)
+    instance = analyzer(site, max_asset_bytes=1000)
+    instance.fetch_page()
+    instance.budget.max_asset_bytes = 120
+    instance.fetch_inputs()
+    assert instance.budget.truncated == [{'url': urls[0], 'bytes': 120, 'reason': 'asset_limit'}]
+
+
+def png_bytes(size=(32, 32), color=(200, 30, 30)):
+    output = io.BytesIO()
+    Image.new('RGB', size, color).save(output, 'PNG')
+    return output.getvalue()
+
+
+def icon_and_css_site():
+    site = {
+        'https://example.test/': page(head='<link rel="icon" href="/icon.png"><link rel="stylesheet" href="/s.css">',
+                                      body='<h1>Hello</h1><a href="/about">About</a>'),
+        'https://example.test/icon.png': ('image/png', png_bytes()),
+        'https://example.test/s.css': ('text/css', b'body { font-family: Inter; color: #123456 }'),
+    }
+    return site
+
+
+def requested_paths(instance):
+    return sorted(url[len('https://example.test'):] for url in instance.session.requested)
+
+
+def test_parse_fields_orders_and_rejects_unknown():
+    assert parse_fields('links, title') == ['title', 'links']
+    assert parse_fields(None) == FIELDS
+    with pytest.raises(Exception):
+        parse_fields('title,nonsense')
+
+
+@pytest.mark.parametrize('fields, paths', [
+    ('title,description,links', ['/']),
+    ('icons', ['/', '/icon.png']),
+    ('fonts,colors', ['/', '/s.css']),
+    (None, ['/', '/icon.png', '/s.css']),
+])
+def test_field_subset_fetches_only_required_inputs(fields, paths):
+    instance = analyzer(icon_and_css_site(), fields=fields)
+    result = instance.analyze()
+    assert requested_paths(instance) == paths
+    assert [field for field in FIELDS if field in result] == parse_fields(fields)
+
+
+def test_stream_yields_requested_fields_cheapest_first():
+    instance = analyzer(icon_and_css_site(), fields='fonts,icons,title')
+    assert [field for field, value in instance.stream()] == ['page', 'title', 'icons', 'fonts']
+
+
+def test_timings_section_lists_stages():
+    site, urls = stylesheet_site(2)
+    result = analyzer(site, timings=True, fields='title,colors').analyze()
+    timings = result['timings']
+    assert {'page', 'colors'} <= set(timings['stages'])
+    assert timings['stages']['page']['requests'] == 1
+    assert timings['requests'] == 3
+    assert all('peak_memory' in stage for stage in timings['stages'].values())
+    assert 'timings' not in analyzer(site, fields='title').analyze()
@@ -0,0 +1,114 @@
+import io
+import time
+
+import numpy as np
+import pytest
+
+import store
+from store import ResultStore, create_result_store, diff_results, parse_time
+
+
+def result(title='Example', fonts=('Inter',), primary='#3366ff', links=()):
+    return {
+        'title': title,
+        'fonts': {'names': list(fonts)},
+        'colors': {'primary': primary, 'palette': [{'color': primary, 'share': 0.5}]},
+        'icons': {'images': [{'url': 'https://example.com/icon.png', 'sha256': 'abc123'}]},
+        'links': list(links),
+    }
+
+
+@pytest.fixture
+def result_store(tmp_path):
+    instance = ResultStore(str(tmp_path / 'results.db'), flush_interval=0.01)
+    yield instance
+    instance.close()
+
+
+def test_create_result_store_is_off_without_path(tmp_path):
+    assert create_result_store(None) is None
+    assert create_result_store('off') is None
+    instance = create_result_store(str(tmp_path / 'store.db'))
+    assert isinstance(instance, ResultStore)
+    instance.close()
+
+
+def test_indexes_fonts_domains_icons_and_colors(result_store):
+    result_store.add('https://www.example.com/', result())
+    result_store.add('https://other.org/', result(fonts=('Roboto',), primary='#ff0000'))
+    result_store.flush()
+    assert [site['url'] for site in result_store.find_by_font('inter')] == ['https://www.example.com/']
+    assert [site['domain'] for site in result_store.find_by_domain('example.com')] == ['example.com']
+    assert len(result_store.find_by_icon('ABC123')) == 2
+    matches = result_store.find_by_color('#3366fe', max_distance=0.02)
+    assert [match['url'] for match in matches] == ['https://www.example.com/']
+
+
+def test_latest_snapshot_replaces_previous(result_store):
+    url = 'https://example.com/'
+    result_store.add(url, result(fonts=('Inter',)), analyzed_at=100)
+    result_store.add(url, result(fonts=('Roboto',)), analyzed_at=200)
+    result_store.flush()
+    assert result_store.find_by_font('Inter') == []
+    assert len(result_store.find_by_font('Inter', latest=False)) == 1
+    assert [snapshot['analyzed_at'] for snapshot in result_store.history(url)] == [100, 200]
+
+
+def test_diff_since_reports_changed_sections(result_store):
+    url = 'https://example.com/'
+    result_store.add(url, result(title='Old', links=['a']), analyzed_at=100)
+    result_store.add(url, result(title='New', links=['a', 'b']), analyzed_at=200)
+    result_store.flush()
+    diff = result_store.diff_since(url, 150)
+    changes = {change['path']: change for change in diff['changes']}
+    assert changes['title'] == {'path': 'title', 'old': 'Old', 'new': 'New'}
+    assert changes['links']['added'] == ['b'] and changes['links']['removed'] == []
+    assert [entry['url'] for entry in result_store.changes_since(150)] == [url]
+
+
+def test_background_writer_flushes_batches(result_store):
+    result_store.add('https://example.com/', result())
+    deadline = time.time() + 5
+    while result_store.stats()['analyses'] == 0 and time.time() < deadline:
+        time.sleep(0.02)
+    assert result_store.stats()['analyses'] == 1
+
+
+def test_writer_survives_failed_batch(result_store, monkeypatch):
+    real_write = ResultStore._write
+
+    def failing_write(self, batch):
+        if any(url.endswith('/bad') for url, _, _ in batch):
+            raise RuntimeError('disk full')
+        return real_write(self, batch)
+
+    monkeypatch.setattr(ResultStore, '_write', failing_write)
+    result_store.add_many([('https://example.com/bad', result(), None), ('https://example.com/ok', result(), None)])
+    result_store.add('https://example.com/later', result())
+    deadline = time.time() + 5
+    while result_store.stats()['analyses'] < 2 and time.time() < deadline:
+        time.sleep(0.02)
+    stats = result_store.stats()
+    assert stats['analyses'] == 2 and stats['failed'] == 1
+    assert result_store._writer.is_alive()
+
+
+def test_export_columns_roundtrip(result_store):
+    result_store.add('https://example.com/', result())
+    result_store.flush()
+    archive = np.load(io.BytesIO(result_store.export_bytes()))
+    assert archive['url'].tolist() == ['https://example.com/']
+    assert archive['fonts_values'].tolist() == ['Inter']
+
+
+def test_diff_results_compares_lists_as_sets():
+    changes = diff_results({'links': [1, 2], 'cache': 'hit'}, {'links': [2, 3], 'cache': 'miss'})
+    assert changes == [{'path': 'links', 'added': [3], 'removed': [1], 'added_count': 1, 'removed_count': 1}]
+
+
+def test_parse_time_accepts_relative_iso_and_unix():
+    assert parse_time('2d', now=1000000) == 1000000 - 2 * 86400
+    assert parse_time('1700000000') == 1700000000
+    assert parse_time('2024-01-01T00:00:00') == store.datetime.fromisoformat('2024-01-01T00:00:00').timestamp()
+    with pytest.raises(Exception):
+        parse_time('yesterday')